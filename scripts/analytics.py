@@ -0,0 +1,191 @@
+"""Source-level analytics for the export.
+
+Builds a sparse source x pattern count matrix and a source x basic-type matrix
+from the analysis results, computes pairwise source similarity and a
+clustering order of the sources, so the Global Analysis view can show the
+group heatmap and sort sources by similarity without touching the occurrences.
+
+The basic type of a pattern is its contour without start marker, brackets and
+note-form suffixes (logic.get_basic_type, getBasicType in GlobalAnalysisView.vue).
+
+numpy is imported by the functions that use it, so METRICS can be imported
+for argument parsing without loading it.
+"""
+from logic import get_basic_type
+
+METRICS = ("cosine", "jaccard")
+
+# Dense column blocks for the Gram matrix are kept below this many cells
+_BLOCK_CELLS = 1 << 22
+
+
+def count_matrix(data_js):
+    """Sparse source x pattern counts in coordinate form.
+
+    Returns (sources, patterns, rows, cols, values): sorted source and pattern
+    names and three parallel arrays, one entry per (source, pattern) pair that occurs.
+    """
+    import numpy as np
+
+    sources = sorted(data_js)
+    patterns = sorted({pat for src in sources for pat in data_js[src]})
+    pids = {pat: i for i, pat in enumerate(patterns)}
+
+    rows, cols, values = [], [], []
+    for s, src in enumerate(sources):
+        for pat, occurrences in data_js[src].items():
+            rows.append(s)
+            cols.append(pids[pat])
+            values.append(len(occurrences))
+
+    return (
+        sources,
+        patterns,
+        np.array(rows, dtype=np.int64),
+        np.array(cols, dtype=np.int64),
+        np.array(values, dtype=np.float64),
+    )
+
+
+def group_matrix(patterns, rows, cols, values, n_sources):
+    """Dense source x basic-type counts: (basic_types, matrix)."""
+    import numpy as np
+
+    types = [get_basic_type(p) for p in patterns]
+    basic_types = sorted(set(types))
+    tids = {t: i for i, t in enumerate(basic_types)}
+    pattern_type = np.array([tids[t] for t in types], dtype=np.int64)
+
+    matrix = np.zeros((n_sources, len(basic_types)), dtype=np.int64)
+    np.add.at(matrix, (rows, pattern_type[cols]), values.astype(np.int64))
+    return basic_types, matrix
+
+
+def gram_matrix(rows, cols, values, n_sources, n_patterns):
+    """X @ X.T for the sparse source x pattern matrix X, in dense column blocks."""
+    import numpy as np
+
+    gram = np.zeros((n_sources, n_sources))
+    if not len(values):
+        return gram
+
+    order = np.argsort(cols, kind="stable")
+    rows, cols, values = rows[order], cols[order], values[order]
+    block = max(1, _BLOCK_CELLS // max(n_sources, 1))
+    bounds = np.searchsorted(cols, np.arange(0, n_patterns + block, block))
+
+    for start, (a, b) in enumerate(zip(bounds, bounds[1:])):
+        if a == b:
+            continue
+        dense = np.zeros((n_sources, block))
+        dense[rows[a:b], cols[a:b] - start * block] = values[a:b]
+        gram += dense @ dense.T
+    return gram
+
+
+def similarity_matrix(rows, cols, values, n_sources, n_patterns, metric="cosine"):
+    """Pairwise source similarity in [0, 1].
+
+    cosine: on the pattern count vectors
+    jaccard: on the sets of patterns each source uses
+    """
+    import numpy as np
+
+    if metric not in METRICS:
+        raise ValueError(f"Unknown similarity metric: {metric}")
+
+    if metric == "jaccard":
+        values = np.ones_like(values)
+    gram = gram_matrix(rows, cols, values, n_sources, n_patterns)
+    diag = np.diag(gram)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if metric == "cosine":
+            norms = np.sqrt(diag)
+            sim = gram / np.outer(norms, norms)
+        else:
+            sim = gram / (diag[:, None] + diag[None, :] - gram)
+    sim = np.nan_to_num(sim, nan=0.0, posinf=0.0)
+    np.fill_diagonal(sim, 1.0)
+    return sim
+
+
+def cluster_order(sim):
+    """Leaf order of an average-linkage clustering on a similarity matrix.
+
+    Merges the two most similar clusters until one is left. When two clusters
+    are joined, they are flipped so the most similar ends meet, which keeps
+    similar sources next to each other in the order.
+    """
+    import numpy as np
+
+    n = len(sim)
+    if n <= 2:
+        return list(range(n))
+
+    linkage = sim.astype(np.float64, copy=True)
+    np.fill_diagonal(linkage, -np.inf)
+    members = {i: [i] for i in range(n)}
+    sizes = np.ones(n)
+
+    for _ in range(n - 1):
+        i, j = divmod(int(np.argmax(linkage)), n)
+        if i > j:
+            i, j = j, i
+        left, right = members[i], members.pop(j)
+
+        # Choose the orientation whose touching ends are most similar
+        ends = [
+            (sim[left[-1], right[0]], left + right),
+            (sim[left[-1], right[-1]], left + right[::-1]),
+            (sim[left[0], right[0]], left[::-1] + right),
+            (sim[left[0], right[-1]], right + left),
+        ]
+        members[i] = max(ends, key=lambda e: e[0])[1]
+
+        # Average linkage: size-weighted mean of the two rows
+        merged = (linkage[i] * sizes[i] + linkage[j] * sizes[j]) / (sizes[i] + sizes[j])
+        sizes[i] += sizes[j]
+        linkage[i, :] = merged
+        linkage[:, i] = merged
+        linkage[i, i] = -np.inf
+        linkage[j, :] = -np.inf
+        linkage[:, j] = -np.inf
+
+    return next(iter(members.values()))
+
+
+def build_analytics(data_js, metric="cosine", decimals=3):
+    """Everything the Global Analysis view needs, ready for the export.
+
+    Returns a dict with:
+      groupCounts:      {source: {basic type: count}}  only non-zero cells
+      groupTotals:      {basic type: count}
+      sourceSimilarity: {"metric", "sources", "values"}  values[i][j] for sources[i], sources[j]
+      sourceOrder:      [source, ...]  clustering order, similar sources adjacent
+    """
+    import numpy as np
+
+    sources, patterns, rows, cols, values = count_matrix(data_js)
+    basic_types, groups = group_matrix(patterns, rows, cols, values, len(sources))
+
+    group_counts = {}
+    for s, src in enumerate(sources):
+        nz = np.flatnonzero(groups[s])
+        group_counts[src] = {basic_types[t]: int(groups[s, t]) for t in nz}
+    totals = groups.sum(axis=0)
+    group_totals = {t: int(n) for t, n in zip(basic_types, totals)}
+
+    sim = similarity_matrix(rows, cols, values, len(sources), len(patterns), metric)
+    order = cluster_order(sim)
+
+    return {
+        "groupCounts": group_counts,
+        "groupTotals": group_totals,
+        "sourceSimilarity": {
+            "metric": metric,
+            "sources": sources,
+            "values": np.round(sim, decimals).tolist()
+        },
+        "sourceOrder": [sources[i] for i in order]
+    }
@@ -1,336 +1,278 @@
-import monodikit
-import json
+"""Analyze transcription patterns and export data.json for the UI.
+
+Subcommands:
+    analyze   analyze the sources (or take them from the cache) and write the occurrence database
+    export    write data.json and the other UI files from the database, or the cache without one
+    stats     per-source counts from the occurrence database
+Without a subcommand, analysis and export run in one go.
+
+monodikit, pandas and numpy are only imported by the code paths that need
+them, so export and stats start without loading them.
+"""
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
 import os
 import glob
-import re
-import pandas as pd
-from logic import pitch_to_midi, get_direction, get_suffix
-
-CACHE_FILE = "transcription_cache.json"
+import sys
+import time
+from encoding import DocumentEncoder
+from segmentation import segment_unit
+from walker import WalkContext, walk
+import source_cache
+from source_cache import CACHE_DIR
+from sharded_export import remove_shards, write_sharded_export
+import data_format
+import occurrence_db
+from page_index import build_page_index
+from pattern_index import write_pattern_index
+from scan_index import write_scan_index
+from equivalents import write_equivalents
+from export_assets import ASSET_DIR, load_glyphs, load_manifest_map
+from export_formats import FORMATS, to_plain, write_formats, print_formats
+from instrumentation import RunReport, COUNTERS, profiled
+from occurrence_store import OccurrenceStore
+from analytics import METRICS as SIMILARITY_METRICS, build_analytics
+
+
+def is_excluded_document(meta):
+    # Exclude documents ending in 'TR' (Transcribed) or 'GS'
+    doc_id = "unknown"
+    if hasattr(meta, "document_id"):
+         doc_id = str(meta.document_id)
+    elif hasattr(meta, "get"):
+         doc_id = meta.get("document_id", "unknown")
+    return doc_id.endswith("TR") or doc_id.endswith("GS")
+
+
+def document_entries(corpus_path):
+    """The document directories of a source directory, in monodikit.Corpus order."""
+    from monodikit.models.corpus import check_files_exist
+
+    return [
+        entry
+        for source_dir in glob.glob(corpus_path)
+        for entry in glob.glob(os.path.join(source_dir, "*"))
+        if os.path.isdir(entry) and check_files_exist(entry)
+    ]
+
+
+def find_documents(corpus_path):
+    """Returns (sources, entries): the sources by sigle and the document directories, in monodikit.Corpus order."""
+    from monodikit.models.source import create_source
+
+    sources = {}
+    for path in glob.glob(corpus_path):
+        src = create_source(path)
+        if hasattr(src, "sigle"):
+            sources[src.sigle] = src
+    return sources, document_entries(corpus_path)
+
+
+def load_document(entry, sources, counters=None):
+    """Loads one document directory, or returns None if it is excluded (TR/GS)."""
+    from monodikit.models.corpus import create_document
+
+    def keep(meta, source_meta):
+        if is_excluded_document(meta):
+            if counters is not None:
+                counters["filtered"] += 1
+            return False
+        return True
+
+    return create_document(entry, filters=keep, sources=sources)
+
+
+def iter_documents(corpus_path, report=None):
+    """Yields the documents of a source directory one at a time.
+
+    Finds and orders the documents exactly like monodikit.Corpus(corpus_path),
+    but only one document is in memory at a time. Excluded (TR/GS) documents are
+    skipped on their meta.json, before their data is loaded.
+    """
+    for _, doc in iter_document_entries(corpus_path, report):
+        yield doc
+
+
+def iter_document_entries(corpus_path, report=None):
+    """Yields (document directory, document) like iter_documents.
+
+    A document that cannot be loaded is recorded as an error of the source in
+    report and skipped.
+    """
+    if report is None:
+        report = RunReport()
+    counters = report.source(corpus_path)
+
+    with report.stage("load_corpus"):
+        sources, entries = find_documents(corpus_path)
+    print(f"Found {len(entries)} documents.")
+
+    for doc_idx, entry in enumerate(entries):
+        if doc_idx % 10 == 0:
+            print(f"Processing doc {doc_idx}/{len(entries)}")
+        start = time.perf_counter()
+        try:
+            doc = load_document(entry, sources, counters)
+        except Exception as e:
+            print(f"Error loading {entry}: {e}")
+            report.error(corpus_path, e, document=entry)
+            continue
+        finally:
+            report.add_time("load_corpus", time.perf_counter() - start)
+        if doc:
+            yield entry, doc
+
+
+def iter_occurrences(corpus_path, report=None):
+    """Yields (source, pattern, [doc_id, folio, line, syllable, notes]) for every occurrence in a source directory.
+
+    Documents are loaded, analyzed and released one at a time, so memory does
+    not grow with the number of documents. A document that fails is recorded
+    as an error of the source in report, and the other documents go on.
+    """
+    if report is None:
+        report = RunReport()
+    counters = report.source(corpus_path)
 
-def extract_pattern(notes):
-    if len(notes) < 2:
-        return ""
+    print(f"Loading source from {corpus_path}...")
+    for entry, doc in iter_document_entries(corpus_path, report):
+        try:
+            occurrences = list(iter_document_occurrences(doc, report, counters))
+        except Exception as e:
+            print(f"Error analyzing {entry}: {e}")
+            report.error(corpus_path, e, document=entry)
+            continue
+        yield from occurrences
+
+
+def iter_document_occurrences(doc, report=None, counters=None):
+    """Yields (source, pattern, [doc_id, folio, line, syllable, notes]) for every occurrence in a loaded document."""
+    if report is None:
+        report = RunReport()
+    if counters is None:
+        counters = dict.fromkeys(COUNTERS, 0)
+
+    source = "Unknown"
+    if hasattr(doc, "meta") and doc.meta:
+         if hasattr(doc.meta, "source_id") and doc.meta.source_id:
+             source = str(doc.meta.source_id)
+         elif hasattr(doc.meta, "source") and doc.meta.source:
+             source = str(doc.meta.source)
+         
+         if source == "Unknown" and hasattr(doc.meta, "get"):
+             source = doc.meta.get("source_id", doc.meta.get("source", "Unknown"))
+
+    if not hasattr(doc, "data"):
+        return
+    counters["documents"] += 1
+
+    # Traversal Context
+    # User requested to use foliostart and zeilenstart from meta
+    initial_folio = ""
+    initial_line_str = "0"
     
-    pitches = []
-    for note in notes:
-        if isinstance(note, tuple):
-            b, o = note
-            pitches.append(pitch_to_midi(b, o))
+    if hasattr(doc, "meta") and doc.meta:
+        if isinstance(doc.meta, dict):
+            initial_folio = doc.meta.get("foliostart", "")
+            initial_line_str = doc.meta.get("zeilenstart", "0")
         else:
-            pass 
-    
-    directions = []
-    for i in range(len(pitches) - 1):
-        directions.append(get_direction(pitches[i], pitches[i+1]))
+            initial_folio = getattr(doc.meta, "foliostart", "")
+            initial_line_str = getattr(doc.meta, "zeilenstart", "0")
     
-    return "".join(directions)
-
-
-def analyze_single_source(corpus_path):
-    print(f"Loading source from {corpus_path}...")
-    corpus = monodikit.Corpus(corpus_path)
-    print(f"Loaded {len(corpus.documents)} documents.")
-
-    results = defaultdict(lambda: defaultdict(list))
-    
-    for doc_idx, doc in enumerate(corpus.documents):
-        if doc_idx % 10 == 0:
-            print(f"Processing doc {doc_idx}/{len(corpus.documents)}")
-
-        source = "Unknown"
-        if hasattr(doc, "meta") and doc.meta:
-             if hasattr(doc.meta, "source_id") and doc.meta.source_id:
-                 source = str(doc.meta.source_id)
-             elif hasattr(doc.meta, "source") and doc.meta.source:
-                 source = str(doc.meta.source)
-             
-             if source == "Unknown" and hasattr(doc.meta, "get"):
-                 source = doc.meta.get("source_id", doc.meta.get("source", "Unknown"))
-
-        # Extract Doc ID to check for filter
-        doc_id = "unknown"
-        if hasattr(doc, "meta") and hasattr(doc.meta, "document_id"):
-             doc_id = str(doc.meta.document_id)
-        elif hasattr(doc, "meta") and hasattr(doc.meta, "get"):
-             doc_id = doc.meta.get("document_id", "unknown")
-        
-        # Filter: Exclude documents ending in 'TR' (Transcribed) or 'GR'
-        if doc_id.endswith("TR") or doc_id.endswith("GS"):
-             continue
-
-
-        # Traversal Context
-        # User requested to use foliostart and zeilenstart from meta
-        initial_folio = ""
-        initial_line_str = "0"
-        
-        if hasattr(doc, "meta") and doc.meta:
-            if isinstance(doc.meta, dict):
-                initial_folio = doc.meta.get("foliostart", "")
-                initial_line_str = doc.meta.get("zeilenstart", "0")
-            else:
-                initial_folio = getattr(doc.meta, "foliostart", "")
-                initial_line_str = getattr(doc.meta, "zeilenstart", "0")
-        
-        # Try to parse line start
-        try:
-            line_counter = int(initial_line_str)
-        except ValueError:
-            line_counter = 0
-
-        current_context = {
-            "folio": str(initial_folio),
-            "line": str(initial_line_str),
-            "syllable": ""
-        }
-
-        def traverse(node):
-            nonlocal line_counter
-            node_type = getattr(node, "kind", None)
-            if isinstance(node, dict): node_type = node.get("kind")
-            
-            # Update Context
-            # Div/Section labels MIGHT override or supplement, but keeping meta as base
-            if hasattr(node, "label") or (isinstance(node, dict) and "label" in node):
-                val = getattr(node, "label", node.get("label")) if isinstance(node, dict) else getattr(node, "label", "")
-                if val: current_context["folio"] = str(val)
-            
-            # Line context if available (ZeileContainer)
-            # Increment line counter on ZeileContainer
-            if node_type == "ZeileContainer":
-                 line_counter += 1
-                 current_context["line"] = str(line_counter)
-            
-            # Check for Syllable
-            if node_type == "Syllable":
-                text = getattr(node, "text", "") if not isinstance(node, dict) else node.get("text", "")
-                current_context["syllable"] = text
-                
-                # Syllables contain 'notes' which is a dict (e.g. {'spaced': [...]})
-                notes_data = getattr(node, "notes", None) if not isinstance(node, dict) else node.get("notes")
-                
-                if not notes_data or not isinstance(notes_data, dict) or "spaced" not in notes_data:
-                    return
-
-                # Iterate through 'spaced' list (Phrases/Words separated by space)
-                # Each item typically has 'nonSpaced' list (The Unit)
-                for spaced_item in notes_data["spaced"]:
-                     if "nonSpaced" not in spaced_item:
-                         continue
-                     
-                     non_spaced_unit = spaced_item["nonSpaced"] # This is the list of neumes/groups
-                     process_non_spaced(non_spaced_unit)
-                return # Syllable processing is done, no further recursion needed for its children here
-
-            elif node_type == "FolioChange":
-                # Update folio context
-                if hasattr(node, "folio"):
-                    current_context["folio"] = node.folio
-                elif hasattr(node, "text"):
-                    current_context["folio"] = node.text
-                # Reset line count on folio change? Usually yes.
-                # current_context["line"] = "1" 
-
-            elif node_type == "LineChange":
-                # Update line context - user says "count for the line".
-                # If it has an explicit number, use it. Otherwise increment.
-                if hasattr(node, "n") and node.n:
-                    current_context["line"] = str(node.n)
-                elif hasattr(node, "line") and node.line:
-                    current_context["line"] = str(node.line)
-                else:
-                    # Increment existing integer-like line or append
-                    try:
-                        val = int(current_context["line"])
-                        current_context["line"] = str(val + 1)
-                    except:
-                        # If line was "7" or "7r", and now we just increment?
-                        pass
-            
-            # elif node_type == "ZeileContainer": # This is handled above now
-            #     # Fallback/Supplemental: increment line count if we rely on containers
-            #     # Only do this if we haven't just processed a LineChange?
-            #     # Let's rely on LineChange if present, else ZeileContainer?
-            #     # The introspection showed 187 ZeileContainers vs 113 LineChanges.
-            #     # ZeileContainer is likely the visual line wrapper.
-            #     try:
-            #         val = int(current_context["line"])
-            #         current_context["line"] = str(val + 1)
-            #     except:
-            #         pass
-
-            elif node_type == "nonSpaced":
-                # Check if this node IS a nonSpaced group or has one
-                # monodikit: Neume nodes are usually children of Syllable/Zeile.
-                # nonSpaced might be a grouping container.
-                # If we are strictly looking for "nonSpaced" elements as the unit:
-                process_non_spaced(node)
-                return # Don't recurse into nonSpaced children (we handled them)
-                
-            # Recurse
-            children = getattr(node, "children", []) if not isinstance(node, dict) else node.get("children", node.get("elements", []))
-            for child in children:
-                traverse(child)
-
-        # DEFINE HELPER
-        def process_non_spaced(non_spaced_unit):
-             # Helper to extract notes from a Neume, Group, or Note element
-             def extract_notes_from_element(element):
-                 extracted = []
-                 
-                 if isinstance(element, dict) and "grouped" in element:
-                     for sub in element["grouped"]:
-                         extracted.extend(extract_notes_from_element(sub))
-                     return extracted
-
-                 sub_notes = []
-                 if isinstance(element, dict):
-                     sub_notes = element.get("neume_components", element.get("children", element.get("notes", [])))
-                     if not sub_notes and ("base" in element or "octave" in element):
-                         return [element]
-                 else:
-                     if hasattr(element, "neume_components"): sub_notes = element.neume_components
-                     elif hasattr(element, "notes"): sub_notes = element.notes
-                     elif hasattr(element, "elements"): sub_notes = element.elements
-                     else:
-                         if hasattr(element, "base") or hasattr(element, "octave"):
-                             return [element]
-
-                 if sub_notes:
-                     for n in sub_notes:
-                         extracted.extend(extract_notes_from_element(n))
-                 
-                 return extracted
-
-             # Ensure iterable
-             if not isinstance(non_spaced_unit, list) and hasattr(non_spaced_unit, "children"):
-                  # It's a node
-                  non_spaced_unit = non_spaced_unit.children
-             elif isinstance(non_spaced_unit, dict):
-                  non_spaced_unit = non_spaced_unit.get("children", [])
-
-             if not non_spaced_unit: return
-
-             unit_notes = []
-             for item in non_spaced_unit:
-                 unit_notes.extend(extract_notes_from_element(item))
-             
-             real_notes = []
-             # Debug: collect types
-             # note_types_counter = Counter() (Need to import Counter or use dict)
-             
-             for n in unit_notes:
-                b, o = None, None
-                nt, liq = "Normal", False
-                
-                if hasattr(n, "base"): b = n.base
-                elif isinstance(n, dict): b = n.get("base")
-                
-                if hasattr(n, "octave"): o = n.octave
-                elif hasattr(n, "oct"): o = n.oct
-                elif isinstance(n, dict): o = n.get("octave", n.get("oct"))
-                
-                # Extract Attributes
-                if hasattr(n, "noteType"): nt = n.noteType
-                elif isinstance(n, dict): nt = n.get("noteType", "Normal")
-                
-                if hasattr(n, "liquescent"): liq = n.liquescent
-                elif isinstance(n, dict): liq = n.get("liquescent", False)
-
-                if b and o:
-                    real_notes.append({
-                        "pitch": pitch_to_midi(b, int(o)),
-                        "base": b,
-                        "octave": int(o),
-                        "type": nt,
-                        "liquescent": liq
-                    })
-             
-             if real_notes:
-                 group_segments = []
-                 # Re-iterate items to build groups
-                 # Warning: The original loop structure aggregated *all* notes into real_notes
-                 # effectively flattening the structure, but we need to respect the grouping structure
-                 # derived from the 'non_spaced_unit' items (which are Neumes/Groups).
-                 
-                 # New logic: Recalculate group segments based on unit_notes structure?
-                 # Actually, unit_notes is already flattened from 'non_spaced_unit'.
-                 # We need to map 'real_notes' back to the groups.
-                 
-                 # Let's rebuild the group_segments logic properly using the same extraction
-                 
-                 current_note_idx = 0
-                 for item in non_spaced_unit:
-                     g_notes_raw = extract_notes_from_element(item)
-                     if not g_notes_raw: continue
-                     
-                     segment = []
-                     for _ in g_notes_raw:
-                         if current_note_idx < len(real_notes):
-                             segment.append(real_notes[current_note_idx])
-                             current_note_idx += 1
-                     
-                     if segment:
-                         group_segments.append(segment)
-                 
-                 pat_str = ""
-                 if group_segments:
-                     parts = []
-                     prev_last_note = None
-                     
-                     for i, grp in enumerate(group_segments):
-                         is_group = len(grp) > 1
-                         if i == 0:
-                             if is_group: parts.append("[")
-                             parts.append("*" + get_suffix(grp[0]["type"], grp[0]["liquescent"]))
-                         else:
-                             if is_group: parts.append("[")
-                             if prev_last_note is not None:
-                                 link_dir = get_direction(prev_last_note["pitch"], grp[0]["pitch"])
-                                 parts.append(link_dir + get_suffix(grp[0]["type"], grp[0]["liquescent"]))
-                         
-                         if len(grp) >= 2:
-                             for k in range(len(grp)-1):
-                                 d = get_direction(grp[k]["pitch"], grp[k+1]["pitch"])
-                                 parts.append(d + get_suffix(grp[k+1]["type"], grp[k+1]["liquescent"]))
-                         
-                         if is_group: parts.append("]")
-                         prev_last_note = grp[-1]
-
-                     pat_str = "".join(parts)
-
-                     doc_id = "unknown"
-                     if hasattr(doc, "meta"):
-                        if hasattr(doc.meta, "document_id"):
-                            doc_id = str(doc.meta.document_id)
-                        else:
-                            doc_id = getattr(doc.meta, "document_id", "unknown")
-
-                     notes_str = "-".join([f"{n['base']}{n['octave']}" for n in real_notes])
-                     info_compact = [
-                         doc_id,
-                         str(current_context["folio"]),
-                         str(current_context["line"]),
-                         str(current_context["syllable"]),
-                         notes_str
-                     ]
-                     results[source][pat_str].append(info_compact)
-
-        if hasattr(doc, "data"):
-            # Initial Metadata
-            if hasattr(doc, "meta"):
-                 current_context["folio"] = getattr(doc.meta, "initial_folio", "")
-                 current_context["line"] = getattr(doc.meta, "initial_line", "0")
-            
-            traverse(doc.data)
-        
-    return results
-
-def export_json(data):
-    # COMPACT JSON: Convert defaultdict to regular dict
-    data_js = json.loads(json.dumps(data))
+    # Try to parse line start
+    try:
+        line_counter = int(initial_line_str)
+    except ValueError:
+        line_counter = 0
+
+    context = WalkContext(str(initial_folio), str(initial_line_str), line_counter)
+
+    # Initial Metadata
+    if hasattr(doc, "meta"):
+         context.folio = getattr(doc.meta, "initial_folio", "")
+         context.line = getattr(doc.meta, "initial_line", "0")
+
+    # Doc ID as recorded on each occurrence
+    record_doc_id = "unknown"
+    if hasattr(doc, "meta"):
+       if hasattr(doc.meta, "document_id"):
+           record_doc_id = str(doc.meta.document_id)
+       else:
+           record_doc_id = getattr(doc.meta, "document_id", "unknown")
+
+    # One pattern per nonSpaced unit, encoded when the document is done
+    encoder = DocumentEncoder()
+    pending_occurrences = []
+    n_notes = 0
+
+    traverse_start = time.perf_counter()
+    for non_spaced_unit in walk(doc.data, context):
+        segmented = segment_unit(non_spaced_unit)
+        if segmented is None:
+            continue
+        notes, group_sizes = segmented
+        n_notes += len(notes)
+
+        encoder.add_unit(
+            [n[0] for n in notes],
+            [n[2] for n in notes],
+            [n[3] for n in notes],
+            group_sizes
+        )
+
+        notes_str = "-".join([n[1] for n in notes])
+        info_compact = [
+            record_doc_id,
+            str(context.folio),
+            str(context.line),
+            str(context.syllable),
+            notes_str
+        ]
+        pending_occurrences.append(info_compact)
+
+    encode_start = time.perf_counter()
+    patterns = encoder.encode()
+    encode_end = time.perf_counter()
+
+    report.add_time("traverse", encode_start - traverse_start)
+    report.add_time("encode", encode_end - encode_start)
+    counters["syllables"] += context.syllables
+    counters["notes"] += n_notes
+    counters["occurrences"] += len(pending_occurrences)
+
+    for pat_str, info_compact in zip(patterns, pending_occurrences):
+        yield source, pat_str, info_compact
+
+
+def collect_source(corpus_path, report=None):
+    """Analyzes a source directory into an OccurrenceStore."""
+    if report is None:
+        report = RunReport()
+
+    store = OccurrenceStore()
+    for source, pat_str, info_compact in iter_occurrences(corpus_path, report):
+        store.add(source, pat_str, info_compact)
+
+    report.source(corpus_path)["patterns"] = store.pattern_count()
+    return store
+
+
+def analyze_single_source(corpus_path, report=None):
+    return collect_source(corpus_path, report).to_nested()
+
+def export_json(data, sharded=False, format_version=1, report=None, similarity="cosine",
+                equivalence_distance=0, jobs=1, asset_dir=ASSET_DIR, formats=()):
+    if report is None:
+        report = RunReport()
+    # The "export" stage is the time not spent in one of the named stages nested in it
+    with report.stage("export"):
+        _export_json(data, sharded, format_version, report, similarity, equivalence_distance, jobs, asset_dir, formats)
+
+
+def _export_json(data, sharded, format_version, report, similarity, equivalence_distance, jobs, asset_dir, formats):
+    # Plain dicts and lists, as a JSON round-trip would give, without serializing
+    data_js = to_plain(data)
     
     sources = sorted(data_js.keys())
     
@@ -349,130 +291,491 @@ def export_json(data):
             if count > overall_max:
                 overall_max = count
     
-    # Load Glyphs
-    glyphs = {}
-    glyph_files = {
-        "note": "glyphs/note.svg",
-        "oriscus": "glyphs/oriscus.svg",
-        "quilisma": "glyphs/quilisma.svg",
-        "ascending": "glyphs/ascending.svg",
-        "descending": "glyphs/descending.svg",
-        "strophicus": "glyphs/strophicus.svg"
-    }
-    
-    for name, path in glyph_files.items():
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                content = f.read()
-                # Extract viewBox
-                vb = "0 0 10 10"
-                m_vb = re.search(r'viewBox="([^"]+)"', content)
-                if m_vb: vb = m_vb.group(1)
-                
-                # Extract Path d
-                m_d = re.search(r' d="([^"]+)"', content)
-                d_val = ""
-                if m_d: d_val = m_d.group(1)
-                
-                glyphs[name] = {"viewBox": vb, "d": d_val}
-        else:
-             glyphs[name] = {"viewBox": "0 0 10 10", "d": "M5,5 L10,10"}
+    # Glyph table, from the sidecar while glyphs/*.svg are unchanged
+    glyphs = load_glyphs(asset_dir)
 
-    # Load Metadata (Quellendaten)
-    manifest_map = {}
-    try:
-        excel_path = "data/raw/Quellendaten.xlsx"
-        if os.path.exists(excel_path):
-            df = pd.read_excel(excel_path)
-            if "Quellensigle" in df.columns and "Manifest" in df.columns:
-                for _, row in df.iterrows():
-                    sigle = row["Quellensigle"]
-                    manifest = row["Manifest"]
-                    if pd.notna(manifest):
-                        manifest_map[sigle] = {"url": manifest}
-        else:
-            print(f"Warning: {excel_path} not found.")
-    except Exception as e:
-        print(f"Warning: Could not load Quellendaten.xlsx: {e}")
+    # Load Metadata (Quellendaten), from the sidecar while the sheet is unchanged.
+    # Excel loading is timed on its own, not as part of the export
+    with report.stage("manifests"):
+        manifest_map = load_manifest_map(asset_dir)
+
+    # Folio and page-pattern indexes, so the UI does not rebuild them on every page load
+    page_index = build_page_index(data_js)
+    # Basic-type counts, source similarity and clustering order for the Global Analysis view
+    analytics = build_analytics(data_js, metric=similarity)
+
+    # Ensure ui/public exists
+    os.makedirs("ui/public", exist_ok=True)
+    output_file = "ui/public/data.json"
+
+    # Search index over the pattern vocabulary, loaded by the UI when a search is made
+    index = write_pattern_index(data_js, "ui/public/pattern_index.json")
+    print(f"Exported pattern index with {len(index.patterns)} patterns and {len(index.postings)} trigrams")
+
+    # Scan path of every folio, timed on its own
+    with report.stage("scans"):
+        scan_index = write_scan_index(page_index["sourceFolios"], "ui/public/scan_index.json")
+    resolved = sum(len(folios) for folios in scan_index["scans"].values())
+    unresolved = sum(len(folios) for folios in scan_index["unresolved"].values())
+    report.extra["unresolvedScans"] = scan_index["unresolved"]
+    print(f"Exported scan index: {resolved} folios with a scan, {unresolved} without")
+
+    # Near-equivalent pattern clusters, timed on their own
+    if equivalence_distance > 0:
+        with report.stage("equivalents"):
+            clusters = write_equivalents(data_js, "ui/public/equivalents.json", equivalence_distance, jobs)
+        print(f"Exported {len(clusters)} equivalence clusters (edit distance <= {equivalence_distance})")
+    elif os.path.exists("ui/public/equivalents.json"):
+        # Turned off: drop the clusters of an earlier run
+        os.remove("ui/public/equivalents.json")
+        print("Removed ui/public/equivalents.json (equivalence clustering is off)")
+
+    if sharded:
+        # Small index in data.json, occurrences in per-source shards loaded on demand
+        export_obj = {
+            "stats": dict(pat_stats),
+            "overallMax": overall_max,
+            "glyphs": glyphs,
+            "manifests": manifest_map
+        }
+        export_obj.update(page_index)
+        export_obj.update(analytics)
+        encode = data_format.encode_source if format_version == data_format.FORMAT_VERSION else None
+        index_file, shard_list = write_sharded_export(export_obj, data_js, "ui/public", encode=encode)
+        print(f"Exported index to {index_file} with {len(shard_list)} source shards")
+        if formats:
+            print("Warning: Other output formats are only written for the single-file export.")
+        # Drop copies of an earlier single-file export
+        write_formats(index_file, None, ())
+        return
 
     # Construct Final Export Object
     export_obj = {
         "data": data_js,
-        "stats": pat_stats,
+        "stats": dict(pat_stats),
         "overallMax": overall_max,
         "glyphs": glyphs,
         "manifests": manifest_map
     }
+    export_obj.update(page_index)
+    export_obj.update(analytics)
     
-    # Ensure ui/public exists
-    os.makedirs("ui/public", exist_ok=True)
-    output_file = "ui/public/data.json"
-    
-    with open(output_file, "w") as f:
-        json.dump(export_obj, f)
-    
-    print(f"Exported JSON to {output_file}")
-
+    write_start = time.perf_counter()
+    written = data_format.write_export(output_file, export_obj, version=format_version)
+    write_seconds = time.perf_counter() - write_start
+
+    print(f"Exported JSON to {output_file} (format v{format_version})")
+    # data.json replaced the sharded index, its shards are no longer referenced
+    if remove_shards("ui/public"):
+        print("Removed the shards of an earlier sharded export")
+
+    # Compressed copies and binary encodings next to data.json
+    with report.stage("formats"):
+        rows = write_formats(output_file, written, formats, json_seconds=round(write_seconds, 4))
+    report.extra["formats"] = rows
+    if len(rows) > 1:
+        print_formats(rows)
+
+
+def iter_source_stores(cache_dir, jobs=1, corpus_path="export", rebuild=False, report=None):
+    """Yields an OccurrenceStore per source, from the corpus or, if there is none, from the cache."""
+    if report is None:
+        report = RunReport()
+    if os.path.isdir(corpus_path):
+        yield from iter_corpus(corpus_path, jobs=jobs, cache_dir=cache_dir, rebuild=rebuild, report=report)
+        return
+
+    # No export available: fall back to whatever has been cached
+    print(f"Warning: {corpus_path} not found. Loading data from cache: {cache_dir} ...")
+    for _, src_results in source_cache.load_all(cache_dir):
+        yield OccurrenceStore.from_nested(src_results)
+
+
+def load_or_process_data(cache_dir, jobs=1, corpus_path="export", rebuild=False, report=None):
+    if report is None:
+        report = RunReport()
+    return merge_stores(iter_source_stores(cache_dir, jobs, corpus_path, rebuild, report), report)
+
+
+def merge_stores(stores, report):
+    """Merged {source: {pattern: [...]}} of stores, in their order."""
+    final_store = OccurrenceStore()
+    for store in stores:
+        # Takes the store's segments over, nothing is copied
+        final_store.extend(store)
+    with report.stage("merge"):
+        return final_store.to_nested()
+
+
+def load_cached_results(cache_dir, report=None):
+    """Merges every entry of the cache, ordered by source directory."""
+    if report is None:
+        report = RunReport()
+    final_store = OccurrenceStore()
+    with report.stage("cache_read"):
+        for _, src_results in source_cache.load_all(cache_dir):
+            final_store.extend(OccurrenceStore.from_nested(src_results))
+    with report.stage("merge"):
+        return final_store.to_nested()
+
+
+def analyze_source_task(src, cache_dir=None, key=None):
+    # Worker entry point for the process pool, returns (OccurrenceStore, report dict).
+    # The store is None if the source failed; the report then holds the error
+    # next to the times and counters gathered before it.
+    report = RunReport()
+    try:
+        store = collect_source(src, report)
+    except Exception as e:
+        print(f"Error processing {src}: {e}")
+        report.error(src, e)
+        return None, report.to_dict()
 
-def load_or_process_data(cache_file):
-    if os.path.exists(cache_file):
-        print(f"Loading data from cache: {cache_file} ...")
+    # Write the cache entry as soon as the source is done, so an interrupted run resumes from here.
+    # A source with failed documents is not cached, so they are retried and reported on every run.
+    if cache_dir is not None and not report.errors:
         try:
-            with open(cache_file, "r") as f:
-                data = json.load(f)
-            print("Loaded data from cache.")
-            return data
+            with report.stage("cache_write"):
+                source_cache.save_entry(cache_dir, src, key, store.to_nested())
         except Exception as e:
-            print(f"Error loading cache: {e}. Reprocessing...")
-    
-    return analyze_corpus("export")
+            print(f"Warning: Could not save cache entry for {src}: {e}")
+            report.error(src, e)
 
+    return store, report.to_dict()
 
-def analyze_corpus(corpus_path="export"):
-    # Aggregated results
-    final_results = defaultdict(lambda: defaultdict(list))
-    
-    source_dirs = []
+
+def iter_source_results(source_dirs, jobs=1, cache_dir=None, keys=None):
+    """Yields (src, store, report, error) for every source directory, in source_dirs order.
+
+    store is None if the source failed: error is the exception if the worker
+    itself failed, otherwise the failure is in the worker's report.
+
+    With jobs > 1 the sources are analyzed in a process pool. Results are reported
+    as soon as each source finishes, but yielded in the original order so the
+    merged output is identical to a serial run.
+    """
+    keys = keys or {}
+    total = len(source_dirs)
+    if jobs <= 1 or total <= 1:
+        for src in source_dirs:
+            try:
+                store, stats = analyze_source_task(src, cache_dir, keys.get(src))
+            except Exception as e:
+                yield src, None, None, e
+                continue
+            yield src, store, stats, None
+        return
+
+    pending = {}
+    next_idx = 0
+    done = 0
+    with ProcessPoolExecutor(max_workers=min(jobs, total)) as pool:
+        futures = {
+            pool.submit(analyze_source_task, src, cache_dir, keys.get(src)): i
+            for i, src in enumerate(source_dirs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            src = source_dirs[i]
+            try:
+                pending[i] = (src, *future.result(), None)
+            except Exception as e:
+                pending[i] = (src, None, None, e)
+            done += 1
+            print(f"--- Finished source {done}/{total}: {os.path.basename(src)} ---")
+
+            # Release everything that is now contiguous with the already-merged prefix
+            while next_idx in pending:
+                yield pending.pop(next_idx)
+                next_idx += 1
+
+
+def find_source_dirs(corpus_path):
+    """corpus_path itself if it is a source directory, else its source subdirectories, sorted."""
     if os.path.isfile(os.path.join(corpus_path, "meta.json")):
-        source_dirs.append(corpus_path)
-    else:
-        # If corpus_path is a directory of sources
-        # Strip trailing slash
-        c_path = corpus_path.rstrip("/")
-        # Look for meta.json in immediate subdirectories
-        candidates = glob.glob(os.path.join(c_path, "*", "meta.json"))
-        source_dirs = sorted([os.path.dirname(p) for p in candidates])
+        return [corpus_path]
+    # Strip trailing slash, then look for meta.json in immediate subdirectories
+    c_path = corpus_path.rstrip("/")
+    candidates = glob.glob(os.path.join(c_path, "*", "meta.json"))
+    return sorted([os.path.dirname(p) for p in candidates])
+
+
+def analyze_corpus(corpus_path="export", jobs=1, cache_dir=CACHE_DIR, rebuild=False, report=None):
+    if report is None:
+        report = RunReport()
+    return merge_stores(iter_corpus(corpus_path, jobs, cache_dir, rebuild, report), report)
+
+
+def plan_corpus(corpus_path="export", cache_dir=CACHE_DIR, rebuild=False, report=None):
+    """Returns (source_dirs, keys, to_analyze): the sources, their cache keys and those without a cache entry.
+
+    Stale cache entries are removed.
+    """
+    if report is None:
+        report = RunReport()
+
+    source_dirs = find_source_dirs(corpus_path)
+    if source_dirs != [corpus_path]:
         print(f"Found {len(source_dirs)} sources in {corpus_path}")
 
-    total = len(source_dirs)
-    for i, src in enumerate(source_dirs):
-        # print(f"--- Processing Source {i+1}/{total}: {os.path.basename(src)} ---")
+    # Per-source cache: entries are keyed on a hash of the source's files
+    keys = {}
+    to_analyze = source_dirs
+    if cache_dir is not None:
+        with report.stage("fingerprint"):
+            keys = {src: source_cache.source_fingerprint(src) for src in source_dirs}
+            expected = [source_cache.entry_path(cache_dir, src, keys[src]) for src in source_dirs]
+            removed = source_cache.prune(cache_dir, expected)
+        if removed:
+            print(f"Dropped {removed} stale cache entries")
+        if not rebuild:
+            to_analyze = [src for src, path in zip(source_dirs, expected) if not os.path.exists(path)]
+        print(f"{len(source_dirs) - len(to_analyze)} sources cached, {len(to_analyze)} to analyze")
+    return source_dirs, keys, to_analyze
+
+
+def iter_corpus(corpus_path="export", jobs=1, cache_dir=CACHE_DIR, rebuild=False, report=None, plan=None):
+    """Yields the OccurrenceStore of every source of the corpus as it is ready, in source directory order.
+
+    Sources are read from the cache or analyzed (and cached) one by one, so
+    nothing holds more than the sources in flight. plan is the result of
+    plan_corpus, which is called if it is not given.
+    """
+    if report is None:
+        report = RunReport()
+    if plan is None:
+        plan = plan_corpus(corpus_path, cache_dir, rebuild, report)
+    source_dirs, keys, to_analyze = plan
+
+    if jobs > 1 and to_analyze:
+        print(f"Analyzing sources with {jobs} worker processes")
+
+    fresh = iter_source_results(to_analyze, jobs, cache_dir, keys)
+    analyze_set = set(to_analyze)
+
+    # Yield in source_dirs order, taking each source from the cache or from the analysis stream
+    for src in source_dirs:
+        if src in analyze_set:
+            _, store, stats, error = next(fresh)
+            if error is not None:
+                print(f"Error processing {src}: {error}")
+                report.error(src, error)
+                continue
+            report.merge(stats)
+            if store is None:
+                continue
+        else:
+            with report.stage("cache_read"):
+                src_results = source_cache.load_entry(cache_dir, src, keys[src])
+                store = None if src_results is None else OccurrenceStore.from_nested(src_results)
+            if store is None:
+                # Entry vanished or is unreadable: analyze it now
+                store, stats = analyze_source_task(src, cache_dir, keys[src])
+                report.merge(stats)
+                if store is None:
+                    continue
+            else:
+                counters = report.source(src)
+                counters["cached"] += 1
+                counters["patterns"] += store.pattern_count()
+                counters["occurrences"] += len(store)
+
+        yield store
+
+
+def _add_options(parser, groups, suppress=False):
+    """Adds the options of the given groups ("run", "analyze", "export") to parser.
+
+    Subcommand parsers are built with suppress=True, so that an option given
+    before the subcommand is not reset to its default by the subcommand parser.
+    """
+    def add(*names, **kwargs):
+        if suppress:
+            kwargs["default"] = argparse.SUPPRESS
+        parser.add_argument(*names, **kwargs)
+
+    add("--db", default=occurrence_db.DB_PATH,
+        help="SQLite occurrence database written after the analysis (see scripts/occurrence_db.py).")
+    if "run" in groups:
+        add("-j", "--jobs", type=int, default=1,
+            help="Number of worker processes for source analysis (0 = one per CPU core).")
+        add("--cache-dir", default=CACHE_DIR,
+            help="Directory holding one cache entry per source directory.")
+        add("--report", default="run_report.json",
+            help="Where to write the JSON run report (stage timings, per-source counters, errors).")
+        add("--profile", metavar="PATH",
+            help="Run under cProfile and write the stats to PATH (use with --jobs 1).")
+        add("--tracemalloc", action="store_true",
+            help="Trace memory allocations and add the peak and top allocation sites to the report.")
+    if "analyze" in groups:
+        add("--rebuild", action="store_true",
+            help="Re-analyze every source even if its cache entry is up to date.")
+        add("--no-db", action="store_true", help="Do not write the occurrence database.")
+    if "export" in groups:
+        add("--sharded", action="store_true",
+            help="Write data.json as a small index plus per-source shards in ui/public/shards/.")
+        add("--format-version", type=int, choices=[1, data_format.FORMAT_VERSION], default=1,
+            help="Occurrence encoding: 1 = lists of strings, 2 = dictionary-encoded columns.")
+        add("--similarity", choices=SIMILARITY_METRICS, default="cosine",
+            help="Source similarity for the exported clustering order: cosine on pattern counts, "
+                 "or jaccard on the sets of patterns.")
+        add("--equivalence-distance", type=int, default=0,
+            help="Cluster patterns within this edit distance into ui/public/equivalents.json "
+                 "(0 = off, the default; 1 groups patterns one edit apart).")
+        add("--format", dest="formats", action="append", choices=list(FORMATS), default=[],
+            help="Also write data.json in this format: gz, br (brotli), msgpack or cbor. Repeatable.")
+
+
+COMMANDS = {
+    "analyze": (("run", "analyze"), "Analyze the sources and write the cache and the occurrence database."),
+    "export": (("run", "export"), "Export the UI files from the occurrence database (or the cache if there is none)."),
+    "stats": ((), "Print per-source counts from the occurrence database."),
+    "watch": (("run", "export"), "Keep the corpus in memory, re-analyze changed documents, re-export and serve queries."),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze transcription patterns and export data.json for the UI.",
+        epilog="Without a command, the sources are analyzed and exported in one run."
+    )
+    _add_options(parser, ("run", "analyze", "export"))
+    parser.add_argument("--from-db", action="store_true",
+                        help="Skip the analysis and export data.json from the occurrence database.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    for name, (groups, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        _add_options(sub, groups, suppress=True)
+        if name == "watch":
+            sub.add_argument("--corpus", default="export", help="Export directory to watch.")
+            sub.add_argument("--host", default="127.0.0.1")
+            sub.add_argument("--port", type=int, default=8765, help="Port of the query endpoints (see ui/vite.config.js).")
+            sub.add_argument("--interval", type=float, default=1.0, help="Seconds between two polls of the export.")
+            sub.add_argument("--debounce", type=float, default=2.0,
+                             help="Seconds without changes before data.json is exported again.")
+
+    args = parser.parse_args(argv)
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def load_db_results(db_path, report):
+    with report.stage("db_read"):
+        conn = occurrence_db.connect(db_path)
         try:
-            # Call the single source analyzer
-            # Note: analyze_single_source must return results!
-            src_results = analyze_single_source(src)
-            
-            # Merge results
-            for source_name, patterns in src_results.items():
-                for pat, occurrences in patterns.items():
-                    final_results[source_name][pat].extend(occurrences)
-                    
-        except Exception as e:
-            print(f"Error processing {src}: {e}")
-            
-    # Cache the results
-    print(f"Saving data to cache: {CACHE_FILE} ...")
+            results = occurrence_db.load_results(conn)
+        finally:
+            conn.close()
+    print(f"Loaded {len(results)} sources from {db_path}")
+    return results
+
+
+def db_is_current(db_path, cache_dir, plan):
+    """True if every source of plan is cached and the database was written after the cache last changed.
+
+    The cache directory is compared too, as removing a stale entry changes
+    its mtime but no entry's.
+    """
+    source_dirs, keys, to_analyze = plan
+    if to_analyze or cache_dir is None or not os.path.exists(db_path):
+        return False
+    db_time = os.stat(db_path).st_mtime_ns
+    paths = [cache_dir] + [source_cache.entry_path(cache_dir, src, keys[src]) for src in source_dirs]
+    return all(os.stat(path).st_mtime_ns <= db_time for path in paths)
+
+
+def run_analyze(args, report, corpus_path="export"):
+    """Analyzes the sources, writing each to the occurrence database as it arrives; nothing is merged.
+
+    When every source is a cache hit and the database is newer than the
+    cache, the database is left as it is.
+    """
+    if os.path.isdir(corpus_path):
+        plan = plan_corpus(corpus_path, args.cache_dir, args.rebuild, report)
+        if not args.no_db and db_is_current(args.db, args.cache_dir, plan):
+            for src in plan[0]:
+                report.source(src)["cached"] += 1
+            print(f"{args.db} is up to date with the cache, not rewriting it")
+            return
+        stores = iter_corpus(corpus_path, args.jobs, args.cache_dir, args.rebuild, report, plan)
+    else:
+        stores = iter_source_stores(args.cache_dir, jobs=args.jobs, corpus_path=corpus_path, report=report)
+    if args.no_db:
+        for _ in stores:
+            pass  # The cache entries are written by the analysis
+        return
+
+    with occurrence_db.ResultWriter(args.db) as writer:
+        for store in stores:
+            with report.stage("db_write"):
+                writer.add(store.to_nested())
+        with report.stage("db_write"):
+            writer.close()
+    print(f"Wrote {writer.n_occurrences} occurrences to {args.db}")
+
+
+def run_export(args, report, results=None):
+    if results is None:
+        if not args.no_db and os.path.exists(args.db):
+            results = load_db_results(args.db, report)
+        else:
+            if not args.no_db:
+                print(f"No occurrence database at {args.db}, exporting from the cache in {args.cache_dir}")
+            results = load_cached_results(args.cache_dir, report)
+    export_json(results, sharded=args.sharded, format_version=args.format_version, report=report,
+                similarity=args.similarity, equivalence_distance=args.equivalence_distance, jobs=args.jobs,
+                asset_dir=os.path.join(args.cache_dir, "assets"), formats=args.formats)
+
+
+def print_stats(db_path):
+    """Prints the per-source counts of the database and returns the exit status."""
     try:
-        with open(CACHE_FILE, "w") as f:
-            json.dump(final_results, f)
-        print("Data cached.")
-    except Exception as e:
-        print(f"Warning: Could not save cache: {e}")
+        conn = occurrence_db.connect(db_path)
+    except FileNotFoundError:
+        print(f"No occurrence database at {db_path}: run `analyze` first, or pass --db.")
+        return 1
+    try:
+        rows = occurrence_db.source_summary(conn)
+        n_patterns = occurrence_db.pattern_total(conn)
+    finally:
+        conn.close()
 
-    return final_results
+    print(f"{'Source':<30}{'Documents':>10}{'Patterns':>10}{'Occurrences':>13}")
+    for source, documents, patterns, occurrences in rows:
+        print(f"{source:<30}{documents:>10}{patterns:>10}{occurrences:>13}")
+    print(f"\n{len(rows)} sources, {sum(r[1] for r in rows)} documents, {n_patterns} distinct patterns, "
+          f"{sum(r[3] for r in rows)} occurrences")
+    return 0
 
 
 if __name__ == "__main__":
-    # Load from cache or process
-    results = load_or_process_data(CACHE_FILE)
-    export_json(results)
+    args = parse_args()
+
+    if args.command == "stats":
+        sys.exit(print_stats(args.db))
+    elif args.command == "watch":
+        from watch_server import serve
+        serve(args.corpus, args.host, args.port, args.interval, args.debounce,
+              sharded=args.sharded, format_version=args.format_version, similarity=args.similarity,
+              equivalence_distance=args.equivalence_distance, jobs=args.jobs,
+              asset_dir=os.path.join(args.cache_dir, "assets"), formats=args.formats)
+    else:
+        report = RunReport()
+        report.extra["config"] = vars(args)
+
+        with profiled(report, args.profile, args.tracemalloc):
+            if args.command == "analyze":
+                run_analyze(args, report)
+            elif args.command == "export":
+                run_export(args, report)
+            elif args.from_db:
+                run_export(args, report, load_db_results(args.db, report))
+            else:
+                # The export reads back what the analysis wrote, only it holds the whole corpus
+                run_analyze(args, report)
+                run_export(args, report)
+
+        report.print_summary()
+        report.write(args.report)
+        print(f"Wrote run report to {args.report}")
@@ -0,0 +1,283 @@
+"""Benchmark for the analysis pipeline on a synthetic corpus.
+
+Generates a corpus with synthetic_corpus.py, then runs each stage in its own
+process so peak RSS is measured per stage:
+
+    analyze           analyze_corpus on the generated export (no cache)
+    export-v1         export_json, data.json format v1
+    export-v2         export_json, data.json format v2
+    export-sharded    export_json with --sharded (format v1 shards)
+
+Usage:
+    python3 scripts/benchmark.py --sources 20 --documents 50 --notes 800 --output bench.json
+    python3 scripts/benchmark.py ... --baseline bench.json
+
+A report can be saved as a baseline; later runs with --baseline print the
+change per stage and exit with status 1 if a stage got slower or bigger than
+the tolerance.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+
+STAGES = ["analyze", "export-v1", "export-v2", "export-sharded"]
+EXPORT_STAGES = {
+    "export-v1": {"sharded": False, "format_version": 1},
+    "export-v2": {"sharded": False, "format_version": 2},
+    "export-sharded": {"sharded": True, "format_version": 1},
+}
+RESULTS_FILE = "benchmark_results.json"
+
+# Metrics compared against a baseline; all of them are "lower is better"
+COMPARED_METRICS = ["seconds", "peak_rss_mb", "export_bytes"]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if sys.platform == "darwin":
+        rss /= 1024
+    return round(rss / 1024, 1)
+
+
+def count_occurrences(results):
+    return sum(len(occ) for patterns in results.values() for occ in patterns.values())
+
+
+def count_documents(corpus_path):
+    # Documents the analysis actually processes (TR/GS documents are filtered out)
+    docs = [os.path.basename(os.path.dirname(p)) for p in glob.glob(os.path.join(corpus_path, "*", "*", "data.json"))]
+    return sum(1 for d in docs if not (d.endswith("TR") or d.endswith("GS")))
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def run_stage(stage, workdir, jobs):
+    """Runs one stage in the current process (called in a fresh child process) and returns its metrics."""
+    sys.path.insert(0, SCRIPTS_DIR)
+    os.chdir(workdir)
+    from analyze_transcriptions import analyze_corpus, export_json
+
+    metrics = {"stage": stage}
+    if stage == "analyze":
+        start = time.perf_counter()
+        results = analyze_corpus("export", jobs=jobs, cache_dir=None)
+        elapsed = time.perf_counter() - start
+
+        documents = count_documents("export")
+        occurrences = count_occurrences(results)
+        metrics.update({
+            "seconds": round(elapsed, 4),
+            "documents": documents,
+            "occurrences": occurrences,
+            "patterns": sum(len(patterns) for patterns in results.values()),
+            "documents_per_second": round(documents / elapsed, 1) if elapsed else None,
+            "occurrences_per_second": round(occurrences / elapsed, 1) if elapsed else None,
+        })
+        # Handed to the export stages, outside of the timed section
+        with open(RESULTS_FILE, "w") as f:
+            json.dump(results, f)
+    else:
+        with open(RESULTS_FILE) as f:
+            results = json.load(f)
+        shutil.rmtree("ui/public", ignore_errors=True)
+
+        start = time.perf_counter()
+        export_json(results, **EXPORT_STAGES[stage])
+        elapsed = time.perf_counter() - start
+
+        occurrences = count_occurrences(results)
+        metrics.update({
+            "seconds": round(elapsed, 4),
+            "occurrences": occurrences,
+            "occurrences_per_second": round(occurrences / elapsed, 1) if elapsed else None,
+            "export_bytes": directory_size("ui/public"),
+            "index_bytes": os.path.getsize("ui/public/data.json"),
+        })
+
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    if jobs > 1:
+        metrics["worker_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return metrics
+
+
+def run_stage_in_child(stage, workdir, jobs, verbose=False):
+    report_file = os.path.join(workdir, f"stage-{stage}.json")
+    cmd = [sys.executable, os.path.abspath(__file__), "--stage", stage,
+           "--workdir", workdir, "--jobs", str(jobs), "--stage-report", report_file]
+    output = None if verbose else subprocess.DEVNULL
+    subprocess.run(cmd, check=True, stdout=output)
+    with open(report_file) as f:
+        return json.load(f)
+
+
+def prepare_workdir(workdir, sources, documents, notes, seed):
+    from synthetic_corpus import generate
+
+    corpus_path = os.path.join(workdir, "export")
+    shutil.rmtree(corpus_path, ignore_errors=True)
+    start = time.perf_counter()
+    summary = generate(corpus_path, sources, documents, notes, seed)
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    summary["bytes"] = directory_size(corpus_path)
+
+    # export_json reads the glyphs relative to the working directory
+    glyphs = os.path.join(workdir, "glyphs")
+    if not os.path.exists(glyphs) and os.path.isdir(os.path.join(REPO_DIR, "glyphs")):
+        shutil.copytree(os.path.join(REPO_DIR, "glyphs"), glyphs)
+    return summary
+
+
+def run_benchmark(args):
+    sys.path.insert(0, SCRIPTS_DIR)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cm-benchmark-")
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        print(f"Generating corpus in {workdir} ...")
+        corpus = prepare_workdir(workdir, args.sources, args.documents, args.notes, args.seed)
+        print(f"Generated {corpus['documents']} documents, {corpus['notes']} notes ({corpus['bytes']} bytes)")
+
+        stages = {}
+        for stage in args.stages:
+            runs = []
+            for _ in range(args.repeat):
+                runs.append(run_stage_in_child(stage, workdir, args.jobs, args.verbose))
+            # Keep the fastest repetition; its other metrics are deterministic or close to it
+            best = min(runs, key=lambda m: m["seconds"])
+            best["repeat"] = args.repeat
+            stages[stage] = best
+            print(format_stage(best))
+    finally:
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": {
+            "sources": args.sources,
+            "documents": args.documents,
+            "notes": args.notes,
+            "seed": args.seed,
+            "jobs": args.jobs,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "corpus": corpus,
+        "stages": stages,
+    }
+
+
+def format_stage(m):
+    parts = [f"{m['stage']:<16}{m['seconds']:>9.3f} s"]
+    if "documents_per_second" in m:
+        parts.append(f"{m['documents_per_second']:>10.1f} docs/s")
+    if m.get("occurrences_per_second") is not None:
+        parts.append(f"{m['occurrences_per_second']:>12.1f} occ/s")
+    parts.append(f"{m['peak_rss_mb']:>8.1f} MB RSS")
+    if "export_bytes" in m:
+        parts.append(f"{m['export_bytes']:>12} bytes")
+    return "  ".join(parts)
+
+
+def compare_reports(report, baseline, tolerance=0.1):
+    """Compares two reports stage by stage.
+
+    Returns a list of (stage, metric, baseline_value, value, change) and the list of
+    regressions, the rows whose change exceeds the tolerance (0.1 = 10% worse).
+    """
+    rows = []
+    regressions = []
+    for stage, metrics in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in metrics or not base.get(metric):
+                continue
+            change = metrics[metric] / base[metric] - 1
+            row = (stage, metric, base[metric], metrics[metric], change)
+            rows.append(row)
+            if change > tolerance:
+                regressions.append(row)
+    return rows, regressions
+
+
+def print_comparison(rows, regressions):
+    print(f"\n{'stage':<16}{'metric':<14}{'baseline':>14}{'current':>14}{'change':>10}")
+    for row in rows:
+        stage, metric, base, current, change = row
+        flag = "  <-- regression" if row in regressions else ""
+        print(f"{stage:<16}{metric:<14}{base:>14}{current:>14}{change:>+10.1%}{flag}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on a synthetic corpus.")
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=20, help="Documents per source.")
+    parser.add_argument("--notes", type=int, default=500, help="Notes per document.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes for the analyze stage.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="Run every stage N times and keep the fastest.")
+    parser.add_argument("--output", help="Write the report as JSON (usable as a later --baseline).")
+    parser.add_argument("--baseline", help="Compare against a saved report.")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed relative regression against the baseline (default 0.1 = 10%%).")
+    parser.add_argument("--workdir", help="Directory for the corpus and exports (default: a temporary directory).")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the pipeline's own output.")
+    # Internal: run a single stage and write its metrics to --stage-report
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--stage-report", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.stage:
+        metrics = run_stage(args.stage, args.workdir, args.jobs)
+        with open(args.stage_report, "w") as f:
+            json.dump(metrics, f)
+        sys.exit(0)
+
+    report = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        rows, regressions = compare_reports(report, baseline, args.tolerance)
+        print_comparison(rows, regressions)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
@@ -0,0 +1,115 @@
+"""Reader and writer for the data.json occurrence formats.
+
+Version 1 (the original format) stores every occurrence as a list
+[doc_id, folio, line, syllable, notes_str] under its source and pattern.
+
+Version 2 is dictionary-encoded and columnar. Each source has one string table
+per field and five parallel integer columns indexing into them. The
+occurrences of a pattern are a contiguous run of rows, so a pattern only
+needs its count:
+
+    {"patterns": ["*u", "*d"],
+     "counts": [2, 1],
+     "strings": [["S0D1"], ["145v", "146"], ["1", "3"], ["Al", "le", "lu"], ["C4-D4", "D4-C4"]],
+     "columns": [[0, 0, 0], [0, 1, 1], [0, 1, 1], [0, 1, 2], [0, 0, 1]]}
+"""
+import json
+import os
+
+FORMAT_VERSION = 2
+FIELDS = ("doc", "folio", "line", "syllable", "notes")
+
+
+def encode_source(patterns):
+    """Encodes one source's {pattern: [occurrence, ...]} dict into the v2 layout."""
+    strings = [[] for _ in FIELDS]
+    lookups = [{} for _ in FIELDS]
+    columns = [[] for _ in FIELDS]
+    fields = list(zip(strings, lookups, columns))
+    counts = []
+
+    for occurrences in patterns.values():
+        counts.append(len(occurrences))
+        for occ in occurrences:
+            for (table, lookup, col), value in zip(fields, occ):
+                idx = lookup.get(value)
+                if idx is None:
+                    idx = lookup[value] = len(table)
+                    table.append(value)
+                col.append(idx)
+
+    return {
+        "patterns": list(patterns.keys()),
+        "counts": counts,
+        "strings": strings,
+        "columns": columns
+    }
+
+
+def decode_source(encoded):
+    """Inverse of encode_source."""
+    rows = [
+        [table[i] for table, i in zip(encoded["strings"], row)]
+        for row in zip(*encoded["columns"])
+    ]
+    patterns = {}
+    start = 0
+    for pat, count in zip(encoded["patterns"], encoded["counts"]):
+        patterns[pat] = rows[start:start + count]
+        start += count
+    return patterns
+
+
+def encode_data(data):
+    return {src: encode_source(patterns) for src, patterns in data.items()}
+
+
+def decode_data(data):
+    return {src: decode_source(encoded) for src, encoded in data.items()}
+
+
+def to_v2(export_obj):
+    """Returns a copy of a v1 export object with its occurrence data in v2 form."""
+    out = {"version": FORMAT_VERSION}
+    out.update(export_obj)
+    out["data"] = encode_data(export_obj["data"])
+    return out
+
+
+def to_v1(export_obj):
+    """Returns an export object with v1 occurrence data, whatever version it was written in."""
+    version = export_obj.get("version", 1)
+    if version == 1:
+        return export_obj
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported data.json version: {version}")
+    out = {k: v for k, v in export_obj.items() if k != "version"}
+    out["data"] = decode_data(export_obj["data"])
+    return out
+
+
+def write_export(path, export_obj, version=1):
+    """Writes export_obj in the given version and returns the object that was written.
+
+    The file is written under a temporary name and moved into place, so a
+    reader (the dev server, the watch mode) never sees a half-written file.
+    """
+    separators = None
+    if version == FORMAT_VERSION:
+        export_obj = to_v2(export_obj)
+        # Separators matter here: the integer columns are most of the payload
+        separators = (",", ":")
+    elif version != 1:
+        raise ValueError(f"Unsupported data.json version: {version}")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(export_obj, f, separators=separators)
+    os.replace(tmp_path, path)
+    return export_obj
+
+
+def read_export(path):
+    """Reads a data.json file of any version and returns it in the v1 shape."""
+    with open(path, "r") as f:
+        return to_v1(json.load(f))
@@ -0,0 +1,128 @@
+"""Table-driven pattern encoding.
+
+Instead of calling pitch_to_midi, get_direction and get_suffix once per note,
+a whole document is encoded from flat per-note arrays. Every note contributes
+one token, looked up in a precomputed table, ("*" or its direction) + suffix,
+and every group of two or more notes is wrapped in brackets.
+
+The tables are generated from logic.py, so the output is identical by construction.
+"""
+from logic import NOTE_OFFSETS, get_direction, get_suffix
+
+NOTE_TYPES = ("Normal", "Oriscus", "Quilisma", "Liquescent", "Strophicus")
+TYPE_CODES = {name: code for code, name in enumerate(NOTE_TYPES)}
+
+# Direction codes: sign of the interval + 1, and START for the first note of a unit
+DOWN, EQUAL, UP, START = 0, 1, 2, 3
+DIRECTIONS = (get_direction(1, 0), get_direction(0, 0), get_direction(0, 1), "*")
+
+# SUFFIXES[TYPE_CODES[note_type] * 2 + liquescent]
+SUFFIXES = tuple(
+    get_suffix(name, liq)
+    for name in NOTE_TYPES
+    for liq in (False, True)
+)
+
+# TOKENS[direction * len(SUFFIXES) + suffix]; group brackets are added per group
+TOKENS = tuple(
+    direction + suffix
+    for direction in DIRECTIONS
+    for suffix in SUFFIXES
+)
+
+_BASE_OFFSETS = dict(NOTE_OFFSETS)
+_BASE_OFFSETS.update({b.lower(): off for b, off in NOTE_OFFSETS.items()})
+
+
+def midi_pitch(base, octave):
+    """Same result as logic.pitch_to_midi."""
+    offset = _BASE_OFFSETS.get(base)
+    if offset is None:
+        offset = NOTE_OFFSETS.get(base.upper(), 0)
+    return int(octave) * 12 + offset
+
+
+def type_code(note_type, liquescent):
+    """Packs a note type and liquescent flag into an index of SUFFIXES."""
+    return TYPE_CODES.get(note_type, 0) * 2 + (1 if liquescent else 0)
+
+
+def direction_codes(pitches):
+    """Direction code from each note to the next, for the whole array at once."""
+    return [(b > a) - (b < a) + 1 for a, b in zip(pitches, pitches[1:])]
+
+
+class DocumentEncoder:
+    """Collects the note groups of a document as flat arrays and encodes them in one pass.
+
+    Usage: call add_unit() for every nonSpaced unit, then encode() returns
+    one pattern string per unit, in order.
+    """
+
+    __slots__ = ("pitches", "types", "liquescent", "groups", "unit_starts")
+
+    def __init__(self):
+        self.pitches = []
+        self.types = []
+        self.liquescent = []
+        # (first, last) note index of every group with two or more notes
+        self.groups = []
+        # Index of the first note of every unit
+        self.unit_starts = []
+
+    def __len__(self):
+        return len(self.unit_starts)
+
+    def add_unit(self, pitches, types, liquescent, group_sizes):
+        """Adds one unit given as flat arrays.
+
+        pitches: MIDI pitch per note (see midi_pitch)
+        types: note type code per note (see TYPE_CODES)
+        liquescent: liquescent flag per note
+        group_sizes: number of notes in each group, summing to len(pitches)
+        """
+        start = len(self.pitches)
+        self.unit_starts.append(start)
+        self.pitches.extend(pitches)
+        self.types.extend(types)
+        self.liquescent.extend(liquescent)
+        for size in group_sizes:
+            if size > 1:
+                self.groups.append((start, start + size - 1))
+            start += size
+
+    def encode(self):
+        pitches = self.pitches
+        n = len(pitches)
+        if not n:
+            return [""] * len(self.unit_starts)
+
+        k = len(SUFFIXES)
+        dirs = [START * k]
+        dirs += [d * k for d in direction_codes(pitches)]
+        for start in self.unit_starts:
+            if start < n:
+                dirs[start] = START * k
+
+        tokens = [
+            TOKENS[d + t + t + (1 if l else 0)]
+            for d, t, l in zip(dirs, self.types, self.liquescent)
+        ]
+        for first, last in self.groups:
+            tokens[first] = "[" + tokens[first]
+            tokens[last] = tokens[last] + "]"
+
+        bounds = self.unit_starts + [n]
+        return ["".join(tokens[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def encode_unit(groups):
+    """Encodes a single unit given as a list of groups of (midi_pitch, note_type, liquescent) notes."""
+    encoder = DocumentEncoder()
+    encoder.add_unit(
+        [pitch for grp in groups for pitch, _, _ in grp],
+        [TYPE_CODES.get(note_type, 0) for grp in groups for _, note_type, _ in grp],
+        [liq for grp in groups for _, _, liq in grp],
+        [len(grp) for grp in groups]
+    )
+    return encoder.encode()[0]
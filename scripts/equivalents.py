@@ -0,0 +1,221 @@
+"""Near-equivalent pattern clustering.
+
+Transcription equivalents are patterns that differ by a small edit: one note
+suffix (O, Q, L, S) more or less, or one direction step changed. This module
+finds every pair of distinct patterns within a given Levenshtein distance and
+groups the patterns into clusters around their most frequent member.
+
+Comparing all pairs does not scale, so candidates come from a deletion
+neighbourhood index: two strings within edit distance k always share a string
+obtained by deleting at most k characters from each. Only candidate pairs are
+checked, with a banded edit distance that stops as soon as the band exceeds k.
+Candidate checks run in a process pool.
+"""
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+DEFAULT_DISTANCE = 1
+
+# Set in each worker process by _init_worker
+_patterns = None
+_index = None
+_distance = None
+
+
+def deletion_variants(text, k):
+    """Every string obtained by deleting at most k characters from text."""
+    variants = {text}
+    n = len(text)
+    for d in range(1, min(k, n) + 1):
+        for positions in combinations(range(n), d):
+            chars = list(text)
+            for p in reversed(positions):
+                del chars[p]
+            variants.add("".join(chars))
+    return variants
+
+
+def build_deletion_index(patterns, k):
+    """{variant: [pattern id, ...]}, ids in increasing order."""
+    index = {}
+    for pid, pat in enumerate(patterns):
+        for variant in deletion_variants(pat, k):
+            index.setdefault(variant, []).append(pid)
+    return index
+
+
+def bounded_distance(a, b, k):
+    """Levenshtein distance of a and b if it is at most k, else None.
+
+    Only the diagonal band of width 2k+1 is computed, and the computation stops
+    as soon as every cell of a row exceeds k.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    la, lb = len(a), len(b)
+    if lb - la > k:
+        return None
+
+    # A common prefix and suffix do not change the distance
+    start = 0
+    while start < la and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < la - start and a[la - 1 - end] == b[lb - 1 - end]:
+        end += 1
+    if start or end:
+        a = a[start:la - end]
+        b = b[start:lb - end]
+        la, lb = len(a), len(b)
+    if not la:
+        return lb
+
+    over = k + 1
+    prev = [j if j <= k else over for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        cur = [over] * (lb + 1)
+        cur[0] = i if i <= k else over
+        ca = a[i - 1]
+        lo = max(1, i - k)
+        hi = min(lb, i + k)
+        best = cur[0]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            if v > over:
+                v = over
+            cur[j] = v
+            if v < best:
+                best = v
+        if best > k:
+            return None
+        prev = cur
+
+    return prev[lb] if prev[lb] <= k else None
+
+
+def _init_worker(patterns, k):
+    global _patterns, _index, _distance
+    _patterns = patterns
+    _distance = k
+    _index = build_deletion_index(patterns, k)
+
+
+def _edges_for_range(start, stop):
+    """Edges (i, j, distance) with start <= i < stop and i < j."""
+    patterns, index, k = _patterns, _index, _distance
+    edges = []
+    for i in range(start, stop):
+        a = patterns[i]
+        candidates = set()
+        for variant in deletion_variants(a, k):
+            for j in index[variant]:
+                if j > i:
+                    candidates.add(j)
+        for j in sorted(candidates):
+            d = bounded_distance(a, patterns[j], k)
+            if d is not None:
+                edges.append((i, j, d))
+    return edges
+
+
+def find_edges(patterns, k=DEFAULT_DISTANCE, jobs=1, chunk_size=500):
+    """All pairs of patterns within edit distance k, as sorted (i, j, distance) with i < j."""
+    if k <= 0 or len(patterns) < 2:
+        return []
+
+    # The index is built once here; forked workers inherit it, others rebuild it
+    _init_worker(patterns, k)
+    ranges = [(s, min(s + chunk_size, len(patterns))) for s in range(0, len(patterns), chunk_size)]
+    if jobs <= 1 or len(ranges) <= 1:
+        edges = []
+        for start, stop in ranges:
+            edges.extend(_edges_for_range(start, stop))
+        return edges
+
+    forked = multiprocessing.get_start_method() == "fork"
+    edges = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(ranges)),
+                             initializer=None if forked else _init_worker,
+                             initargs=() if forked else (patterns, k)) as pool:
+        # map keeps the ranges in order, so the edge list is the same as a serial run
+        for chunk in pool.map(_edges_for_range, *zip(*ranges)):
+            edges.extend(chunk)
+    return edges
+
+
+def cluster_patterns(data_js, k=DEFAULT_DISTANCE, jobs=1):
+    """Groups the patterns of {source: {pattern: [occurrence, ...]}} into equivalence clusters.
+
+    Clusters are centred on their most frequent pattern: going from the most to
+    the least frequent pattern, every pattern not yet in a cluster starts one and
+    takes in all unclustered patterns within distance k of it. Unlike connected
+    components this cannot chain, every member is within k of the representative.
+
+    Returns a list of clusters with at least two patterns, most frequent first:
+      {"representative": pattern,
+       "patterns": [pattern, ...]     representative first, then by frequency,
+       "distances": [0, d, ...]       distance of each pattern to the representative,
+       "counts": {source: occurrences of any pattern of the cluster},
+       "total": occurrences}
+    """
+    pattern_counts = {}
+    for src, patterns in data_js.items():
+        for pat, occurrences in patterns.items():
+            per_source = pattern_counts.get(pat)
+            if per_source is None:
+                per_source = pattern_counts[pat] = {}
+            per_source[src] = len(occurrences)
+
+    patterns = sorted(pattern_counts)
+    totals = [sum(pattern_counts[p].values()) for p in patterns]
+
+    neighbours = {}
+    for i, j, d in find_edges(patterns, k, jobs):
+        neighbours.setdefault(i, []).append((j, d))
+        neighbours.setdefault(j, []).append((i, d))
+
+    def by_frequency(pid):
+        return (-totals[pid], patterns[pid])
+
+    assigned = set()
+    clusters = []
+    for center in sorted(neighbours, key=by_frequency):
+        if center in assigned:
+            continue
+        members = sorted(
+            ((pid, d) for pid, d in neighbours[center] if pid not in assigned),
+            key=lambda m: by_frequency(m[0])
+        )
+        if not members:
+            continue
+        assigned.add(center)
+        assigned.update(pid for pid, _ in members)
+
+        pids = [center] + [pid for pid, _ in members]
+        counts = {}
+        for pid in pids:
+            for src, n in pattern_counts[patterns[pid]].items():
+                counts[src] = counts.get(src, 0) + n
+        clusters.append({
+            "representative": patterns[center],
+            "patterns": [patterns[pid] for pid in pids],
+            "distances": [0] + [d for _, d in members],
+            "counts": dict(sorted(counts.items())),
+            "total": sum(totals[pid] for pid in pids)
+        })
+
+    clusters.sort(key=lambda c: (-c["total"], c["representative"]))
+    return clusters
+
+
+def write_equivalents(data_js, path, k=DEFAULT_DISTANCE, jobs=1):
+    clusters = cluster_patterns(data_js, k, jobs)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"distance": k, "clusters": clusters}, f, separators=(",", ":"))
+    return clusters
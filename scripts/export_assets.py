@@ -0,0 +1,115 @@
+"""Glyph table and manifest map for the export, cached in sidecar files.
+
+Parsing glyphs/*.svg is cheap, but reading data/raw/Quellendaten.xlsx needs
+pandas and openpyxl, which take longer to import than a cached export takes to
+run. Both results are stored as JSON sidecars next to the source cache,
+together with the mtime and size of every input file. A sidecar is used as
+long as its inputs are unchanged and rebuilt otherwise.
+"""
+import json
+import os
+import re
+
+from source_cache import CACHE_DIR
+
+ASSET_DIR = os.path.join(CACHE_DIR, "assets")
+EXCEL_PATH = "data/raw/Quellendaten.xlsx"
+
+GLYPH_FILES = {
+    "note": "glyphs/note.svg",
+    "oriscus": "glyphs/oriscus.svg",
+    "quilisma": "glyphs/quilisma.svg",
+    "ascending": "glyphs/ascending.svg",
+    "descending": "glyphs/descending.svg",
+    "strophicus": "glyphs/strophicus.svg"
+}
+
+# Used for glyph files that do not exist
+FALLBACK_GLYPH = {"viewBox": "0 0 10 10", "d": "M5,5 L10,10"}
+
+
+def file_stamp(path):
+    """[mtime_ns, size] of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def cached(sidecar, inputs, build):
+    """Returns build(), reusing the value stored in sidecar while inputs are unchanged."""
+    stamps = {path: file_stamp(path) for path in inputs}
+    try:
+        with open(sidecar, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry["inputs"] == stamps:
+            return entry["value"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    value = build()
+    try:
+        os.makedirs(os.path.dirname(sidecar) or ".", exist_ok=True)
+        tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"inputs": stamps, "value": value}, f)
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        print(f"Warning: Could not write {sidecar}: {e}")
+    return value
+
+
+def read_glyph(path):
+    """{"viewBox", "d"} of the first path in an SVG file."""
+    with open(path, "r") as f:
+        content = f.read()
+    vb = "0 0 10 10"
+    m_vb = re.search(r'viewBox="([^"]+)"', content)
+    if m_vb: vb = m_vb.group(1)
+
+    m_d = re.search(r' d="([^"]+)"', content)
+    d_val = ""
+    if m_d: d_val = m_d.group(1)
+
+    return {"viewBox": vb, "d": d_val}
+
+
+def read_glyphs(glyph_files=GLYPH_FILES):
+    glyphs = {}
+    for name, path in glyph_files.items():
+        if os.path.exists(path):
+            glyphs[name] = read_glyph(path)
+        else:
+            glyphs[name] = dict(FALLBACK_GLYPH)
+    return glyphs
+
+
+def read_manifest_map(excel_path=EXCEL_PATH):
+    """{source sigle: {"url": manifest}} from the Quellendaten sheet."""
+    import pandas as pd
+
+    df = pd.read_excel(excel_path)
+    manifest_map = {}
+    if "Quellensigle" in df.columns and "Manifest" in df.columns:
+        for sigle, manifest in zip(df["Quellensigle"], df["Manifest"]):
+            if pd.notna(manifest):
+                manifest_map[sigle] = {"url": manifest}
+    return manifest_map
+
+
+def load_glyphs(asset_dir=ASSET_DIR, glyph_files=GLYPH_FILES):
+    return cached(os.path.join(asset_dir, "glyphs.json"), list(glyph_files.values()),
+                  lambda: read_glyphs(glyph_files))
+
+
+def load_manifest_map(asset_dir=ASSET_DIR, excel_path=EXCEL_PATH):
+    if not os.path.exists(excel_path):
+        print(f"Warning: {excel_path} not found.")
+        return {}
+    try:
+        return cached(os.path.join(asset_dir, "manifests.json"), [excel_path],
+                      lambda: read_manifest_map(excel_path))
+    except Exception as e:
+        print(f"Warning: Could not load Quellendaten.xlsx: {e}")
+        return {}
@@ -0,0 +1,130 @@
+"""Output formats of the export.
+
+data.json is always written. Next to it the export can write other formats of
+the same object:
+
+    gz        data.json.gz, gzip-compressed copy
+    br        data.json.br, brotli-compressed copy (needs the brotli package)
+    msgpack   data.msgpack, MessagePack encoding (needs msgpack)
+    cbor      data.cbor, CBOR encoding (needs cbor2)
+
+The compressed copies are made from the bytes of data.json, so they decompress
+to exactly that file and can be served by static hosts that support
+precompressed files (they end up in docs/ with the rest of ui/public on build).
+Copies of formats that were not requested are removed, so a host never serves
+a stale one.
+"""
+import gzip
+import importlib.util
+import os
+import time
+
+
+def _gzip(obj, raw):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(raw, compresslevel=9, mtime=0)
+
+
+def _brotli(obj, raw):
+    import brotli
+    return brotli.compress(raw, quality=11)
+
+
+def _msgpack(obj, raw):
+    import msgpack
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def _cbor(obj, raw):
+    import cbor2
+    return cbor2.dumps(obj)
+
+
+# name -> (suffix replacing .json, module it needs, encoder)
+FORMATS = {
+    "gz": (".json.gz", None, _gzip),
+    "br": (".json.br", "brotli", _brotli),
+    "msgpack": (".msgpack", "msgpack", _msgpack),
+    "cbor": (".cbor", "cbor2", _cbor),
+}
+
+_JSON_KEYS = {True: "true", False: "false", None: "null"}
+
+
+def available(name):
+    module = FORMATS[name][1]
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def format_path(path, name):
+    return os.path.splitext(path)[0] + FORMATS[name][0]
+
+
+def _plain_key(key):
+    # The key conversion json.dumps applies
+    if isinstance(key, str):
+        return key
+    if isinstance(key, (bool, type(None))):
+        return _JSON_KEYS[key]
+    if isinstance(key, float):
+        return float.__repr__(key)
+    return str(key)
+
+
+def to_plain(obj):
+    """obj with plain dicts with string keys and lists, as json.loads(json.dumps(obj)) would return it.
+
+    Unlike the round-trip, nothing is serialized, and lists that are already
+    plain (the occurrence records) are reused instead of copied.
+    """
+    if isinstance(obj, dict):
+        return {_plain_key(k): to_plain(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        if all(type(v) is str for v in obj):
+            return obj
+        items = [to_plain(v) for v in obj]
+        if all(a is b for a, b in zip(items, obj)):
+            return obj
+        return items
+    if isinstance(obj, tuple):
+        return [to_plain(v) for v in obj]
+    return obj
+
+
+def write_formats(path, obj, formats, json_seconds=None):
+    """Writes the requested formats of the export at path, whose object is obj.
+
+    Returns one row per file, data.json first:
+    {"format", "path", "bytes", "seconds"}; seconds is the encode time
+    (json_seconds for data.json itself).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    rows = [{"format": "json", "path": path, "bytes": len(raw), "seconds": json_seconds}]
+
+    for name, (_, module, encode) in FORMATS.items():
+        out_path = format_path(path, name)
+        if name not in formats or not available(name):
+            if name in formats:
+                print(f"Warning: Skipping {name} export, the {module} package is not installed.")
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            continue
+
+        start = time.perf_counter()
+        payload = encode(obj, raw)
+        seconds = time.perf_counter() - start
+        tmp_path = f"{out_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, out_path)
+        rows.append({"format": name, "path": out_path, "bytes": len(payload), "seconds": round(seconds, 4)})
+    return rows
+
+
+def print_formats(rows):
+    base = rows[0]["bytes"] or 1
+    print(f"\n{'Format':<10}{'Bytes':>14}{'Ratio':>8}{'Seconds':>10}  File")
+    for row in rows:
+        seconds = "" if row["seconds"] is None else f"{row['seconds']:.3f}"
+        print(f"{row['format']:<10}{row['bytes']:>14}{row['bytes'] / base:>8.2f}{seconds:>10}  {row['path']}")
@@ -0,0 +1,190 @@
+"""Run instrumentation for the analysis pipeline.
+
+A RunReport collects wall-clock time per pipeline stage, counters per source
+directory and the errors that were skipped over. Worker processes fill their
+own report and send it back as a plain dict (to_dict), which the parent merges,
+so the report of a parallel run covers every source. Stage times of workers
+are summed, so with --jobs > 1 they can add up to more than the wall time.
+"""
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+import traceback
+from contextlib import contextmanager
+
+# Printing order of the summary; stages not listed here are printed after these
+STAGES = (
+    "fingerprint",
+    "cache_read",
+    "load_corpus",
+    "traverse",
+    "encode",
+    "cache_write",
+    "merge",
+    "db_write",
+    "db_read",
+    "manifests",
+    "scans",
+    "equivalents",
+    "export",
+    "formats",
+)
+
+COUNTERS = ("documents", "filtered", "syllables", "notes", "occurrences", "patterns", "errors", "cached")
+
+
+class RunReport:
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        # name -> [seconds, calls]
+        self.stages = {}
+        # source directory -> counters
+        self.sources = {}
+        self.errors = []
+        self.extra = {}
+        # Seconds spent in the stages nested in each open stage, innermost last
+        self._nested = []
+
+    @contextmanager
+    def stage(self, name):
+        """Times the block as stage name.
+
+        Time spent in a stage nested in the block is counted for that stage
+        only, so the stages add up to the time spent in them.
+        """
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += seconds
+            self.add_time(name, seconds - nested)
+
+    def add_time(self, name, seconds, calls=1):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = [0.0, 0]
+        entry[0] += seconds
+        entry[1] += calls
+
+    def source(self, name):
+        """Counters of a source directory, created on first use."""
+        counters = self.sources.get(name)
+        if counters is None:
+            counters = self.sources[name] = dict.fromkeys(COUNTERS, 0)
+        return counters
+
+    def error(self, source, exc, document=None):
+        self.source(source)["errors"] += 1
+        self.errors.append({
+            "source": source,
+            "document": document,
+            "type": type(exc).__name__,
+            "message": str(exc),
+            "traceback": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+        })
+
+    def merge(self, other):
+        """Merges a report dict (from a worker's to_dict) into this one."""
+        for name, entry in other["stages"].items():
+            self.add_time(name, entry["seconds"], entry["calls"])
+        for name, counters in other["sources"].items():
+            mine = self.source(name)
+            for key, value in counters.items():
+                mine[key] = mine.get(key, 0) + value
+        self.errors.extend(other["errors"])
+
+    def totals(self):
+        totals = dict.fromkeys(COUNTERS, 0)
+        for counters in self.sources.values():
+            for key, value in counters.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def to_dict(self):
+        report = {
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self._start, 4),
+            "stages": {
+                name: {"seconds": round(seconds, 4), "calls": calls}
+                for name, (seconds, calls) in self.stages.items()
+            },
+            "totals": self.totals(),
+            "sources": self.sources,
+            "errors": self.errors,
+        }
+        report.update(self.extra)
+        return report
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print_summary(self):
+        names = [s for s in STAGES if s in self.stages]
+        names += sorted(s for s in self.stages if s not in STAGES)
+        print("\nStage            Seconds    Calls")
+        for name in names:
+            seconds, calls = self.stages[name]
+            print(f"{name:<15}{seconds:>9.3f}{calls:>9}")
+
+        totals = self.totals()
+        print(f"\n{len(self.sources)} sources: " + ", ".join(f"{totals[key]} {key}" for key in COUNTERS))
+        for err in self.errors:
+            where = err["source"] if not err["document"] else f"{err['source']} / {err['document']}"
+            print(f"Error in {where}: {err['type']}: {err['message']}")
+
+
+@contextmanager
+def profiled(report, profile_path=None, trace_memory=False, top=25):
+    """Optionally runs the block under cProfile and/or tracemalloc.
+
+    The cProfile stats are dumped to profile_path (readable with pstats or
+    snakeviz) and the top functions by cumulative time are printed. With
+    trace_memory, the peak traced memory and the top allocation sites are added
+    to the report under "memory". Both only see the main process, so profile
+    with --jobs 1.
+    """
+    profiler = None
+    if profile_path:
+        profiler = cProfile.Profile()
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            print(out.getvalue())
+            print(f"Wrote profile to {profile_path}")
+            report.extra["profile"] = profile_path
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report.extra["memory"] = {
+                "peak_bytes": peak,
+                "top": [
+                    {"location": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:top]
+                ],
+            }
+            print(f"Peak traced memory: {peak / 1024 / 1024:.1f} MB")
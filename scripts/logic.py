@@ -1,9 +1,12 @@
 
+import re
+
+NOTE_OFFSETS = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
 def pitch_to_midi(base, octave):
     """Converts a base note (A-G) and octave to a comparable integer."""
-    offsets = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
     base = base.upper()
-    return int(octave) * 12 + offsets.get(base, 0)
+    return int(octave) * 12 + NOTE_OFFSETS.get(base, 0)
 
 def get_direction(p1, p2):
     if p2 > p1:
@@ -26,3 +29,11 @@ def get_suffix(note_type, is_liquescent):
     
     if l and "L" not in s: s += "L" 
     return s
+
+START_TYPE = "(Start)"
+
+def get_basic_type(pattern):
+    """Returns the contour of a pattern without start marker, brackets and suffixes."""
+    p = re.sub(r"[\*\[\]]", "", pattern)
+    p = re.sub(r"[LQOS]", "", p)
+    return p or START_TYPE
@@ -0,0 +1,305 @@
+"""SQLite occurrence store.
+
+A normalized copy of the analysis results for ad-hoc queries without loading
+data.json:
+
+    sources(id, name)
+    documents(id, source_id, name)
+    patterns(id, pattern, basic_type, length)
+    occurrences(id, source_id, pattern_id, document_id, folio, line, syllable, notes)
+
+with indexes on occurrences (source_id, pattern_id), (source_id, folio) and
+(pattern_id). Occurrence ids follow the order of the results, so load_results
+rebuilds {source: {pattern: [occurrence, ...]}} exactly, and export_json can be
+fed from the database.
+
+CLI examples:
+    python3 scripts/occurrence_db.py transcriptions.db --source "Pa 1235" --folio 145v
+    python3 scripts/occurrence_db.py transcriptions.db --suffix Q --limit 20
+"""
+import argparse
+import os
+import sqlite3
+
+from logic import get_basic_type
+
+DB_PATH = "transcriptions.db"
+
+SCHEMA = """
+CREATE TABLE sources (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE documents (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    name TEXT NOT NULL,
+    UNIQUE (source_id, name)
+);
+CREATE TABLE patterns (
+    id INTEGER PRIMARY KEY,
+    pattern TEXT NOT NULL UNIQUE,
+    basic_type TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE occurrences (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    pattern_id INTEGER NOT NULL REFERENCES patterns(id),
+    document_id INTEGER NOT NULL REFERENCES documents(id),
+    folio TEXT NOT NULL,
+    line TEXT NOT NULL,
+    syllable TEXT NOT NULL,
+    notes TEXT NOT NULL
+);
+"""
+
+# Created after the bulk insert, which is faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX occurrences_source_pattern ON occurrences (source_id, pattern_id);
+CREATE INDEX occurrences_source_folio ON occurrences (source_id, folio);
+CREATE INDEX occurrences_pattern ON occurrences (pattern_id);
+CREATE INDEX documents_name ON documents (name);
+"""
+
+_OCCURRENCE_SELECT = """
+SELECT s.name, p.pattern, d.name, o.folio, o.line, o.syllable, o.notes
+FROM occurrences o
+JOIN sources s ON s.id = o.source_id
+JOIN patterns p ON p.id = o.pattern_id
+JOIN documents d ON d.id = o.document_id
+"""
+
+
+def connect(path=DB_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No occurrence database at {path}")
+    return sqlite3.connect(path)
+
+
+class ResultWriter:
+    """Builds a new database at path from results added one batch at a time.
+
+    The database is built in a temporary file and moved into place by close(),
+    so readers never see a half-written file. Used as a context manager, the
+    temporary file is removed if the block raises.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.tmp_path)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.executescript(SCHEMA)
+        self.source_ids = {}
+        self.pattern_ids = {}
+        self.document_ids = {}
+        self.n_occurrences = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, results):
+        """Inserts {source: {pattern: [[doc, folio, line, syllable, notes], ...]}} after the rows added so far.
+
+        A source added again keeps its id, so load_results merges its batches
+        the way the nested dicts of the batches merge.
+        """
+        conn = self.conn
+        pattern_ids = self.pattern_ids
+        document_ids = self.document_ids
+        with conn:
+            for source, patterns in results.items():
+                source_id = self.source_ids.get(source)
+                if source_id is None:
+                    source_id = self.source_ids[source] = len(self.source_ids) + 1
+                    conn.execute("INSERT INTO sources (id, name) VALUES (?, ?)", (source_id, source))
+                rows = []
+                for pat, occurrences in patterns.items():
+                    pattern_id = pattern_ids.get(pat)
+                    if pattern_id is None:
+                        pattern_id = pattern_ids[pat] = len(pattern_ids) + 1
+                        conn.execute(
+                            "INSERT INTO patterns (id, pattern, basic_type, length) VALUES (?, ?, ?, ?)",
+                            (pattern_id, pat, get_basic_type(pat), len(pat))
+                        )
+                    for doc, folio, line, syllable, notes in occurrences:
+                        document_id = document_ids.get((source_id, doc))
+                        if document_id is None:
+                            document_id = document_ids[(source_id, doc)] = len(document_ids) + 1
+                            conn.execute(
+                                "INSERT INTO documents (id, source_id, name) VALUES (?, ?, ?)",
+                                (document_id, source_id, doc)
+                            )
+                        rows.append((source_id, pattern_id, document_id, folio, line, syllable, notes))
+                conn.executemany(
+                    "INSERT INTO occurrences (source_id, pattern_id, document_id, folio, line, syllable, notes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.n_occurrences += len(rows)
+
+    def close(self):
+        """Creates the indexes and moves the database into place."""
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.executescript(INDEXES)
+        finally:
+            self.conn.close()
+            self.conn = None
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def write_results(path, results):
+    """Writes {source: {pattern: [[doc, folio, line, syllable, notes], ...]}} to a new database at path."""
+    with ResultWriter(path) as writer:
+        writer.add(results)
+    return writer.n_occurrences
+
+
+def load_results(conn):
+    """Reads the whole database back as {source: {pattern: [[doc, folio, line, syllable, notes], ...]}}."""
+    results = {}
+    current_source = current_pattern = None
+    occurrences = None
+    for source, pattern, doc, folio, line, syllable, notes in conn.execute(_OCCURRENCE_SELECT + " ORDER BY o.id"):
+        if source != current_source:
+            current_source = source
+            current_pattern = None
+            patterns = results.setdefault(source, {})
+        if pattern != current_pattern:
+            current_pattern = pattern
+            occurrences = patterns.setdefault(pattern, [])
+        occurrences.append([doc, folio, line, syllable, notes])
+
+    # Sources without any occurrence
+    for (name,) in conn.execute("SELECT name FROM sources ORDER BY id"):
+        results.setdefault(name, {})
+    return results
+
+
+def query_occurrences(conn, source=None, pattern=None, folio=None, document=None, suffix=None,
+                      basic=None, limit=None):
+    """Occurrences matching every given filter, in analysis order.
+
+    suffix: a note-form suffix the pattern must contain (O, Q, L or S),
+            e.g. suffix="Q" for every syllable carrying a quilisma
+    basic: the basic type of the pattern (see logic.get_basic_type)
+    Returns a list of (source, pattern, doc, folio, line, syllable, notes).
+    """
+    where = []
+    params = []
+    if source is not None:
+        where.append("o.source_id = (SELECT id FROM sources WHERE name = ?)")
+        params.append(source)
+    if pattern is not None:
+        where.append("o.pattern_id = (SELECT id FROM patterns WHERE pattern = ?)")
+        params.append(pattern)
+    if folio is not None:
+        where.append("o.folio = ?")
+        params.append(folio)
+    if document is not None:
+        where.append("d.name = ?")
+        params.append(document)
+    if suffix is not None:
+        where.append("instr(p.pattern, ?) > 0")
+        params.append(suffix)
+    if basic is not None:
+        where.append("p.basic_type = ?")
+        params.append(basic)
+
+    sql = _OCCURRENCE_SELECT
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY o.id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def pattern_counts(conn, source=None, document=None):
+    """{pattern: occurrence count}, optionally restricted to a source and/or document."""
+    sql = """
+        SELECT p.pattern, COUNT(*) FROM occurrences o
+        JOIN patterns p ON p.id = o.pattern_id
+        JOIN documents d ON d.id = o.document_id
+    """
+    where = []
+    params = []
+    if source is not None:
+        where.append("o.source_id = (SELECT id FROM sources WHERE name = ?)")
+        params.append(source)
+    if document is not None:
+        where.append("d.name = ?")
+        params.append(document)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY p.pattern ORDER BY COUNT(*) DESC, p.pattern"
+    return dict(conn.execute(sql, params).fetchall())
+
+
+def sources(conn):
+    return [name for (name,) in conn.execute("SELECT name FROM sources ORDER BY id")]
+
+
+def source_summary(conn):
+    """[(source, documents, patterns, occurrences), ...] in source order."""
+    return conn.execute("""
+        SELECT s.name, COUNT(DISTINCT o.document_id), COUNT(DISTINCT o.pattern_id), COUNT(o.id)
+        FROM sources s LEFT JOIN occurrences o ON o.source_id = s.id
+        GROUP BY s.id ORDER BY s.id
+    """).fetchall()
+
+
+def pattern_total(conn):
+    return conn.execute("SELECT COUNT(*) FROM patterns").fetchone()[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the occurrence database.")
+    parser.add_argument("db", nargs="?", default=DB_PATH)
+    parser.add_argument("--source")
+    parser.add_argument("--pattern")
+    parser.add_argument("--folio")
+    parser.add_argument("--document")
+    parser.add_argument("--suffix", choices=["O", "Q", "L", "S"], help="Patterns containing this note-form suffix.")
+    parser.add_argument("--basic", help="Patterns of this basic type.")
+    parser.add_argument("--counts", action="store_true", help="Print pattern counts instead of occurrences.")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    with connect(args.db) as conn:
+        if args.counts:
+            counts = pattern_counts(conn, args.source, args.document)
+            for pat, n in list(counts.items())[:args.limit]:
+                print(f"{pat:<30}{n:>8}")
+            print(f"{len(counts)} patterns")
+        else:
+            rows = query_occurrences(conn, args.source, args.pattern, args.folio, args.document,
+                                     args.suffix, args.basic, args.limit)
+            for row in rows:
+                print("\t".join(row))
+            print(f"{len(rows)} occurrences")
@@ -0,0 +1,110 @@
+"""Compact in-memory storage of analysis results.
+
+The nested {source: {pattern: [[doc, folio, line, syllable, notes], ...]}}
+shape costs a list and five string objects per occurrence. An OccurrenceStore
+keeps every distinct string once and the occurrences as seven parallel
+array("I") columns of string ids (source, pattern, doc, folio, line, syllable,
+notes), about 28 bytes per occurrence.
+
+A store is a list of segments, each with its own string table and columns.
+extend() appends the other store's segments without copying them, and records
+keep their order, so to_nested() of merged stores gives exactly what merging
+the nested dicts in the same order gave. Stores pickle as their string tables
+and raw arrays, so worker processes can send them back as they are.
+"""
+from array import array
+
+FIELDS = ("source", "pattern", "doc", "folio", "line", "syllable", "notes")
+
+
+class Segment:
+    """One string table and the id columns indexing into it."""
+
+    __slots__ = ("strings", "ids", "columns")
+
+    def __init__(self, strings=None, columns=None):
+        self.strings = strings if strings is not None else []
+        self.ids = {s: i for i, s in enumerate(self.strings)}
+        self.columns = columns if columns is not None else tuple(array("I") for _ in FIELDS)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getstate__(self):
+        # The id lookup is rebuilt on load
+        return self.strings, self.columns
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def add(self, values):
+        ids = self.ids
+        strings = self.strings
+        for col, value in zip(self.columns, values):
+            i = ids.get(value)
+            if i is None:
+                i = ids[value] = len(strings)
+                strings.append(value)
+            col.append(i)
+
+
+class OccurrenceStore:
+
+    __slots__ = ("segments", "_open")
+
+    def __init__(self):
+        self.segments = []
+        # Segment that add() writes to; segments taken over by extend() are never written
+        self._open = None
+
+    def __len__(self):
+        return sum(len(seg) for seg in self.segments)
+
+    def add(self, source, pattern, occurrence):
+        """Adds one [doc, folio, line, syllable, notes] occurrence of pattern in source."""
+        if self._open is None:
+            self._open = Segment()
+            self.segments.append(self._open)
+        self._open.add((source, pattern, *occurrence))
+
+    def extend(self, other):
+        """Appends the records of other after the records of this store, sharing its segments."""
+        self.segments.extend(other.segments)
+        self._open = None
+
+    def records(self):
+        """Yields (source, pattern, [doc, folio, line, syllable, notes]) in order."""
+        for seg in self.segments:
+            s = seg.strings
+            for src, pat, doc, folio, line, syllable, notes in zip(*seg.columns):
+                yield s[src], s[pat], [s[doc], s[folio], s[line], s[syllable], s[notes]]
+
+    def pattern_count(self):
+        """Number of distinct (source, pattern) pairs."""
+        pairs = set()
+        for seg in self.segments:
+            s = seg.strings
+            pairs.update((s[src], s[pat]) for src, pat in set(zip(seg.columns[0], seg.columns[1])))
+        return len(pairs)
+
+    def to_nested(self):
+        """{source: {pattern: [[doc, folio, line, syllable, notes], ...]}} with the interned strings."""
+        results = {}
+        for source, pattern, occurrence in self.records():
+            patterns = results.get(source)
+            if patterns is None:
+                patterns = results[source] = {}
+            occurrences = patterns.get(pattern)
+            if occurrences is None:
+                occurrences = patterns[pattern] = []
+            occurrences.append(occurrence)
+        return results
+
+    @classmethod
+    def from_nested(cls, results):
+        store = cls()
+        for source, patterns in results.items():
+            for pattern, occurrences in patterns.items():
+                for occurrence in occurrences:
+                    store.add(source, pattern, occurrence)
+        return store
@@ -0,0 +1,41 @@
+def build_page_index(data_js):
+    """Builds the folio and page-pattern indexes the UI needs, in one pass over the occurrences.
+
+    Returns a dict with:
+      sourceFolios:  {source: [folio, ...]}            folios in order of first occurrence
+      pagePatterns:  {source: {folio: [pattern, ...]}} sorted, deduplicated
+      pageCounts:    {source: {folio: [count, ...]}}   occurrences, parallel to pagePatterns
+      patternCounts: {source: {pattern: count}}
+    """
+    source_folios = {}
+    page_patterns = {}
+    page_counts = {}
+    pattern_counts = {}
+
+    for src, patterns in data_js.items():
+        folio_counts = {}
+        src_counts = {}
+
+        for pat, occurrences in patterns.items():
+            src_counts[pat] = len(occurrences)
+            for occ in occurrences:
+                per_pattern = folio_counts.get(occ[1])
+                if per_pattern is None:
+                    per_pattern = folio_counts[occ[1]] = {}
+                per_pattern[pat] = per_pattern.get(pat, 0) + 1
+
+        source_folios[src] = list(folio_counts.keys())
+        page_patterns[src] = {}
+        page_counts[src] = {}
+        for folio, per_pattern in folio_counts.items():
+            pats = sorted(per_pattern)
+            page_patterns[src][folio] = pats
+            page_counts[src][folio] = [per_pattern[p] for p in pats]
+        pattern_counts[src] = src_counts
+
+    return {
+        "sourceFolios": source_folios,
+        "pagePatterns": page_patterns,
+        "pageCounts": page_counts,
+        "patternCounts": pattern_counts
+    }
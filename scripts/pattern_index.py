@@ -0,0 +1,226 @@
+"""Search index over the pattern vocabulary.
+
+Patterns are contour strings such as "*e[udO]d". The index maps every
+n-gram (trigram by default) of every distinct pattern to the sorted ids of the
+patterns containing it, so a query only verifies the patterns that contain all
+of its literal n-grams instead of scanning the whole vocabulary.
+
+Query syntax (substring match, like the UI's search box):
+
+    ?   any single character
+    %   any run of characters, including none
+        everything else is literal, so "*" and "[" match themselves
+
+Direction letters (u, d, e) are lowercase and note suffixes (O, Q, L, S)
+uppercase, so queries are case-normalized: "[udo]" finds "[udO]".
+
+The index is exported as ui/public/pattern_index.json; ui/src/utils/patternSearch.js
+runs the same queries in the browser. CLI:
+
+    python3 scripts/pattern_index.py "*e?d" [--index ui/public/pattern_index.json]
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+INDEX_VERSION = 1
+NGRAM = 3
+ANY_CHAR = "?"
+ANY_RUN = "%"
+
+_LOWER = set("ude")
+_UPPER = set("OQLS")
+
+
+def normalize_query(query):
+    return "".join(
+        c.lower() if c.lower() in _LOWER else c.upper() if c.upper() in _UPPER else c
+        for c in query
+    )
+
+
+def literal_segments(query):
+    """The literal parts of a query, split at the wildcards."""
+    return [s for s in re.split(r"[?%]", query) if s]
+
+
+def compile_query(query):
+    parts = []
+    for c in query:
+        if c == ANY_CHAR:
+            parts.append(".")
+        elif c == ANY_RUN:
+            parts.append(".*")
+        else:
+            parts.append(re.escape(c))
+    return re.compile("".join(parts), re.S)
+
+
+def ngrams(text, n=NGRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class PatternIndex:
+    """n-gram inverted index over distinct patterns, with occurrence counts per source.
+
+    patterns: sorted list of distinct patterns, a pattern's id is its position
+    sources: sorted list of source names
+    counts: per pattern, {source index: occurrence count}
+    """
+
+    def __init__(self, patterns, sources, counts, n=NGRAM):
+        self.patterns = patterns
+        self.sources = sources
+        self.counts = counts
+        self.n = n
+
+        postings = {}
+        short = []
+        for pid, pat in enumerate(patterns):
+            if len(pat) < n:
+                short.append(pid)
+            for gram in ngrams(pat, n):
+                postings.setdefault(gram, []).append(pid)
+        # Ids are added in increasing order, so every posting list is sorted
+        self.postings = postings
+        # Patterns too short to have any n-gram are always verified
+        self.short = short
+
+    @classmethod
+    def from_results(cls, data, n=NGRAM):
+        """Builds the index from {source: {pattern: [occurrence, ...]}}."""
+        sources = sorted(data)
+        patterns = sorted({pat for src in sources for pat in data[src]})
+        pids = {pat: pid for pid, pat in enumerate(patterns)}
+        counts = [{} for _ in patterns]
+        for s, src in enumerate(sources):
+            for pat, occurrences in data[src].items():
+                counts[pids[pat]][s] = len(occurrences)
+        return cls(patterns, sources, counts, n)
+
+    def candidates(self, query):
+        """Ids of the patterns that can match the (normalized) query, in increasing order."""
+        n = self.n
+        grams = set()
+        short_segments = []
+        for segment in literal_segments(query):
+            if len(segment) >= n:
+                grams |= ngrams(segment, n)
+            else:
+                short_segments.append(segment)
+
+        if grams:
+            # Intersect from the rarest gram up
+            lists = sorted((self.postings.get(g, []) for g in grams), key=len)
+            result = set(lists[0])
+            for ids in lists[1:]:
+                if not result:
+                    break
+                result.intersection_update(ids)
+        elif short_segments:
+            # Only short literals: every pattern containing them has a gram containing them,
+            # unless it is shorter than n
+            segment = max(short_segments, key=len)
+            result = set()
+            for gram, ids in self.postings.items():
+                if segment in gram:
+                    result.update(ids)
+        else:
+            return range(len(self.patterns))
+
+        result.update(self.short)
+        return sorted(result)
+
+    def search(self, query, source=None, limit=None):
+        """Returns [(pattern, {source: count}), ...] for every pattern matching the query.
+
+        Results are ordered by total occurrence count, most frequent first.
+        With source, only patterns occurring in that source are returned.
+        """
+        query = normalize_query(query)
+        regex = compile_query(query)
+        sources = self.sources
+        source_idx = sources.index(source) if source in sources else None
+        if source is not None and source_idx is None:
+            return []
+
+        matches = []
+        for pid in self.candidates(query):
+            counts = self.counts[pid]
+            if source_idx is not None and source_idx not in counts:
+                continue
+            pat = self.patterns[pid]
+            if regex.search(pat):
+                matches.append((pat, {sources[s]: c for s, c in counts.items()}))
+
+        matches.sort(key=lambda m: (-sum(m[1].values()), m[0]))
+        return matches[:limit] if limit else matches
+
+    def to_dict(self):
+        """Compact JSON form: posting lists are delta-encoded, counts are flat [source, count, ...] lists."""
+        grams = {}
+        for gram, ids in sorted(self.postings.items()):
+            prev = 0
+            deltas = []
+            for pid in ids:
+                deltas.append(pid - prev)
+                prev = pid
+            grams[gram] = deltas
+        return {
+            "version": INDEX_VERSION,
+            "n": self.n,
+            "patterns": self.patterns,
+            "sources": self.sources,
+            "counts": [[x for item in sorted(c.items()) for x in item] for c in self.counts],
+            "grams": grams
+        }
+
+    @classmethod
+    def from_dict(cls, obj):
+        counts = [dict(zip(flat[::2], flat[1::2])) for flat in obj["counts"]]
+        return cls(obj["patterns"], obj["sources"], counts, obj.get("n", NGRAM))
+
+
+def write_pattern_index(data, path):
+    index = PatternIndex.from_results(data)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, separators=(",", ":"))
+    return index
+
+
+def load_pattern_index(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return PatternIndex.from_dict(json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search patterns: ? matches one character, % any run.")
+    parser.add_argument("query")
+    parser.add_argument("--index", default="ui/public/pattern_index.json")
+    parser.add_argument("--data", default="ui/public/data.json",
+                        help="Build the index from this data.json if the index file does not exist.")
+    parser.add_argument("--source", help="Only patterns occurring in this source.")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print the matches as JSON.")
+    args = parser.parse_args()
+
+    if os.path.exists(args.index):
+        index = load_pattern_index(args.index)
+    else:
+        import data_format
+        print(f"{args.index} not found, building the index from {args.data}")
+        index = PatternIndex.from_results(data_format.read_export(args.data)["data"])
+
+    start = time.perf_counter()
+    matches = index.search(args.query, source=args.source)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps([{"pattern": pat, "counts": counts} for pat, counts in matches[:args.limit]]))
+    else:
+        for pat, counts in matches[:args.limit]:
+            per_source = ", ".join(f"{src}: {c}" for src, c in sorted(counts.items()))
+            print(f"{pat:<30}{sum(counts.values()):>8}  {per_source}")
+        print(f"{len(matches)} patterns match {args.query!r} ({elapsed:.1f} ms)")
@@ -0,0 +1,110 @@
+"""Resolves the (source, folio) pairs of the export to scan images.
+
+The UI used to find the scan of a folio with useImageManifest.findManifestPath,
+which falls back to a loop over every scan path whenever the exact
+scans/<source>/<folio>.jpg is missing (which it is for sigla like
+"Pa 1235-9-1"). resolve() applies the same rules once per pair at export time:
+
+    1. scans/<source>/<folio>.jpg exists
+    2. the first scan, in path order, named <folio>.jpg or <folio>.jpeg whose
+       directory name is contained in the source
+
+Source and folio are trimmed first. write_scan_index writes the result to
+scan_index.json:
+
+    {"scans": {source: {folio: "scans/..."}}, "unresolved": {source: [folio, ...]}}
+
+so the UI looks paths up directly, and the folios without a scan are listed.
+"""
+import json
+import os
+
+# Scans served with the UI; docs/scans is the copy in the built site
+SCAN_DIRS = ("ui/public/scans", "docs/scans")
+SCAN_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def find_scan_dir(scan_dirs=SCAN_DIRS):
+    """The first scan directory that exists, or None."""
+    for scan_dir in scan_dirs:
+        if os.path.isdir(scan_dir):
+            return scan_dir
+    return None
+
+
+def scan_file(scan_dir, path):
+    """File of a "scans/<path>" scan path in scan_dir."""
+    return os.path.join(scan_dir, *path.split("/")[1:])
+
+
+def list_scans(scan_dirs=SCAN_DIRS):
+    """Sorted "scans/<path>" of every image in the first scan directory that exists."""
+    scan_dir = find_scan_dir(scan_dirs)
+    if scan_dir is None:
+        return []
+
+    paths = []
+    for root, _, files in os.walk(scan_dir):
+        rel = os.path.relpath(root, scan_dir)
+        for name in files:
+            if name.endswith(SCAN_EXTENSIONS):
+                parts = [name] if rel == "." else rel.split(os.sep) + [name]
+                paths.append("/".join(["scans"] + parts))
+    return sorted(paths)
+
+
+class ScanResolver:
+    """The scan paths, indexed by file name so a folio is resolved without a scan over all of them."""
+
+    def __init__(self, paths):
+        self.ordered = list(paths)
+        self.paths = set(paths)
+        # file name -> [(position, path), ...] in path order
+        self.by_name = {}
+        for i, path in enumerate(paths):
+            self.by_name.setdefault(path.rsplit("/", 1)[-1], []).append((i, path))
+
+    def resolve(self, source, folio):
+        """The scan path of folio in source, or None."""
+        if not source or not folio:
+            return None
+        s = str(source).strip()
+        f = str(folio).strip()
+
+        exact = f"scans/{s}/{f}.jpg"
+        if exact in self.paths:
+            return exact
+
+        if "/" in f:
+            # A folio with a slash can match across directories, compare whole paths
+            candidates = [(i, p) for i, p in enumerate(self.ordered) if p.endswith((f"/{f}.jpg", f"/{f}.jpeg"))]
+        else:
+            candidates = sorted(self.by_name.get(f"{f}.jpg", []) + self.by_name.get(f"{f}.jpeg", []))
+        for _, path in candidates:
+            parts = path.split("/")
+            if len(parts) >= 2 and parts[-2] in s:
+                return path
+        return None
+
+
+def build_scan_index(source_folios, paths):
+    """{"scans": {source: {folio: path}}, "unresolved": {source: [folio, ...]}} for {source: [folio, ...]}."""
+    resolver = ScanResolver(paths)
+    scans = {}
+    unresolved = {}
+    for source, folios in source_folios.items():
+        s = str(source).strip()
+        for folio in folios:
+            path = resolver.resolve(source, folio)
+            if path is None:
+                unresolved.setdefault(s, []).append(str(folio).strip())
+            else:
+                scans.setdefault(s, {})[str(folio).strip()] = path
+    return {"scans": scans, "unresolved": unresolved}
+
+
+def write_scan_index(source_folios, path, scan_dirs=SCAN_DIRS):
+    index = build_scan_index(source_folios, list_scans(scan_dirs))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    return index
@@ -0,0 +1,219 @@
+"""Tiled image pyramids of the scans, so viewers load only the tiles they show.
+
+Every scan (see scan_index.SCAN_DIRS) becomes a Deep Zoom (DZI) pyramid in
+ui/public/tiles:
+
+    tiles/<source>/<folio>.dzi                              Deep Zoom descriptor
+    tiles/<source>/<folio>_files/<level>/<col>_<row>.jpg    tiles
+
+The highest level is the scan at full size, each level below is half the size
+of the one above, down to 1x1 pixel at level 0. Tiles are TILE_SIZE pixels
+square plus OVERLAP pixels shared with each neighbour. tiles/tiles.json lists
+the pyramids by scan path ("scans/<source>/<folio>.jpg", as in scan_index.json):
+
+    {scan path: {"url", "dzi", "width", "height", "tileSize", "overlap", "format", "maxLevel", "stamp"}}
+
+so the UI picks a level and the tiles of a region without reading the
+descriptors. A scan is only tiled again when its mtime or size changed.
+
+Tiling needs Pillow, which is imported by the worker that tiles a scan; without
+it the pyramids are left as they are.
+
+Run with:
+    python3 scripts/scan_tiles.py --jobs 4
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import time
+
+from export_assets import file_stamp
+from scan_index import SCAN_DIRS, find_scan_dir, list_scans, scan_file
+
+TILE_DIR = "ui/public/tiles"
+TILE_SIZE = 254
+OVERLAP = 1
+QUALITY = 85
+
+
+def max_level(width, height):
+    """Highest level of the pyramid of a width x height image, the one at full size."""
+    return (max(width, height) - 1).bit_length()
+
+
+def level_size(width, height, level, top):
+    """Size of the image at level of a pyramid whose highest level is top."""
+    scale = 1 << (top - level)
+    return -(-width // scale), -(-height // scale)
+
+
+def tile_boxes(width, height, tile_size=TILE_SIZE, overlap=OVERLAP):
+    """Yields (col, row, (left, top, right, bottom)) of the tiles of a width x height level."""
+    for row in range(-(-height // tile_size)):
+        top = max(0, row * tile_size - overlap)
+        bottom = min(height, (row + 1) * tile_size + overlap)
+        for col in range(-(-width // tile_size)):
+            left = max(0, col * tile_size - overlap)
+            right = min(width, (col + 1) * tile_size + overlap)
+            yield col, row, (left, top, right, bottom)
+
+
+def dzi_descriptor(width, height, tile_size=TILE_SIZE, overlap=OVERLAP, fmt="jpg"):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" '
+        f'Overlap="{overlap}" Format="{fmt}">\n'
+        f'  <Size Width="{width}" Height="{height}"/>\n'
+        '</Image>\n'
+    )
+
+
+def tile_scan(image_path, base, tile_size=TILE_SIZE, overlap=OVERLAP, quality=QUALITY):
+    """Writes base.dzi and the tiles in base_files/ for the image, and returns its (width, height, format)."""
+    from PIL import Image
+
+    fmt = "png" if image_path.lower().endswith(".png") else "jpg"
+    files_dir = f"{base}_files"
+    tmp_dir = f"{files_dir}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+
+    with Image.open(image_path) as im:
+        im = im.convert("RGBA" if fmt == "png" and im.mode in ("RGBA", "LA", "P") else "RGB")
+        width, height = im.size
+        top = max_level(width, height)
+        level_image = im
+        for level in range(top, -1, -1):
+            size = level_size(width, height, level, top)
+            if level_image.size != size:
+                # Each level is scaled down from the one above, not from the full image
+                level_image = level_image.resize(size, Image.LANCZOS)
+            level_dir = os.path.join(tmp_dir, str(level))
+            os.makedirs(level_dir)
+            for col, row, box in tile_boxes(size[0], size[1], tile_size, overlap):
+                tile = level_image.crop(box)
+                out = os.path.join(level_dir, f"{col}_{row}.{fmt}")
+                if fmt == "jpg":
+                    tile.save(out, "JPEG", quality=quality)
+                else:
+                    tile.save(out, "PNG")
+
+    if os.path.exists(files_dir):
+        shutil.rmtree(files_dir)
+    os.replace(tmp_dir, files_dir)
+    with open(f"{base}.dzi", "w", encoding="utf-8") as f:
+        f.write(dzi_descriptor(width, height, tile_size, overlap, fmt))
+    return width, height, fmt
+
+
+def _remove_pyramid(out_dir, scan):
+    base = os.path.join(out_dir, *_tile_base(scan).split("/")[1:])
+    if os.path.exists(f"{base}_files"):
+        shutil.rmtree(f"{base}_files")
+    if os.path.exists(f"{base}.dzi"):
+        os.remove(f"{base}.dzi")
+
+
+def _tile_base(scan):
+    # "scans/Pa 1235/9.jpg" -> "tiles/Pa 1235/9"
+    return "tiles/" + os.path.splitext(scan.split("/", 1)[1])[0]
+
+
+def _tile_task(image_path, base, tile_size, overlap, quality):
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    return tile_scan(image_path, base, tile_size, overlap, quality)
+
+
+def read_manifest(out_dir=TILE_DIR):
+    try:
+        with open(os.path.join(out_dir, "tiles.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_tiles(scan_dirs=SCAN_DIRS, out_dir=TILE_DIR, jobs=1, tile_size=TILE_SIZE, overlap=OVERLAP, quality=QUALITY):
+    """Tiles every new or changed scan, removes the pyramids of deleted ones and returns the manifest."""
+    old = read_manifest(out_dir)
+    scan_dir = find_scan_dir(scan_dirs)
+    scans = list_scans(scan_dirs)
+
+    manifest = {}
+    todo = []
+    for scan in scans:
+        path = scan_file(scan_dir, scan)
+        stamp = file_stamp(path)
+        entry = old.get(scan)
+        if entry is not None and entry["stamp"] == stamp and entry["tileSize"] == tile_size \
+                and entry["overlap"] == overlap and os.path.exists(os.path.join(out_dir, *entry["dzi"].split("/")[1:])):
+            manifest[scan] = entry
+        else:
+            todo.append((scan, path, stamp))
+
+    if todo and importlib.util.find_spec("PIL") is None:
+        print(f"Warning: Pillow is not installed, {len(todo)} scans are not tiled.")
+        return old
+
+    for scan in set(old) - set(scans):
+        _remove_pyramid(out_dir, scan)
+
+    start = time.perf_counter()
+    errors = 0
+
+    def add(scan, stamp, result):
+        width, height, fmt = result
+        base = _tile_base(scan)
+        manifest[scan] = {
+            "url": f"{base}_files", "dzi": f"{base}.dzi", "width": width, "height": height,
+            "tileSize": tile_size, "overlap": overlap, "format": fmt,
+            "maxLevel": max_level(width, height), "stamp": stamp
+        }
+
+    def task_args(scan, path):
+        return path, os.path.join(out_dir, *_tile_base(scan).split("/")[1:]), tile_size, overlap, quality
+
+    if jobs <= 1 or len(todo) <= 1:
+        for scan, path, stamp in todo:
+            try:
+                add(scan, stamp, _tile_task(*task_args(scan, path)))
+            except Exception as e:
+                print(f"Error tiling {path}: {e}")
+                errors += 1
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            futures = {pool.submit(_tile_task, *task_args(scan, path)): (scan, path, stamp) for scan, path, stamp in todo}
+            for future in as_completed(futures):
+                scan, path, stamp = futures[future]
+                try:
+                    add(scan, stamp, future.result())
+                except Exception as e:
+                    print(f"Error tiling {path}: {e}")
+                    errors += 1
+
+    # Keep the scan order, whatever order the workers finished in
+    manifest = {scan: manifest[scan] for scan in scans if scan in manifest}
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "tiles.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+    print(f"Tiled {len(todo) - errors} scans in {time.perf_counter() - start:.2f}s "
+          f"({len(manifest)} pyramids, {errors} errors)")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build Deep Zoom tile pyramids of the scans.")
+    parser.add_argument("--scans", action="append", help="Scan directory (repeatable, the first that exists is used).")
+    parser.add_argument("--out", default=TILE_DIR)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--overlap", type=int, default=OVERLAP)
+    parser.add_argument("--quality", type=int, default=QUALITY)
+    args = parser.parse_args()
+
+    build_tiles(args.scans or SCAN_DIRS, args.out, args.jobs, args.tile_size, args.overlap, args.quality)
@@ -0,0 +1,184 @@
+"""Single-pass segmentation of nonSpaced units into typed note records.
+
+A nonSpaced unit is a list of Neumes/Groups (dict nodes from data.json, or
+monodikit objects); each of them holds notes, possibly nested. segment_unit
+walks the unit once and returns the notes as records
+
+    (pitch, name, type code, liquescent)    name is base + octave, e.g. "C4"
+
+plus the number of notes in each group, which is what the encoder and the
+occurrence notes string need.
+
+The result is the same as the original two-pass extraction, including its
+quirk: a group's size counts every note-like node in it, also those without a
+base or octave, and the groups are then cut from the valid notes in order. So
+when a note is dropped, the following groups shift by one note.
+
+For object nodes the attributes instances of a class can have are looked up
+once per class: instances without a __dict__ (slots, builtins) are only probed
+for the attributes their class defines.
+"""
+from encoding import TYPE_CODES, midi_pitch
+
+_MISSING = object()
+_CHILD_ATTRS = ("neume_components", "notes", "elements")
+_NOTE_ATTRS = ("base", "octave", "oct", "noteType", "liquescent")
+
+# class -> attribute names its instances may have
+_CLASS_ATTRS = {}
+
+# (base, octave) -> (pitch, name)
+_PITCHES = {}
+
+
+def _attribute_names(cls):
+    names = _CLASS_ATTRS.get(cls)
+    if names is None:
+        candidates = _CHILD_ATTRS + _NOTE_ATTRS
+        if hasattr(cls, "__getattr__") or any("__dict__" in vars(k) for k in cls.__mro__):
+            names = frozenset(candidates)
+        else:
+            names = frozenset(name for name in candidates if hasattr(cls, name))
+        _CLASS_ATTRS[cls] = names
+    return names
+
+
+def _attr(node, names, name):
+    if name in names:
+        return getattr(node, name, _MISSING)
+    return _MISSING
+
+
+def _record(base, octave, note_type, liquescent):
+    key = (base, octave)
+    cached = _PITCHES.get(key)
+    if cached is None:
+        o = int(octave)
+        cached = _PITCHES[key] = (midi_pitch(base, o), f"{base}{o}")
+    return (cached[0], cached[1], TYPE_CODES.get(note_type, 0), liquescent)
+
+
+def _object_note(n):
+    """Note record of a non-dict leaf (or dict subclass), None if it has no base or octave."""
+    names = _attribute_names(type(n))
+    is_dict = isinstance(n, dict)
+
+    b = _attr(n, names, "base")
+    if b is _MISSING:
+        b = n.get("base") if is_dict else None
+
+    o = _attr(n, names, "octave")
+    if o is _MISSING:
+        o = _attr(n, names, "oct")
+        if o is _MISSING:
+            o = n.get("octave", n.get("oct")) if is_dict else None
+
+    nt = _attr(n, names, "noteType")
+    if nt is _MISSING:
+        nt = n.get("noteType", "Normal") if is_dict else "Normal"
+
+    liq = _attr(n, names, "liquescent")
+    if liq is _MISSING:
+        liq = n.get("liquescent", False) if is_dict else False
+
+    if b and o:
+        return _record(b, o, nt, liq)
+    return None
+
+
+def _collect(element, notes):
+    """Appends the note records below element to notes and returns the number of note nodes found."""
+    if type(element) is dict:
+        if "grouped" in element:
+            count = 0
+            for sub in element["grouped"]:
+                count += _collect(sub, notes)
+            return count
+
+        if "neume_components" in element:
+            sub_notes = element["neume_components"]
+        elif "children" in element:
+            sub_notes = element["children"]
+        else:
+            sub_notes = element.get("notes", [])
+
+        if not sub_notes:
+            if "base" in element or "octave" in element:
+                b = element.get("base")
+                o = element["octave"] if "octave" in element else element.get("oct")
+                if b and o:
+                    notes.append(_record(b, o, element.get("noteType", "Normal"), element.get("liquescent", False)))
+                return 1
+            return 0
+
+    elif isinstance(element, dict):
+        # Dict subclasses: same rules, but leaves may carry attributes too
+        if "grouped" in element:
+            count = 0
+            for sub in element["grouped"]:
+                count += _collect(sub, notes)
+            return count
+        sub_notes = element.get("neume_components", element.get("children", element.get("notes", [])))
+        if not sub_notes:
+            if "base" in element or "octave" in element:
+                record = _object_note(element)
+                if record is not None:
+                    notes.append(record)
+                return 1
+            return 0
+
+    else:
+        names = _attribute_names(type(element))
+        sub_notes = _MISSING
+        for name in _CHILD_ATTRS:
+            sub_notes = _attr(element, names, name)
+            if sub_notes is not _MISSING:
+                break
+        if sub_notes is _MISSING:
+            if _attr(element, names, "base") is not _MISSING or _attr(element, names, "octave") is not _MISSING:
+                record = _object_note(element)
+                if record is not None:
+                    notes.append(record)
+                return 1
+            return 0
+        if not sub_notes:
+            return 0
+
+    count = 0
+    for n in sub_notes:
+        count += _collect(n, notes)
+    return count
+
+
+def segment_unit(unit):
+    """Returns (notes, group_sizes) for a nonSpaced unit, or None if it has no notes.
+
+    notes: [(pitch, name, type code, liquescent), ...] in document order
+    group_sizes: number of notes in each group, summing to len(notes)
+    """
+    if not isinstance(unit, list) and hasattr(unit, "children"):
+        unit = unit.children
+    elif isinstance(unit, dict):
+        unit = unit.get("children", [])
+    if not unit:
+        return None
+
+    notes = []
+    counts = []
+    for item in unit:
+        count = _collect(item, notes)
+        if count:
+            counts.append(count)
+    if not notes:
+        return None
+
+    # Groups are cut from the valid notes by their node counts (see the module docstring)
+    sizes = []
+    remaining = len(notes)
+    for count in counts:
+        if count >= remaining:
+            sizes.append(remaining)
+            break
+        sizes.append(count)
+        remaining -= count
+    return notes, sizes
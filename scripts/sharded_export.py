@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from data_format import FORMAT_VERSION
+
+SHARD_DIR = "shards"
+INDEX_FORMAT = "sharded"
+
+
+def shard_filename(source, payload):
+    """Builds '<slug>.<content hash>.json' so a shard URL changes whenever its content does."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", str(source)).strip("_") or "source"
+    digest = hashlib.sha256(payload).hexdigest()[:12]
+    return f"{slug}.{digest}.json"
+
+
+def write_shards(data_js, output_dir, encode=None):
+    """Writes one shard per source and returns the source list for the index.
+
+    encode optionally converts a source's patterns to another data format
+    (see data_format.encode_source). Shards that are no longer referenced
+    (changed or deleted sources) are removed.
+    """
+    shard_dir = os.path.join(output_dir, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    sources = []
+    written = set()
+    for src in sorted(data_js.keys()):
+        patterns = data_js[src]
+        if encode is None:
+            payload = json.dumps({"source": src, "data": patterns})
+        else:
+            shard = {"source": src, "version": FORMAT_VERSION, "data": encode(patterns)}
+            payload = json.dumps(shard, separators=(",", ":"))
+        payload = payload.encode("utf-8")
+        filename = shard_filename(src, payload)
+
+        path = os.path.join(shard_dir, filename)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(payload)
+        written.add(filename)
+
+        sources.append({
+            "name": src,
+            "shard": f"{SHARD_DIR}/{filename}",
+            "patterns": len(patterns),
+            "occurrences": sum(len(occs) for occs in patterns.values()),
+            "bytes": len(payload)
+        })
+
+    for name in os.listdir(shard_dir):
+        if name not in written:
+            os.remove(os.path.join(shard_dir, name))
+
+    return sources
+
+
+def write_sharded_export(export_obj, data_js, output_dir, index_name="data.json", encode=None):
+    """Writes the shards plus a small index holding everything except the occurrences."""
+    sources = write_shards(data_js, output_dir, encode=encode)
+
+    index_obj = {"format": INDEX_FORMAT}
+    if encode is not None:
+        index_obj["version"] = FORMAT_VERSION
+    index_obj.update(export_obj)
+    index_obj["sources"] = sources
+
+    index_file = os.path.join(output_dir, index_name)
+    tmp_path = f"{index_file}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index_obj, f)
+    os.replace(tmp_path, index_file)
+
+    return index_file, sources
+
+
+def remove_shards(output_dir):
+    """Removes the shard directory of an earlier sharded export; returns whether there was one."""
+    shard_dir = os.path.join(output_dir, SHARD_DIR)
+    if not os.path.isdir(shard_dir):
+        return False
+    shutil.rmtree(shard_dir)
+    return True
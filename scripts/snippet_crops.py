@@ -0,0 +1,238 @@
+"""Pre-cropped annotation snippets for the PDF export.
+
+The PDF export used to load the full scan of every annotation into a canvas to
+cut out one small region. crop_snippets renders these snippets ahead of time
+from an annotation backup (the JSON file written by "Export data" in the UI),
+the way usePdfExport.cropSnippet does: the bounding box of the polygon with
+30% context on each side, scaled to SNIPPET_WIDTH pixels, with the polygon
+outlined in red. Snippets go to ui/public/snippets/<id>.jpg, listed in
+snippets/snippets.json:
+
+    {annotation id: {"path", "scan", "source", "folio", "pattern", "points", "stamp"}}
+
+The UI uses a snippet while its points match the annotation. Snippets whose
+points and scan are unchanged are not rendered again.
+
+The scans are processed in parallel, each decoded once for all its annotations
+and, for JPEG scans, at the smallest scale that still gives every snippet of
+the page its full width. Rendering needs Pillow, which is imported by the
+worker that renders.
+
+Run with:
+    python3 scripts/snippet_crops.py cm-transcription-backup.json --jobs 4
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import importlib.util
+import json
+import math
+import os
+import re
+import time
+
+from export_assets import file_stamp
+from scan_index import SCAN_DIRS, ScanResolver, find_scan_dir, list_scans, scan_file
+
+SNIPPET_DIR = "ui/public/snippets"
+SNIPPET_WIDTH = 400
+PADDING = 0.3
+QUALITY = 85
+OUTLINE = (255, 0, 0)
+OUTLINE_WIDTH = 2
+
+
+def parse_points(points):
+    """[(x, y), ...] of a "x,y x,y ..." polygon in % of the scan; malformed points are skipped."""
+    pts = []
+    for p in (points or "").split(" "):
+        try:
+            x, y = p.split(",")[:2]
+            x, y = float(x), float(y)
+        except ValueError:
+            continue
+        if not (math.isnan(x) or math.isnan(y)):
+            pts.append((x, y))
+    return pts
+
+
+def snippet_box(pts, padding=PADDING):
+    """(x, y, w, h) in % of the region around a polygon that a snippet shows."""
+    xs = [p[0] for p in pts]
+    ys = [p[1] for p in pts]
+    w = max(xs) - min(xs)
+    h = max(ys) - min(ys)
+    x = max(0, min(xs) - w * padding)
+    y = max(0, min(ys) - h * padding)
+    return x, y, min(100 - x, w + w * padding * 2), min(100 - y, h + h * padding * 2)
+
+
+def iter_annotations(backup):
+    """Yields {"id", "source", "folio", "pattern", "points"} for the annotations of a backup.
+
+    Takes the backup file's object or its "content". Annotations are keyed
+    "<source>_<folio>_<pattern>", line regions "<source>_<folio>", with the
+    source being the scan folder.
+    """
+    content = backup.get("content", backup)
+    for key, items in (content.get("annotations") or {}).items():
+        parts = key.split("_", 2)
+        if len(parts) < 3:
+            continue
+        for a in items:
+            yield {"id": str(a.get("id")), "source": parts[0], "folio": parts[1], "pattern": parts[2],
+                   "points": a.get("points", "")}
+
+    region_items = content.get("regionItems") or {}
+    for key, regions in (content.get("regions") or {}).items():
+        if "_" not in key:
+            continue
+        source, folio = key.rsplit("_", 1)
+        for region in regions:
+            for item in region_items.get(region.get("id"), []):
+                yield {"id": str(item.get("id")), "source": source, "folio": folio, "pattern": item.get("pattern"),
+                       "points": item.get("points", "")}
+
+
+def snippet_name(annotation_id):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", annotation_id) + ".jpg"
+
+
+def render_snippets(image_path, snippets, width=SNIPPET_WIDTH, quality=QUALITY):
+    """Renders [(points, out_path), ...] from one scan and returns the out paths written."""
+    from PIL import Image, ImageDraw
+
+    boxes = []
+    for points, out_path in snippets:
+        pts = parse_points(points)
+        if pts:
+            box = snippet_box(pts)
+            if box[2] > 0 and box[3] > 0:
+                boxes.append((pts, box, out_path))
+    if not boxes:
+        return []
+
+    written = []
+    with Image.open(image_path) as im:
+        full_w, full_h = im.size
+        # Decode at a reduced scale (JPEG only) that still gives every snippet its width
+        smallest = min(box[2] for _, box, _ in boxes)
+        need = min(1.0, width / (smallest / 100 * full_w))
+        im.draft("RGB", (math.ceil(full_w * need), math.ceil(full_h * need)))
+        im = im.convert("RGB")
+        img_w, img_h = im.size
+
+        for pts, (x, y, w, h), out_path in boxes:
+            height = max(1, round(h / w * width))
+            crop = (x / 100 * img_w, y / 100 * img_h, (x + w) / 100 * img_w, (y + h) / 100 * img_h)
+            snippet = im.resize((width, height), Image.LANCZOS, box=crop)
+            outline = [((px - x) / w * width, (py - y) / h * height) for px, py in pts]
+            ImageDraw.Draw(snippet).line(outline + outline[:1], fill=OUTLINE, width=OUTLINE_WIDTH)
+            tmp_path = f"{out_path}.tmp"
+            snippet.save(tmp_path, "JPEG", quality=quality)
+            os.replace(tmp_path, out_path)
+            written.append(out_path)
+    return written
+
+
+def read_manifest(out_dir=SNIPPET_DIR):
+    try:
+        with open(os.path.join(out_dir, "snippets.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def crop_snippets(backup, out_dir=SNIPPET_DIR, scan_dirs=SCAN_DIRS, jobs=1, width=SNIPPET_WIDTH, quality=QUALITY):
+    """Renders the snippets of the annotations in backup that are new or changed and returns the manifest.
+
+    Snippets of annotations that are no longer in the backup are removed.
+    Annotations without a scan are left out and reported.
+    """
+    old = read_manifest(out_dir)
+    scan_dir = find_scan_dir(scan_dirs)
+    resolver = ScanResolver(list_scans(scan_dirs))
+
+    manifest = {}
+    todo = {}  # scan -> [(annotation id, manifest entry), ...]
+    unresolved = []
+    for a in iter_annotations(backup):
+        scan = resolver.resolve(a["source"], a["folio"])
+        if scan is None:
+            unresolved.append(a)
+            continue
+        stamp = file_stamp(scan_file(scan_dir, scan))
+        entry = dict(a, path=f"snippets/{snippet_name(a['id'])}", scan=scan, stamp=stamp)
+        del entry["id"]
+        previous = old.get(a["id"])
+        if previous == entry and os.path.exists(os.path.join(out_dir, snippet_name(a["id"]))):
+            manifest[a["id"]] = previous
+        else:
+            todo.setdefault(scan, []).append((a["id"], entry))
+
+    if todo and importlib.util.find_spec("PIL") is None:
+        print(f"Warning: Pillow is not installed, {sum(map(len, todo.values()))} snippets are not rendered.")
+        return old
+
+    os.makedirs(out_dir, exist_ok=True)
+    for annotation_id in set(old) - {a_id for entries in todo.values() for a_id, _ in entries} - set(manifest):
+        path = os.path.join(out_dir, snippet_name(annotation_id))
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    kept = len(manifest)
+    errors = 0
+    tasks = []
+    for scan, entries in todo.items():
+        snippets = [(entry["points"], os.path.join(out_dir, snippet_name(a_id))) for a_id, entry in entries]
+        tasks.append((scan, entries, (scan_file(scan_dir, scan), snippets, width, quality)))
+
+    def add(entries, written):
+        written = set(written)
+        for a_id, entry in entries:
+            if os.path.join(out_dir, snippet_name(a_id)) in written:
+                manifest[a_id] = entry
+
+    if jobs <= 1 or len(tasks) <= 1:
+        for scan, entries, args in tasks:
+            try:
+                add(entries, render_snippets(*args))
+            except Exception as e:
+                print(f"Error cropping snippets from {scan}: {e}")
+                errors += 1
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            futures = {pool.submit(render_snippets, *args): (scan, entries) for scan, entries, args in tasks}
+            for future in as_completed(futures):
+                scan, entries = futures[future]
+                try:
+                    add(entries, future.result())
+                except Exception as e:
+                    print(f"Error cropping snippets from {scan}: {e}")
+                    errors += 1
+
+    path = os.path.join(out_dir, "snippets.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+    print(f"Cropped {len(manifest) - kept} snippets from {len(todo)} scans in {time.perf_counter() - start:.2f}s "
+          f"({len(manifest)} snippets, {errors} errors)")
+    for a in unresolved:
+        print(f"No scan for annotation {a['id']} ({a['source']}, {a['folio']})")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crop the annotation snippets used by the PDF export.")
+    parser.add_argument("backup", help="Annotation backup written by \"Export data\" in the UI.")
+    parser.add_argument("--scans", action="append", help="Scan directory (repeatable, the first that exists is used).")
+    parser.add_argument("--out", default=SNIPPET_DIR)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--width", type=int, default=SNIPPET_WIDTH)
+    parser.add_argument("--quality", type=int, default=QUALITY)
+    args = parser.parse_args()
+
+    with open(args.backup, encoding="utf-8") as f:
+        backup = json.load(f)
+    crop_snippets(backup, args.out, args.scans or SCAN_DIRS, args.jobs, args.width, args.quality)
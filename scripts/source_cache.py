@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import re
+
+# Bump whenever the analysis output changes for unchanged input,
+# so that every cached source is re-analyzed on the next run.
+PIPELINE_VERSION = "1"
+
+CACHE_DIR = "transcription_cache"
+
+# <source dir>-<name hash>.<key>.json as written by entry_path, and the temp files of save_entry
+ENTRY_NAME = re.compile(r"^[A-Za-z0-9._-]+-[0-9a-f]{8}\.[0-9a-f]{16}\.json$")
+TMP_NAME = re.compile(r"^[A-Za-z0-9._-]+-[0-9a-f]{8}\.[0-9a-f]{16}\.json\.\d+\.tmp$")
+
+
+def source_fingerprint(src_dir):
+    """Hashes the source's meta.json and all document files plus the pipeline version."""
+    h = hashlib.sha256()
+    h.update(f"pipeline:{PIPELINE_VERSION}\n".encode())
+
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, src_dir).replace(os.sep, "/")
+            h.update(f"file:{rel}\n".encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+
+    return h.hexdigest()
+
+
+def entry_path(cache_dir, src_dir, key):
+    # One file per source directory; the key is part of the name so a
+    # cache hit is a single os.path.exists() call.
+    base = os.path.basename(os.path.normpath(src_dir))
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", base)
+    name_hash = hashlib.sha1(base.encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{safe}-{name_hash}.{key[:16]}.json")
+
+
+def load_entry(cache_dir, src_dir, key):
+    """Returns the cached results for src_dir, or None on a miss."""
+    path = entry_path(cache_dir, src_dir, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            entry = json.load(f)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable cache entry {path}: {e}")
+        return None
+    if entry.get("key") != key:
+        return None
+    return entry["results"]
+
+
+def save_entry(cache_dir, src_dir, key, results):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = entry_path(cache_dir, src_dir, key)
+    entry = {
+        "source_dir": src_dir,
+        "key": key,
+        "pipeline_version": PIPELINE_VERSION,
+        "results": results
+    }
+    # Write to a temp file and rename so an interrupted run never leaves a truncated entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+
+def is_cache_file(name):
+    return bool(ENTRY_NAME.match(name) or TMP_NAME.match(name))
+
+
+def prune(cache_dir, keep_paths):
+    """Removes every entry (and stray temp file) that is not in keep_paths.
+
+    Only files named like cache entries are touched, so a cache directory
+    shared with other files is safe.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    keep = {os.path.abspath(p) for p in keep_paths}
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if is_cache_file(name) and os.path.isfile(path) and os.path.abspath(path) not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def load_all(cache_dir):
+    """Yields (source_dir, results) for every entry, ordered by source directory."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not ENTRY_NAME.match(name):
+            continue
+        try:
+            with open(os.path.join(cache_dir, name), "r") as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable cache entry {name}: {e}")
+            continue
+        entries.append((entry.get("source_dir", name), entry["results"]))
+    for src_dir, results in sorted(entries, key=lambda e: e[0]):
+        yield src_dir, results
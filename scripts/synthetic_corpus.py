@@ -0,0 +1,191 @@
+"""Synthetic corpus generator for benchmarks and tests.
+
+Writes an export directory in the Corpus Monodicum layout that
+analyze_corpus and monodikit expect:
+
+    <out>/<source>/meta.json
+    <out>/<source>/<document>/meta.json
+    <out>/<source>/<document>/data.json
+
+Documents are a RootContainer with one FormteilContainer of ZeileContainers
+holding Syllables (with spaced/nonSpaced/grouped neume trees), LineChanges and
+FolioChanges. The output is fully determined by the arguments and the seed.
+"""
+import argparse
+import json
+import os
+import random
+
+BASES = "CDEFGAB"
+# Weighted like real chant: mostly plain notes, some special neume forms
+NOTE_TYPES = ["Normal"] * 20 + ["Oriscus", "Quilisma", "Strophicus", "Liquescent"]
+
+
+def source_meta(index, sigle):
+    return {
+        "id": f"source-{index}",
+        "quellensigle": sigle,
+        "herkunftsregion": "",
+        "herkunftsort": "",
+        "herkunftsinstitution": "",
+        "ordenstradition": "",
+        "quellentyp": "",
+        "bibliotheksort": "",
+        "bibliothek": "",
+        "bibliothekssignatur": "",
+        "kommentar": "",
+        "datierung": "",
+        "status": "",
+        "jahrhundert": "",
+        "manifest": "",
+        "foliooffset": ""
+    }
+
+
+def document_meta(doc_id, sigle, folio, line):
+    return {
+        "id": doc_id,
+        "quelle_id": sigle,
+        "dokumenten_id": doc_id,
+        "gattung1": "Sequenz",
+        "gattung2": "",
+        "festtag": "",
+        "feier": "",
+        "textinitium": "",
+        "bibliographischerverweis": "",
+        "druckausgabe": "",
+        "zeilenstart": str(line),
+        "foliostart": folio,
+        "kommentar": "",
+        "editionsstatus": "",
+        "additionalData": {}
+    }
+
+
+def random_note(rnd, pitch):
+    return {
+        "uuid": "",
+        "base": BASES[pitch % 7],
+        "octave": pitch // 7,
+        "noteType": rnd.choice(NOTE_TYPES),
+        "liquescent": rnd.random() < 0.05,
+        "focus": False
+    }
+
+
+def random_syllable(rnd, index, max_notes):
+    # A melodic walk around G4, so contours look like chant rather than noise
+    pitch = 4 * 7 + rnd.randint(0, 6)
+    non_spaced = []
+    n_notes = 0
+    for _ in range(rnd.choice([1, 1, 1, 2, 2, 3])):
+        grouped = []
+        for _ in range(rnd.choice([1, 1, 1, 2, 2, 3, 4])):
+            pitch = min(max(pitch + rnd.choice([-2, -1, -1, 0, 1, 1, 2]), 3 * 7 + 4), 5 * 7 + 4)
+            grouped.append(random_note(rnd, pitch))
+            n_notes += 1
+            if n_notes >= max_notes:
+                break
+        non_spaced.append({"grouped": grouped})
+        if n_notes >= max_notes:
+            break
+
+    syllable = {
+        "kind": "Syllable",
+        "uuid": "",
+        "text": f"syl{index}",
+        "syllableType": "Normal",
+        "notes": {"spaced": [{"nonSpaced": non_spaced}]},
+        "endsWord": rnd.random() < 0.3,
+        "focus": False,
+        "hasNotes": True
+    }
+    return syllable, n_notes
+
+
+def random_document(rnd, notes):
+    lines = []
+    line = []
+    n_notes = 0
+    index = 0
+    while n_notes < notes:
+        syllable, count = random_syllable(rnd, index, notes - n_notes)
+        line.append(syllable)
+        n_notes += count
+        index += 1
+        if rnd.random() < 0.08:
+            line.append({"kind": "LineChange", "uuid": ""})
+        if rnd.random() < 0.02:
+            line.append({"kind": "FolioChange", "uuid": "", "text": f"{rnd.randint(1, 300)}v"})
+        if len(line) >= 10:
+            lines.append({"kind": "ZeileContainer", "uuid": "", "children": line})
+            line = []
+    if line:
+        lines.append({"kind": "ZeileContainer", "uuid": "", "children": line})
+
+    return {
+        "comments": [],
+        "uuid": "",
+        "kind": "RootContainer",
+        "documentType": "Level1",
+        "children": [{
+            "kind": "FormteilContainer",
+            "uuid": "",
+            "data": [{"name": "Signatur", "data": "A"}],
+            "children": lines
+        }]
+    }
+
+
+def write_json(path, obj):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+
+
+def generate(out_dir, sources=3, documents=10, notes=500, seed=0, filtered_ratio=0.05):
+    """Writes a synthetic export and returns a summary of what was generated.
+
+    sources: number of source directories
+    documents: documents per source
+    notes: notes per document
+    filtered_ratio: share of documents whose ID ends in TR/GS (skipped by the analysis)
+    """
+    rnd = random.Random(seed)
+    summary = {"sources": 0, "documents": 0, "filtered_documents": 0, "notes": 0}
+
+    for s in range(sources):
+        sigle = f"Syn {s + 1}"
+        src_dir = os.path.join(out_dir, f"source_{s + 1:04d}")
+        os.makedirs(src_dir, exist_ok=True)
+        write_json(os.path.join(src_dir, "meta.json"), source_meta(s, sigle))
+        summary["sources"] += 1
+
+        for d in range(documents):
+            doc_id = f"S{s + 1}D{d + 1}"
+            if rnd.random() < filtered_ratio:
+                doc_id += rnd.choice(["TR", "GS"])
+                summary["filtered_documents"] += 1
+            doc_dir = os.path.join(src_dir, doc_id)
+            os.makedirs(doc_dir, exist_ok=True)
+
+            folio = f"{rnd.randint(1, 300)}{rnd.choice(['r', 'v'])}"
+            write_json(os.path.join(doc_dir, "meta.json"), document_meta(doc_id, sigle, folio, rnd.randint(1, 12)))
+            write_json(os.path.join(doc_dir, "data.json"), random_document(rnd, notes))
+            summary["documents"] += 1
+            summary["notes"] += notes
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic monodikit-style export directory.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--sources", type=int, default=3)
+    parser.add_argument("--documents", type=int, default=10, help="Documents per source.")
+    parser.add_argument("--notes", type=int, default=500, help="Notes per document.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate(args.out_dir, args.sources, args.documents, args.notes, args.seed)
+    print(f"Generated {summary['sources']} sources, {summary['documents']} documents, "
+          f"{summary['notes']} notes in {args.out_dir}")
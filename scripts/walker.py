@@ -0,0 +1,129 @@
+"""Iterative document walker.
+
+Walks a monodikit document tree (Data objects at the top, plain dicts below)
+depth-first with an explicit stack, so deep documents cannot hit the recursion
+limit. Each node is normalized once into its kind and children, then handled
+through a dispatch table keyed on kind. The walker keeps the folio/line/syllable
+context up to date and yields every nonSpaced unit it finds; the context is
+current at the moment a unit is yielded.
+"""
+
+
+class WalkContext:
+    __slots__ = ("folio", "line", "syllable", "line_counter", "syllables")
+
+    def __init__(self, folio="", line="0", line_counter=0):
+        self.folio = folio
+        self.line = line
+        self.syllable = ""
+        self.line_counter = line_counter
+        # Number of Syllable nodes walked so far
+        self.syllables = 0
+
+
+def _on_zeile_container(node, is_dict, ctx, units):
+    ctx.line_counter += 1
+    ctx.line = str(ctx.line_counter)
+    return True
+
+
+def _on_syllable(node, is_dict, ctx, units):
+    ctx.syllables += 1
+    if is_dict:
+        ctx.syllable = node.get("text", "")
+        notes_data = node.get("notes")
+    else:
+        ctx.syllable = getattr(node, "text", "")
+        notes_data = getattr(node, "notes", None)
+
+    # Syllables contain 'notes' which is a dict (e.g. {'spaced': [...]})
+    if not notes_data or not isinstance(notes_data, dict) or "spaced" not in notes_data:
+        return False
+
+    # Each spaced item (phrase/word separated by space) holds a 'nonSpaced' list: the unit
+    for spaced_item in notes_data["spaced"]:
+        if "nonSpaced" in spaced_item:
+            units.append(spaced_item["nonSpaced"])
+    # Syllable processing is done, its children are not visited
+    return False
+
+
+def _on_folio_change(node, is_dict, ctx, units):
+    # Only monodikit objects carry the new folio; dict nodes leave the context as is
+    if not is_dict:
+        if hasattr(node, "folio"):
+            ctx.folio = node.folio
+        elif hasattr(node, "text"):
+            ctx.folio = node.text
+    return True
+
+
+def _on_line_change(node, is_dict, ctx, units):
+    # Use an explicit line number if there is one, otherwise increment
+    n = None if is_dict else (getattr(node, "n", None) or getattr(node, "line", None))
+    if n:
+        ctx.line = str(n)
+    else:
+        try:
+            ctx.line = str(int(ctx.line) + 1)
+        except (TypeError, ValueError):
+            # Non-numeric line labels such as "7r" are kept
+            pass
+    return True
+
+
+def _on_non_spaced(node, is_dict, ctx, units):
+    # The node is the unit itself; its children are handled by the caller
+    units.append(node)
+    return False
+
+
+# kind -> handler(node, is_dict, ctx, units); returns whether to visit the node's children
+HANDLERS = {
+    "ZeileContainer": _on_zeile_container,
+    "Syllable": _on_syllable,
+    "FolioChange": _on_folio_change,
+    "LineChange": _on_line_change,
+    "nonSpaced": _on_non_spaced,
+}
+
+
+def walk(root, ctx):
+    """Yields every nonSpaced unit below root in document order, updating ctx on the way."""
+    handlers = HANDLERS
+    stack = [root]
+    units = []
+
+    while stack:
+        node = stack.pop()
+
+        # Normalize once: kind, label and children for dict and object nodes alike
+        is_dict = type(node) is dict or isinstance(node, dict)
+        if is_dict:
+            kind = node.get("kind")
+            label = node.get("label")
+        else:
+            kind = getattr(node, "kind", None)
+            label = getattr(node, "label", None)
+
+        # Div/Section labels override the folio context
+        if label:
+            ctx.folio = str(label)
+
+        handler = handlers.get(kind)
+        if handler is not None:
+            descend = handler(node, is_dict, ctx, units)
+            if units:
+                yield from units
+                units.clear()
+            if not descend:
+                continue
+
+        if is_dict:
+            children = node["children"] if "children" in node else node.get("elements")
+        else:
+            children = getattr(node, "children", None)
+        if children:
+            if type(children) is not list:
+                children = list(children)
+            stack.extend(reversed(children))
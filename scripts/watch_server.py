@@ -0,0 +1,325 @@
+"""Watch mode: keeps the analyzed corpus in memory and serves queries over HTTP.
+
+The export directory is polled for changed mtimes. A document whose files
+changed is re-analyzed on its own and its occurrences are swapped into the
+in-memory results; a changed source meta.json re-analyzes that source. Once
+no change has been seen for the debounce interval, data.json and the other UI
+files are exported again (data.json is replaced atomically).
+
+Queries (GET, JSON), meant to be proxied by the Vite dev server under /api:
+    /api/status
+    /api/occurrences?source=&pattern=&folio=&document=&suffix=&basic=&limit=
+    /api/patterns?q=&source=&limit=         q uses the pattern index syntax (? and %)
+    /api/folios?source=&folio=
+
+Run with:
+    python3 scripts/analyze_transcriptions.py watch --port 8765
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from analyze_transcriptions import (
+    document_entries, export_json, find_documents, find_source_dirs, iter_document_occurrences, load_document
+)
+from logic import get_basic_type
+from occurrence_store import OccurrenceStore
+from page_index import build_page_index
+from pattern_index import PatternIndex
+
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 1000
+# Errors kept for /api/status
+MAX_ERRORS = 20
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _dir_stamp(path):
+    """(name, mtime_ns, size) of every file in a document directory."""
+    stamps = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    stamps.append((entry.name, st.st_mtime_ns, st.st_size))
+    except OSError:
+        return None
+    return tuple(sorted(stamps))
+
+
+class CorpusState:
+    """The occurrences of every document, kept per source directory and document.
+
+    The merged {source: {pattern: [occurrence, ...]}} view is rebuilt on demand
+    after a change, in the order a full run of analyze_corpus produces.
+    """
+
+    def __init__(self, corpus_path="export"):
+        self.corpus_path = corpus_path
+        self.lock = threading.RLock()
+        # source_dir -> {"stamp", "sources", "documents": {entry: (stamp, OccurrenceStore)}}
+        self.sources = {}
+        self.version = 0
+        self.exported_version = None
+        self.exports = 0
+        self.errors = deque(maxlen=MAX_ERRORS)
+        self._views = {}
+
+    def record_error(self, kind, name, e):
+        print(f"Error processing {name}: {e}")
+        self.errors.append({kind: name, "type": type(e).__name__, "message": str(e)})
+
+    def _analyze(self, entry, sources):
+        store = OccurrenceStore()
+        try:
+            doc = load_document(entry, sources)
+            if doc:
+                for source, pat, info in iter_document_occurrences(doc):
+                    store.add(source, pat, info)
+        except Exception as e:
+            self.record_error("document", entry, e)
+            return OccurrenceStore()
+        return store
+
+    def scan(self):
+        """Re-analyzes whatever changed since the last scan and returns the number of documents affected."""
+        changed = 0
+        new_sources = {}
+        for src_dir in find_source_dirs(self.corpus_path):
+            meta_stamp = _stamp(os.path.join(src_dir, "meta.json"))
+            old = self.sources.get(src_dir)
+            # New source, or its sigle may have changed: analyze all of it
+            reload = old is None or old["stamp"] != meta_stamp
+            try:
+                if reload:
+                    sources, entries = find_documents(src_dir)
+                else:
+                    sources, entries = old["sources"], document_entries(src_dir)
+            except Exception as e:
+                # E.g. a meta.json that is being saved: keep what we had and retry on the next scan
+                self.record_error("source", src_dir, e)
+                if old is not None:
+                    new_sources[src_dir] = old
+                continue
+            old_documents = {} if reload else old["documents"]
+            if reload and old is not None:
+                changed += len(old["documents"])
+
+            documents = {}
+            for entry in entries:
+                stamp = _dir_stamp(entry)
+                previous = old_documents.get(entry)
+                if previous is not None and previous[0] == stamp:
+                    documents[entry] = previous
+                else:
+                    documents[entry] = (stamp, self._analyze(entry, sources))
+                    changed += 1
+            changed += len(set(old_documents) - set(documents))
+            new_sources[src_dir] = {"stamp": meta_stamp, "sources": sources, "documents": documents}
+
+        for src_dir in set(self.sources) - set(new_sources):
+            changed += len(self.sources[src_dir]["documents"])
+
+        if changed or list(new_sources) != list(self.sources):
+            with self.lock:
+                self.sources = new_sources
+                self.version += 1
+                self._views = {}
+        return changed
+
+    def _view(self, name, build):
+        with self.lock:
+            view = self._views.get(name)
+            if view is None:
+                view = self._views[name] = build()
+            return view
+
+    def results(self):
+        def build():
+            merged = OccurrenceStore()
+            for state in self.sources.values():
+                for _, store in state["documents"].values():
+                    merged.extend(store)
+            return merged.to_nested()
+        return self._view("results", build)
+
+    def page_index(self):
+        return self._view("page_index", lambda: build_page_index(self.results()))
+
+    def pattern_index(self):
+        return self._view("pattern_index", lambda: PatternIndex.from_results(self.results()))
+
+    def status(self):
+        with self.lock:
+            return {
+                "version": self.version,
+                "exportedVersion": self.exported_version,
+                "exports": self.exports,
+                "sourceDirs": len(self.sources),
+                "documents": sum(len(s["documents"]) for s in self.sources.values()),
+                "occurrences": sum(len(store) for s in self.sources.values() for _, store in s["documents"].values()),
+                "errors": list(self.errors),
+            }
+
+
+def _limit(params):
+    try:
+        return int(params.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+
+
+def query_occurrences(state, params):
+    """Occurrences matching every given filter, like occurrence_db.query_occurrences."""
+    source, pattern, folio = params.get("source"), params.get("pattern"), params.get("folio")
+    document, suffix, basic = params.get("document"), params.get("suffix"), params.get("basic")
+    limit = _limit(params)
+
+    rows = []
+    for src, patterns in state.results().items():
+        if source is not None and src != source:
+            continue
+        for pat, occurrences in patterns.items():
+            if pattern is not None and pat != pattern:
+                continue
+            if suffix is not None and suffix not in pat:
+                continue
+            if basic is not None and get_basic_type(pat) != basic:
+                continue
+            for doc, occ_folio, line, syllable, notes in occurrences:
+                if folio is not None and occ_folio != folio:
+                    continue
+                if document is not None and doc != document:
+                    continue
+                rows.append({"source": src, "pattern": pat, "doc": doc, "folio": occ_folio,
+                             "line": line, "syllable": syllable, "notes": notes})
+                if limit and len(rows) >= limit:
+                    return rows
+    return rows
+
+
+def query_patterns(state, params):
+    matches = state.pattern_index().search(params.get("q", "%"), params.get("source"), _limit(params))
+    return [{"pattern": pat, "counts": counts, "total": sum(counts.values())} for pat, counts in matches]
+
+
+def query_folios(state, params):
+    index = state.page_index()
+    source, folio = params.get("source"), params.get("folio")
+    if source is None:
+        return index["sourceFolios"]
+    if folio is None:
+        return index["sourceFolios"].get(source, [])
+    return {
+        "patterns": index["pagePatterns"].get(source, {}).get(folio, []),
+        "counts": index["pageCounts"].get(source, {}).get(folio, [])
+    }
+
+
+ROUTES = {
+    "/api/status": lambda state, params: state.status(),
+    "/api/occurrences": query_occurrences,
+    "/api/patterns": query_patterns,
+    "/api/folios": query_folios,
+}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = ROUTES.get(url.path.rstrip("/"))
+        if route is None:
+            self._send(404, {"error": f"Unknown endpoint {url.path}"})
+            return
+        try:
+            body = route(self.server.state, params)
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        self._send(200, body)
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Queries are frequent, keep the console for analysis messages
+        pass
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state):
+        super().__init__(address, QueryHandler)
+        self.state = state
+
+
+def watch(state, export, interval=1.0, debounce=2.0, stop=None):
+    """Polls for changes until stop is set and exports once changes have settled for debounce seconds."""
+    if stop is None:
+        stop = threading.Event()
+    last_change = None
+    while not stop.is_set():
+        start = time.perf_counter()
+        version = state.version
+        try:
+            changed = state.scan()
+        except Exception as e:
+            state.record_error("corpus", state.corpus_path, e)
+            changed = 0
+        if state.version != version:
+            print(f"{changed} documents re-analyzed in {time.perf_counter() - start:.2f}s (version {state.version})")
+            last_change = time.monotonic()
+        if state.exported_version != state.version and last_change is not None \
+                and time.monotonic() - last_change >= debounce:
+            version = state.version
+            start = time.perf_counter()
+            try:
+                export(state.results())
+            except Exception as e:
+                # Tried again after the next change
+                state.record_error("export", version, e)
+                last_change = None
+            else:
+                with state.lock:
+                    state.exported_version = version
+                    state.exports += 1
+                print(f"Exported version {version} in {time.perf_counter() - start:.2f}s")
+        stop.wait(interval)
+
+
+def serve(corpus_path="export", host="127.0.0.1", port=DEFAULT_PORT, interval=1.0, debounce=2.0, **export_options):
+    state = CorpusState(corpus_path)
+    server = QueryServer((host, port), state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving queries on http://{host}:{port}/api/ (watching {corpus_path}, Ctrl+C to stop)")
+
+    def export(results):
+        export_json(results, **export_options)
+
+    try:
+        watch(state, export, interval, debounce)
+    except KeyboardInterrupt:
+        print("Stopping")
+    finally:
+        server.shutdown()
@@ -0,0 +1,62 @@
+import sys
+import os
+import random
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import analytics
+from analytics import build_analytics, count_matrix, similarity_matrix, cluster_order
+
+def random_data(rnd, n_sources, n_vocab):
+    vocab = ["*" + "".join(rnd.choice("udeOQ[]") for _ in range(rnd.randint(0, 6))) for _ in range(n_vocab)]
+    return {
+        f"S{s}": {p: [[]] * rnd.randint(1, 4) for p in rnd.sample(vocab, rnd.randint(1, n_vocab // 2))}
+        for s in range(n_sources)
+    }
+
+def dense_similarity(data, metric):
+    sources, patterns, rows, cols, values = count_matrix(data)
+    X = np.zeros((len(sources), len(patterns)))
+    X[rows, cols] = values
+    if metric == "jaccard":
+        X = (X > 0).astype(float)
+        inter = X @ X.T
+        n = X.sum(axis=1)
+        return inter / (n[:, None] + n[None, :] - inter)
+    norms = np.linalg.norm(X, axis=1)
+    return (X @ X.T) / np.outer(norms, norms)
+
+def test_similarity_matches_dense(monkeypatch):
+    # Small blocks, so the Gram matrix is accumulated over several column blocks
+    monkeypatch.setattr(analytics, "_BLOCK_CELLS", 64)
+    data = random_data(random.Random(2), 12, 80)
+    sources, patterns, rows, cols, values = count_matrix(data)
+    for metric in ("cosine", "jaccard"):
+        sim = similarity_matrix(rows, cols, values, len(sources), len(patterns), metric)
+        assert np.allclose(sim, dense_similarity(data, metric))
+
+def test_group_counts_and_order():
+    data = {
+        "A": {"*u": [[]] * 2, "[*uO]": [[]], "*d": [[]] * 3},
+        "B": {"*u": [[]] * 2, "*d": [[]] * 3},
+        "C": {"*e": [[]] * 5, "*": [[]]},
+        "D": {"*e": [[]] * 4, "*": [[]]},
+    }
+    out = build_analytics(data)
+    assert out["groupCounts"]["A"] == {"u": 3, "d": 3}
+    assert out["groupTotals"] == {"(Start)": 2, "d": 6, "e": 9, "u": 5}
+    assert out["sourceSimilarity"]["sources"] == ["A", "B", "C", "D"]
+    assert out["sourceSimilarity"]["values"][2][3] > 0.99
+    assert out["sourceSimilarity"]["values"][0][2] == 0
+    # Similar sources end up next to each other
+    order = out["sourceOrder"]
+    assert sorted(order) == ["A", "B", "C", "D"]
+    assert abs(order.index("A") - order.index("B")) == 1
+    assert abs(order.index("C") - order.index("D")) == 1
+
+def test_cluster_order_is_a_permutation():
+    rnd = random.Random(5)
+    for n in (0, 1, 2, 3, 17):
+        x = np.array([[rnd.random() for _ in range(4)] for _ in range(n)]).reshape(n, 4)
+        sim = x @ x.T
+        assert sorted(cluster_order(sim)) == list(range(n))
@@ -0,0 +1,135 @@
+import sys
+import os
+import glob
+import json
+import shutil
+import subprocess
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import monodikit
+from synthetic_corpus import generate
+from analyze_transcriptions import (
+    iter_documents, iter_occurrences, analyze_single_source, is_excluded_document, parse_args,
+    analyze_corpus, find_source_dirs, run_analyze
+)
+from instrumentation import RunReport
+import occurrence_db
+from collections import defaultdict
+
+def test_iter_documents_matches_corpus(tmp_path):
+    generate(str(tmp_path), sources=2, documents=8, notes=20, seed=3, filtered_ratio=0.3)
+    for src in sorted(glob.glob(str(tmp_path / "*"))):
+        expected = [d.meta.document_id for d in monodikit.Corpus(src).documents if not is_excluded_document(d.meta)]
+        report = RunReport()
+        assert [d.meta.document_id for d in iter_documents(src, report)] == expected
+        assert report.sources[src]["filtered"] == 8 - len(expected)
+
+def test_occurrence_stream(tmp_path):
+    generate(str(tmp_path), sources=1, documents=5, notes=40, seed=8)
+    src = glob.glob(str(tmp_path / "*"))[0]
+    stream = iter_occurrences(src)
+    first = next(stream)
+    assert first[0] == "Syn 1" and len(first[2]) == 5
+
+    results = analyze_single_source(src)
+    rebuilt = defaultdict(lambda: defaultdict(list))
+    for source, pat, info in iter_occurrences(src):
+        rebuilt[source][pat].append(info)
+    assert rebuilt == results
+
+def test_parse_args_commands():
+    args = parse_args([])
+    assert args.command is None and args.jobs == 1 and not args.from_db
+    assert args.equivalence_distance == 0
+
+    # Options given before the command are not reset by the command's parser
+    args = parse_args(["-j", "3", "export", "--sharded", "--db", "x.db"])
+    assert (args.command, args.jobs, args.sharded, args.db) == ("export", 3, True, "x.db")
+
+    args = parse_args(["analyze", "--rebuild"])
+    assert args.command == "analyze" and args.rebuild and args.format_version == 1
+
+def test_import_is_light():
+    scripts = os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts'))
+    code = "import sys, analyze_transcriptions; print(sorted({'pandas', 'numpy', 'monodikit'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=scripts, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+def test_parallel_matches_serial(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=4, documents=3, notes=25, seed=11, filtered_ratio=0.2)
+    serial = analyze_corpus(corpus, jobs=1, cache_dir=None)
+    parallel = analyze_corpus(corpus, jobs=2, cache_dir=None)
+    assert list(parallel) == list(serial)
+    for src in serial:
+        assert list(parallel[src].items()) == list(serial[src].items())
+
+def test_parallel_reports_failing_source(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=3, documents=2, notes=20, seed=12, filtered_ratio=0)
+    expected = analyze_corpus(corpus, jobs=1, cache_dir=None)
+    broken = find_source_dirs(corpus)[1]
+    with open(os.path.join(broken, "meta.json"), "w") as f:
+        f.write("{")
+
+    report = RunReport()
+    results = analyze_corpus(corpus, jobs=2, cache_dir=None, report=report)
+    assert [e["source"] for e in report.errors] == [broken]
+    assert len(results) == 2
+    assert all(results[src] == expected[src] for src in results)
+
+def test_bad_document_is_reported_and_skipped(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=1, documents=4, notes=20, seed=5, filtered_ratio=0)
+    src = find_source_dirs(corpus)[0]
+    expected = analyze_corpus(corpus, jobs=1, cache_dir=None)
+    broken = sorted(glob.glob(os.path.join(src, "*", "data.json")))[1]
+    with open(os.path.join(os.path.dirname(broken), "meta.json")) as f:
+        broken_id = json.load(f)["dokumenten_id"]
+    with open(broken) as f:
+        data = f.read()
+    # Loads, but fails during the analysis
+    with open(broken, "w") as f:
+        f.write(data.replace('"octave": 5', '"octave": "x"', 1))
+
+    cache = str(tmp_path / "cache")
+    report = RunReport()
+    results = analyze_corpus(corpus, jobs=1, cache_dir=cache, report=report)
+    for source, patterns in expected.items():
+        kept = {p: [o for o in occs if o[0] != broken_id] for p, occs in patterns.items()}
+        assert results[source] == {p: occs for p, occs in kept.items() if occs}
+    assert report.sources[src]["errors"] == 1
+    assert [(e["source"], e["document"]) for e in report.errors] == [(src, os.path.dirname(broken))]
+    assert "Traceback" in report.errors[0]["traceback"]
+    # Not cached, so the document is retried and reported again
+    report = RunReport()
+    analyze_corpus(corpus, jobs=1, cache_dir=cache, report=report)
+    assert len(report.errors) == 1 and report.sources[src]["cached"] == 0
+
+def test_stats_without_database(tmp_path):
+    script = os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts/analyze_transcriptions.py'))
+    out = subprocess.run([sys.executable, script, "stats", "--db", str(tmp_path / "missing.db")],
+                         cwd=str(tmp_path), capture_output=True, text=True)
+    assert out.returncode == 1
+    assert "Traceback" not in out.stderr
+    assert out.stdout.strip().splitlines() == [f"No occurrence database at {tmp_path / 'missing.db'}: run `analyze` first, or pass --db."]
+
+def test_cached_run_keeps_database(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=3, documents=2, notes=20, seed=14, filtered_ratio=0)
+    db = str(tmp_path / "occ.db")
+    args = parse_args(["analyze", "--cache-dir", str(tmp_path / "cache"), "--db", db])
+
+    run_analyze(args, RunReport(), corpus)
+    written = os.stat(db).st_mtime_ns
+    report = RunReport()
+    run_analyze(args, report, corpus)
+    assert os.stat(db).st_mtime_ns == written
+    assert report.totals()["cached"] == 3
+
+    # A removed source drops its cache entry, so the database is written again
+    removed = find_source_dirs(corpus)[0]
+    shutil.rmtree(removed)
+    run_analyze(args, RunReport(), corpus)
+    with occurrence_db.connect(db) as conn:
+        assert occurrence_db.load_results(conn) == analyze_corpus(corpus, cache_dir=None)
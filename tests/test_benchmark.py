@@ -0,0 +1,21 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from benchmark import compare_reports
+
+def test_compare_reports():
+    baseline = {"stages": {
+        "analyze": {"seconds": 2.0, "peak_rss_mb": 100.0},
+        "export-v1": {"seconds": 1.0, "peak_rss_mb": 50.0, "export_bytes": 1000},
+    }}
+    report = {"stages": {
+        "analyze": {"seconds": 1.5, "peak_rss_mb": 105.0},
+        "export-v1": {"seconds": 1.0, "peak_rss_mb": 50.0, "export_bytes": 1200},
+        "export-v2": {"seconds": 1.0, "peak_rss_mb": 50.0, "export_bytes": 900},
+    }}
+    rows, regressions = compare_reports(report, baseline, tolerance=0.1)
+    assert len(rows) == 5
+    assert [(r[0], r[1]) for r in regressions] == [("export-v1", "export_bytes")]
+    _, regressions = compare_reports(report, baseline, tolerance=0.01)
+    assert [(r[0], r[1]) for r in regressions] == [("analyze", "peak_rss_mb"), ("export-v1", "export_bytes")]
@@ -0,0 +1,43 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from data_format import encode_source, decode_source, write_export, read_export, FORMAT_VERSION
+
+DATA = {
+    "Pa 1235": {
+        "*u": [["DOC1", "9", "1", "Al", "C4-D4"], ["DOC1", "9", "2", "le", "C4-D4"]],
+        "[*ud]": [["DOC1", "9v", "1", "lu", "C4-D4-C4"]],
+        "*": []
+    },
+    "Pa 1107": {"*d": [["DOC2", "145v", "3", "ia", "D4-C4"]]}
+}
+
+def test_source_round_trip():
+    for patterns in DATA.values():
+        assert decode_source(encode_source(patterns)) == patterns
+
+def test_strings_are_shared():
+    encoded = encode_source(DATA["Pa 1235"])
+    doc_table, folio_table = encoded["strings"][0], encoded["strings"][1]
+    assert doc_table == ["DOC1"]
+    assert folio_table == ["9", "9v"]
+    assert encoded["counts"] == [2, 1, 0]
+    assert all(len(col) == 3 for col in encoded["columns"])
+
+def test_file_round_trip_against_v1(tmp_path):
+    export_obj = {"data": DATA, "stats": {"*u": {"count": 2, "length": 2}}, "overallMax": 2}
+    v1_path = str(tmp_path / "v1.json")
+    v2_path = str(tmp_path / "v2.json")
+    write_export(v1_path, export_obj, version=1)
+    write_export(v2_path, export_obj, version=FORMAT_VERSION)
+
+    with open(v2_path) as f:
+        assert json.load(f)["version"] == FORMAT_VERSION
+
+    # Reading v2 gives back exactly what v1 stores, key order included
+    v1 = read_export(v1_path)
+    v2 = read_export(v2_path)
+    assert v2 == v1
+    assert json.dumps(v2) == json.dumps(v1)
@@ -0,0 +1,97 @@
+import sys
+import os
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from logic import pitch_to_midi, get_direction, get_suffix
+from encoding import (
+    DocumentEncoder, encode_unit, midi_pitch, type_code, direction_codes, SUFFIXES, NOTE_TYPES, TYPE_CODES, DOWN, EQUAL, UP
+)
+
+def reference_pattern(group_segments):
+    # The per-note pattern builder that DocumentEncoder replaces
+    parts = []
+    prev_last_note = None
+    for i, grp in enumerate(group_segments):
+        is_group = len(grp) > 1
+        if i == 0:
+            if is_group: parts.append("[")
+            parts.append("*" + get_suffix(grp[0]["type"], grp[0]["liquescent"]))
+        else:
+            if is_group: parts.append("[")
+            if prev_last_note is not None:
+                link_dir = get_direction(prev_last_note["pitch"], grp[0]["pitch"])
+                parts.append(link_dir + get_suffix(grp[0]["type"], grp[0]["liquescent"]))
+        if len(grp) >= 2:
+            for k in range(len(grp)-1):
+                d = get_direction(grp[k]["pitch"], grp[k+1]["pitch"])
+                parts.append(d + get_suffix(grp[k+1]["type"], grp[k+1]["liquescent"]))
+        if is_group: parts.append("]")
+        prev_last_note = grp[-1]
+    return "".join(parts)
+
+def random_unit(rnd):
+    types = list(NOTE_TYPES) + ["Flat", "Unknown"]
+    groups = []
+    for _ in range(rnd.randint(1, 4)):
+        grp = []
+        for _ in range(rnd.choice([1, 1, 2, 3, 5])):
+            grp.append({
+                "pitch": pitch_to_midi(rnd.choice("CDEFGABcdefgab"), rnd.randint(3, 5)),
+                "type": rnd.choice(types),
+                "liquescent": rnd.choice([False, True, 0, 1, None])
+            })
+        groups.append(grp)
+    return groups
+
+def as_tuples(groups):
+    return [[(n["pitch"], n["type"], n["liquescent"]) for n in grp] for grp in groups]
+
+def unit_arrays(groups):
+    notes = [n for grp in groups for n in grp]
+    return (
+        [n["pitch"] for n in notes],
+        [TYPE_CODES.get(n["type"], 0) for n in notes],
+        [n["liquescent"] for n in notes],
+        [len(grp) for grp in groups]
+    )
+
+def test_midi_pitch_matches_logic():
+    for base in "CDEFGABcdefgabXh":
+        for octave in (0, 3, "4", 5):
+            assert midi_pitch(base, octave) == pitch_to_midi(base, octave)
+
+def test_suffix_table_matches_logic():
+    for name in list(NOTE_TYPES) + ["Flat", "Unknown"]:
+        for liq in (False, True, None, 1):
+            assert SUFFIXES[type_code(name, liq)] == get_suffix(name, liq)
+
+def test_directions():
+    assert direction_codes([48, 50, 50, 47]) == [UP, EQUAL, DOWN]
+    assert direction_codes([48]) == []
+    notes = [[(pitch, "Normal", False)] for pitch in (48, 50, 50, 47)]
+    assert encode_unit(notes) == "*ued"
+    # Every unit starts over, whatever the last note of the previous one
+    encoder = DocumentEncoder()
+    encoder.add_unit([48, 50], [0, 0], [False, False], [1, 1])
+    encoder.add_unit([47, 45], [0, 0], [False, False], [1, 1])
+    assert encoder.encode() == ["*u", "*d"]
+
+def test_single_units_match_reference():
+    assert encode_unit(as_tuples([[{"pitch": 48, "type": "Normal", "liquescent": False}]])) == "*"
+    rnd = random.Random(0)
+    for _ in range(2000):
+        groups = random_unit(rnd)
+        assert encode_unit(as_tuples(groups)) == reference_pattern(groups)
+
+def test_document_matches_reference():
+    rnd = random.Random(1)
+    units = [random_unit(rnd) for _ in range(500)]
+    encoder = DocumentEncoder()
+    for groups in units:
+        encoder.add_unit(*unit_arrays(groups))
+    assert len(encoder) == 500
+    assert encoder.encode() == [reference_pattern(groups) for groups in units]
+
+def test_empty_document():
+    assert DocumentEncoder().encode() == []
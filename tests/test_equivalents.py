@@ -0,0 +1,74 @@
+import sys
+import os
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from equivalents import bounded_distance, find_edges, cluster_patterns
+
+def levenshtein(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+def random_patterns(rnd, n):
+    return sorted({"*" + "".join(rnd.choice("udeO[]") for _ in range(rnd.randint(0, 7))) for _ in range(n)})
+
+def test_bounded_distance():
+    rnd = random.Random(0)
+    for _ in range(3000):
+        a = "".join(rnd.choice("udO[") for _ in range(rnd.randint(0, 7)))
+        b = "".join(rnd.choice("udO[") for _ in range(rnd.randint(0, 7)))
+        d = levenshtein(a, b)
+        for k in (0, 1, 2):
+            assert bounded_distance(a, b, k) == (d if d <= k else None), (a, b, k)
+
+def test_edges_match_all_pairs():
+    patterns = random_patterns(random.Random(1), 300)
+    for k in (1, 2):
+        expected = [
+            (i, j, levenshtein(patterns[i], patterns[j]))
+            for i in range(len(patterns)) for j in range(i + 1, len(patterns))
+            if levenshtein(patterns[i], patterns[j]) <= k
+        ]
+        assert find_edges(patterns, k, chunk_size=64) == expected
+        assert find_edges(patterns, k, jobs=2, chunk_size=64) == expected
+
+def test_clusters():
+    rnd = random.Random(2)
+    patterns = random_patterns(rnd, 200)
+    data = {
+        src: {p: [[]] * rnd.randint(1, 9) for p in rnd.sample(patterns, 120)}
+        for src in ("A", "B", "C")
+    }
+    clusters = cluster_patterns(data, k=1)
+    assert clusters
+
+    seen = set()
+    for c in clusters:
+        assert c["patterns"][0] == c["representative"] and len(c["patterns"]) >= 2
+        for pat, d in zip(c["patterns"], c["distances"]):
+            assert levenshtein(c["representative"], pat) == d <= 1
+            assert pat not in seen
+            seen.add(pat)
+        assert c["counts"] == {
+            src: sum(len(data[src].get(p, [])) for p in c["patterns"])
+            for src in data if any(p in data[src] for p in c["patterns"])
+        }
+        assert c["total"] == sum(c["counts"].values())
+    assert [c["total"] for c in clusters] == sorted((c["total"] for c in clusters), reverse=True)
+
+def test_suffix_and_step_variants():
+    data = {"A": {"*udO": [[]] * 5, "*ud": [[]] * 3, "*uu": [[]], "*ddd": [[]]}}
+    clusters = cluster_patterns(data, k=1)
+    assert clusters == [{
+        "representative": "*udO",
+        "patterns": ["*udO", "*ud"],
+        "distances": [0, 1],
+        "counts": {"A": 8},
+        "total": 8
+    }]
+    assert cluster_patterns(data, k=0) == []
@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import export_assets
+from export_assets import load_glyphs, load_manifest_map, FALLBACK_GLYPH
+
+SVG = '<svg viewBox="0 0 20 20"><path d="M1,1 L2,2"/></svg>'
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def test_glyph_sidecar_follows_mtime(tmp_path, monkeypatch):
+    svg = str(tmp_path / "note.svg")
+    write(svg, SVG)
+    glyph_files = {"note": svg, "missing": str(tmp_path / "missing.svg")}
+    asset_dir = str(tmp_path / "assets")
+
+    glyphs = load_glyphs(asset_dir, glyph_files)
+    assert glyphs == {"note": {"viewBox": "0 0 20 20", "d": "M1,1 L2,2"}, "missing": FALLBACK_GLYPH}
+    assert os.path.exists(os.path.join(asset_dir, "glyphs.json"))
+
+    # Unchanged inputs: the sidecar is used, the SVG is not parsed again
+    def fail(path):
+        raise AssertionError("glyph parsed again")
+    monkeypatch.setattr(export_assets, "read_glyph", fail)
+    assert load_glyphs(asset_dir, glyph_files) == glyphs
+    monkeypatch.undo()
+
+    write(svg, SVG.replace("M1,1", "M3,3"))
+    os.utime(svg, ns=(1, 1))
+    assert load_glyphs(asset_dir, glyph_files)["note"]["d"] == "M3,3 L2,2"
+
+def test_manifest_sidecar(tmp_path, monkeypatch):
+    import pandas as pd
+    excel = str(tmp_path / "Quellendaten.xlsx")
+    pd.DataFrame({
+        "Quellensigle": ["Pa 1235", "Aa 13", "Ba 5"],
+        "Manifest": ["https://example.org/pa.json", None, "https://example.org/ba.json"],
+    }).to_excel(excel, index=False)
+    asset_dir = str(tmp_path / "assets")
+
+    expected = {"Pa 1235": {"url": "https://example.org/pa.json"}, "Ba 5": {"url": "https://example.org/ba.json"}}
+    assert load_manifest_map(asset_dir, excel) == expected
+
+    def fail(path):
+        raise AssertionError("sheet read again")
+    monkeypatch.setattr(export_assets, "read_manifest_map", fail)
+    assert load_manifest_map(asset_dir, excel) == expected
+
+def test_missing_manifest_sheet(tmp_path):
+    assert load_manifest_map(str(tmp_path / "assets"), str(tmp_path / "none.xlsx")) == {}
+    assert not os.path.exists(str(tmp_path / "assets"))
@@ -0,0 +1,49 @@
+import sys
+import os
+import gzip
+import json
+from collections import defaultdict
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import export_formats
+from export_formats import to_plain, write_formats, format_path
+
+def test_to_plain_matches_json_round_trip():
+    data = defaultdict(lambda: defaultdict(list))
+    data["Pa 1235"]["*u"].append(["D1", "145v", "1", "Al", "C4-D4"])
+    data["Pa 1235"]["*d"].append(("D1", "145v", "2", "le", "D4-C4"))
+    data["Aa 13"]["*u"].extend([["D9", "1r", "1", "ia", "F4-G4"]])
+    obj = {"data": data, "stats": {"*u": {"count": 2, "length": 2}}, 3: None, 1.5: [True, 0.25], None: (1, [2])}
+
+    plain = to_plain(obj)
+    assert plain == json.loads(json.dumps(obj))
+    assert json.dumps(plain) == json.dumps(obj)
+    assert type(plain["data"]) is dict and type(plain["data"]["Pa 1235"]) is dict
+
+    # Plain occurrence lists are shared, not copied
+    assert plain["data"]["Pa 1235"]["*u"][0] is data["Pa 1235"]["*u"][0]
+
+def test_write_formats(tmp_path):
+    path = str(tmp_path / "data.json")
+    obj = {"data": {"Pa 1235": {"*u": [["D1", "145v", "1", "Al", "C4-D4"]]}}}
+    with open(path, "w") as f:
+        json.dump(obj, f)
+
+    rows = write_formats(path, obj, ["gz"], json_seconds=0.5)
+    assert [r["format"] for r in rows] == ["json", "gz"]
+    assert rows[0]["bytes"] == os.path.getsize(path) and rows[0]["seconds"] == 0.5
+    with open(format_path(path, "gz"), "rb") as f:
+        assert gzip.decompress(f.read()) == open(path, "rb").read()
+
+    # Copies that are no longer requested are removed
+    write_formats(path, obj, [])
+    assert not os.path.exists(format_path(path, "gz"))
+
+def test_missing_package_is_skipped(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.json")
+    with open(path, "w") as f:
+        f.write("{}")
+    monkeypatch.setattr(export_formats, "available", lambda name: name == "gz")
+    rows = write_formats(path, {}, ["msgpack", "gz"])
+    assert [r["format"] for r in rows] == ["json", "gz"]
+    assert not os.path.exists(format_path(path, "msgpack"))
@@ -0,0 +1,65 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from instrumentation import RunReport
+from synthetic_corpus import generate
+from analyze_transcriptions import analyze_corpus
+
+def test_merge_reports():
+    worker = RunReport()
+    worker.add_time("traverse", 1.5)
+    worker.source("a")["documents"] += 3
+    worker.error("a", ValueError("broken"), document="D1")
+
+    report = RunReport()
+    report.add_time("traverse", 0.5)
+    report.source("a")["documents"] += 1
+    report.source("b")["notes"] += 7
+    report.merge(worker.to_dict())
+
+    out = report.to_dict()
+    assert out["stages"]["traverse"] == {"seconds": 2.0, "calls": 2}
+    assert out["sources"]["a"]["documents"] == 4
+    assert out["totals"]["documents"] == 4 and out["totals"]["notes"] == 7 and out["totals"]["errors"] == 1
+    assert out["errors"][0]["type"] == "ValueError" and out["errors"][0]["document"] == "D1"
+
+def test_nested_stages():
+    report = RunReport()
+    with report.stage("export"):
+        time.sleep(0.02)
+        with report.stage("scans"):
+            time.sleep(0.05)
+        with report.stage("formats"):
+            with report.stage("gz"):
+                time.sleep(0.03)
+    stages = report.stages
+    assert 0.02 <= stages["export"][0] < 0.045
+    assert stages["scans"][0] >= 0.05
+    assert stages["formats"][0] < 0.02 and stages["gz"][0] >= 0.03
+
+def test_counters_and_errors(tmp_path):
+    corpus = tmp_path / "export"
+    summary = generate(str(corpus), sources=2, documents=5, notes=60, seed=4, filtered_ratio=0.4)
+    # A source whose meta.json cannot be loaded
+    broken = corpus / "zz_broken"
+    broken.mkdir()
+    (broken / "meta.json").write_text('{"id": "x"}')
+
+    report = RunReport()
+    results = analyze_corpus(str(corpus), cache_dir=str(tmp_path / "cache"), report=report)
+    totals = report.totals()
+    assert totals["documents"] == summary["documents"] - summary["filtered_documents"]
+    assert totals["filtered"] == summary["filtered_documents"]
+    assert totals["notes"] == 60 * totals["documents"]
+    assert totals["syllables"] > 0
+    assert totals["occurrences"] == sum(len(o) for p in results.values() for o in p.values())
+    assert totals["errors"] == 1 and report.errors[0]["source"] == str(broken)
+    assert {"load_corpus", "traverse", "encode", "cache_write", "merge"} <= set(report.stages)
+
+    # Second run: everything but the broken source comes from the cache
+    report = RunReport()
+    analyze_corpus(str(corpus), cache_dir=str(tmp_path / "cache"), report=report)
+    assert report.totals()["cached"] == 2
+    assert report.totals()["occurrences"] == totals["occurrences"]
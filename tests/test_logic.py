@@ -3,7 +3,7 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
 
-from logic import pitch_to_midi, get_direction, get_suffix
+from logic import pitch_to_midi, get_direction, get_suffix, get_basic_type
 
 def test_pitch_to_midi():
     assert pitch_to_midi('C', 4) == 48
@@ -21,8 +21,14 @@ def test_get_suffix():
     assert get_suffix("Normal", True) == "L"
     assert get_suffix("Oriscus", True) == "OL"
 
+def test_get_basic_type():
+    assert get_basic_type("[*uO]dL") == "ud"
+    assert get_basic_type("*") == "(Start)"
+    assert get_basic_type("[*Q]") == "(Start)"
+
 if __name__ == "__main__":
     test_pitch_to_midi()
     test_get_direction()
     test_get_suffix()
+    test_get_basic_type()
     print("All logic tests passed!")
@@ -0,0 +1,97 @@
+import sys
+import os
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import occurrence_db
+from occurrence_db import write_results, load_results, query_occurrences, pattern_counts, source_summary
+
+RESULTS = {
+    "Pa 1235": {
+        "*u": [["D1", "145v", "1", "Al", "C4-D4"], ["D2", "146r", "3", "le", "D4-E4"]],
+        "[*uQ]": [["D1", "145v", "2", "lu", "C4-D4"]],
+    },
+    "Aa 13": {
+        "*u": [["D9", "145v", "1", "ia", "F4-G4"]],
+        "*dS": [["D9", "12r", "7", "ia", "G4-F4"]],
+    },
+}
+
+def open_db(tmp_path, results=RESULTS):
+    path = str(tmp_path / "occ.db")
+    assert write_results(path, results) == sum(len(o) for p in results.values() for o in p.values())
+    return occurrence_db.connect(path)
+
+def test_roundtrip_keeps_order(tmp_path):
+    rnd = random.Random(4)
+    results = {}
+    for s in range(5):
+        patterns = {}
+        for _ in range(rnd.randint(1, 30)):
+            pat = "*" + "".join(rnd.choice("udeOQ[]") for _ in range(rnd.randint(0, 5)))
+            patterns.setdefault(pat, []).extend(
+                [f"D{rnd.randint(1, 4)}", f"{rnd.randint(1, 9)}r", str(rnd.randint(1, 9)), "syl", "C4"]
+                for _ in range(rnd.randint(1, 4))
+            )
+        results[f"Src {4 - s}"] = patterns
+    conn = open_db(tmp_path, results)
+    loaded = load_results(conn)
+    assert loaded == results
+    assert list(loaded) == list(results)
+    assert all(list(loaded[s]) == list(results[s]) for s in results)
+
+def test_queries(tmp_path):
+    conn = open_db(tmp_path)
+    assert occurrence_db.sources(conn) == ["Pa 1235", "Aa 13"]
+
+    on_folio = query_occurrences(conn, folio="145v")
+    assert [(r[0], r[1], r[2]) for r in on_folio] == [("Pa 1235", "*u", "D1"), ("Pa 1235", "[*uQ]", "D1"), ("Aa 13", "*u", "D9")]
+    assert len(query_occurrences(conn, source="Aa 13", folio="145v")) == 1
+    assert [r[5] for r in query_occurrences(conn, suffix="Q")] == ["lu"]
+    assert [r[1] for r in query_occurrences(conn, basic="u")] == ["*u", "*u", "[*uQ]", "*u"]
+    assert query_occurrences(conn, source="Aa 13", pattern="*dS")[0][3:] == ("12r", "7", "ia", "G4-F4")
+    assert query_occurrences(conn, source="Nope") == []
+    assert len(query_occurrences(conn, limit=2)) == 2
+
+    assert pattern_counts(conn) == {"*u": 3, "*dS": 1, "[*uQ]": 1}
+    assert pattern_counts(conn, document="D1") == {"*u": 1, "[*uQ]": 1}
+    assert pattern_counts(conn, source="Aa 13") == {"*dS": 1, "*u": 1}
+
+def test_rewrite_replaces_database(tmp_path):
+    open_db(tmp_path).close()
+    conn = open_db(tmp_path, {"X": {"*": [["D", "1r", "1", "a", "C4"]]}})
+    assert load_results(conn) == {"X": {"*": [["D", "1r", "1", "a", "C4"]]}}
+
+def test_source_summary(tmp_path):
+    with open_db(tmp_path) as conn:
+        assert source_summary(conn) == [("Pa 1235", 2, 2, 3), ("Aa 13", 1, 2, 2)]
+        assert occurrence_db.pattern_total(conn) == 3
+
+def test_writer_adds_sources_as_they_arrive(tmp_path):
+    path = str(tmp_path / "occ.db")
+    batches = [
+        {"Pa 1235": {"*u": [["D1", "145v", "1", "Al", "C4-D4"]]}},
+        {"Aa 13": RESULTS["Aa 13"]},
+        # The same source again, as from a second source directory
+        {"Pa 1235": {"[*uQ]": [["D1", "145v", "2", "lu", "C4-D4"]], "*u": [["D2", "146r", "3", "le", "D4-E4"]]}},
+    ]
+    with occurrence_db.ResultWriter(path) as writer:
+        for batch in batches:
+            writer.add(batch)
+        assert not os.path.exists(path)
+    assert writer.n_occurrences == 5
+    with occurrence_db.connect(path) as conn:
+        loaded = load_results(conn)
+    assert loaded == RESULTS
+    assert list(loaded) == list(RESULTS)
+    assert all(list(loaded[s]) == list(RESULTS[s]) for s in RESULTS)
+
+def test_writer_removes_temp_file_on_error(tmp_path):
+    path = str(tmp_path / "occ.db")
+    try:
+        with occurrence_db.ResultWriter(path) as writer:
+            writer.add(RESULTS)
+            raise RuntimeError("analysis failed")
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
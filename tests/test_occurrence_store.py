@@ -0,0 +1,54 @@
+import sys
+import os
+import pickle
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from occurrence_store import OccurrenceStore
+
+def occ(doc, folio="1r", line="1", syllable="a", notes="C4-D4"):
+    return [doc, folio, line, syllable, notes]
+
+def test_nested_round_trip():
+    rnd = random.Random(5)
+    results = {}
+    for s in range(4):
+        patterns = results.setdefault(f"S{s}", {})
+        for _ in range(rnd.randint(1, 20)):
+            pat = "*" + "".join(rnd.choice("ude") for _ in range(rnd.randint(0, 4)))
+            patterns.setdefault(pat, []).append(occ(f"D{rnd.randint(0, 3)}", f"{rnd.randint(1, 9)}r"))
+    store = OccurrenceStore.from_nested(results)
+    assert len(store) == sum(len(o) for p in results.values() for o in p.values())
+    assert store.pattern_count() == sum(len(p) for p in results.values())
+    nested = store.to_nested()
+    assert nested == results
+    assert [list(p) for p in nested.values()] == [list(p) for p in results.values()]
+
+def test_extend_keeps_order_and_shares_segments():
+    a = OccurrenceStore.from_nested({"S": {"*u": [occ("a")], "*d": [occ("b")]}})
+    b = OccurrenceStore.from_nested({"S": {"*d": [occ("c")], "*e": [occ("d")]}, "T": {"*": [occ("e")]}})
+    final = OccurrenceStore()
+    final.extend(a)
+    final.extend(b)
+    assert final.segments[0] is a.segments[0] and final.segments[1] is b.segments[0]
+    assert final.to_nested() == {
+        "S": {"*u": [occ("a")], "*d": [occ("b"), occ("c")], "*e": [occ("d")]},
+        "T": {"*": [occ("e")]},
+    }
+    assert list(final.to_nested()["S"]) == ["*u", "*d", "*e"]
+    assert final.pattern_count() == 4
+
+    # Adding after a merge never writes into a segment of another store
+    final.add("T", "*u", occ("f"))
+    assert len(b) == 3 and len(final) == 6
+
+def test_strings_are_interned_and_pickled():
+    store = OccurrenceStore()
+    for i in range(200):
+        store.add("S", "*u", occ("DOC", str(i % 3)))
+    nested = store.to_nested()["S"]["*u"]
+    assert nested[0][0] is nested[1][0]
+    assert len(store.segments[0].strings) == 8
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored.to_nested() == store.to_nested()
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from page_index import build_page_index
+
+DATA = {
+    "Pa 1107": {
+        "*u": [["DOC1", "146", "1", "Al", "C4-D4"], ["DOC1", "145v", "2", "le", "C4-D4"]],
+        "*d": [["DOC1", "146", "1", "lu", "D4-C4"], ["DOC1", "146", "3", "ia", "D4-C4"]],
+        "*": [["DOC1", "145v", "4", "a", "C4"]]
+    }
+}
+
+def test_page_index():
+    index = build_page_index(DATA)
+    assert index["sourceFolios"] == {"Pa 1107": ["146", "145v"]}
+    assert index["pagePatterns"]["Pa 1107"] == {"146": ["*d", "*u"], "145v": ["*", "*u"]}
+    assert index["pageCounts"]["Pa 1107"] == {"146": [2, 1], "145v": [1, 1]}
+    assert index["patternCounts"] == {"Pa 1107": {"*u": 2, "*d": 2, "*": 1}}
+
+def test_empty_source():
+    index = build_page_index({"Empty": {}})
+    assert index["sourceFolios"] == {"Empty": []}
+    assert index["pagePatterns"] == {"Empty": {}}
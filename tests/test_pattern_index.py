@@ -0,0 +1,55 @@
+import sys
+import os
+import random
+import re
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from pattern_index import PatternIndex, compile_query, normalize_query
+
+ALPHABET = "*udeOQLS[]"
+
+def random_data(rnd):
+    data = {}
+    for s in range(4):
+        patterns = {}
+        for _ in range(rnd.randint(20, 60)):
+            pat = "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 9)))
+            patterns[pat] = [["D", "1r", "1", "a", "C4"]] * rnd.randint(1, 5)
+        data[f"Src {s}"] = patterns
+    return data
+
+def brute_force(data, query, source=None):
+    regex = compile_query(normalize_query(query))
+    out = {}
+    for src, patterns in data.items():
+        for pat, occ in patterns.items():
+            if regex.search(pat):
+                out.setdefault(pat, {})[src] = len(occ)
+    if source is not None:
+        out = {p: c for p, c in out.items() if source in c}
+    return out
+
+def test_matches_linear_scan():
+    rnd = random.Random(1)
+    data = random_data(rnd)
+    index = PatternIndex.from_results(data)
+    queries = ["[udO]", "*e?d", "%", "O", "*u%dS", "ud", "??", "e%e%e", "[*", "zzz", "[UDo]"]
+    queries += ["".join(rnd.choice(ALPHABET + "?%") for _ in range(rnd.randint(1, 5))) for _ in range(200)]
+    for q in queries:
+        assert dict(index.search(q)) == brute_force(data, q), q
+        assert dict(index.search(q, source="Src 2")) == brute_force(data, q, "Src 2"), q
+
+def test_order_limit_and_roundtrip():
+    data = {
+        "A": {"*ud": [[]] * 2, "*u": [[]] * 5, "[*u]d": [[]]},
+        "B": {"*ud": [[]] * 4},
+    }
+    index = PatternIndex.from_results(data)
+    assert index.search("*u") == [("*ud", {"A": 2, "B": 4}), ("*u", {"A": 5}), ("[*u]d", {"A": 1})]
+    assert index.search("*u", limit=1) == [("*ud", {"A": 2, "B": 4})]
+    assert index.search("*u?", source="B") == [("*ud", {"B": 4, "A": 2})]
+    assert index.search("*u", source="C") == []
+
+    restored = PatternIndex.from_dict(index.to_dict())
+    assert restored.postings == index.postings
+    assert restored.search("u%d") == index.search("u%d")
@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from scan_index import list_scans, ScanResolver, build_scan_index, write_scan_index
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+def test_list_scans(tmp_path):
+    public = tmp_path / "public"
+    docs = tmp_path / "docs"
+    touch(str(docs / "Pa 1235" / "9.jpg"))
+    assert list_scans([str(public), str(docs)]) == ["scans/Pa 1235/9.jpg"]
+
+    for name in ["Pa 1107/146.jpg", "Pa 1107/145v.jpg", "Pa 1107/notes.txt", "Pa 1235/sub/3.png", "top.jpeg"]:
+        touch(str(public / name))
+    assert list_scans([str(public), str(docs)]) == [
+        "scans/Pa 1107/145v.jpg", "scans/Pa 1107/146.jpg", "scans/Pa 1235/sub/3.png", "scans/top.jpeg"
+    ]
+    assert list_scans([str(tmp_path / "missing")]) == []
+
+def test_resolve():
+    resolver = ScanResolver([
+        "scans/Pa 1107/145v.jpg",
+        "scans/Pa 1235/9.jpg",
+        "scans/Pa 1235/10.jpeg",
+        "scans/Pa 12/9.jpg",
+        "scans/Pa 1235-9-1/11.jpg",
+        "scans/Pa 1235/11.png",
+    ])
+    assert resolver.resolve("Pa 1107", "145v") == "scans/Pa 1107/145v.jpg"
+    assert resolver.resolve(" Pa 1107 ", "145v ") == "scans/Pa 1107/145v.jpg"
+    # The siglum contains the directory name; the first match in path order wins
+    assert resolver.resolve("Pa 1235-9-1", "9") == "scans/Pa 1235/9.jpg"
+    assert resolver.resolve("Pa 12-3", "9") == "scans/Pa 12/9.jpg"
+    assert resolver.resolve("Pa 1235-9-1", "10") == "scans/Pa 1235/10.jpeg"
+    assert resolver.resolve("Pa 1235-9-1", "11") == "scans/Pa 1235-9-1/11.jpg"
+    # Only .jpg and .jpeg are matched
+    assert resolver.resolve("Pa 1235", "11") is None
+    assert resolver.resolve("Pa 1107", "9") is None
+    assert resolver.resolve("", "9") is None
+    assert resolver.resolve("Pa 1235", None) is None
+
+def test_build_and_write(tmp_path):
+    touch(str(tmp_path / "scans" / "Pa 1235" / "9.jpg"))
+    source_folios = {"Pa 1235-9-1": ["9", "10"], "Other": ["1r"]}
+    index = build_scan_index(source_folios, list_scans([str(tmp_path / "scans")]))
+    assert index == {
+        "scans": {"Pa 1235-9-1": {"9": "scans/Pa 1235/9.jpg"}},
+        "unresolved": {"Pa 1235-9-1": ["10"], "Other": ["1r"]}
+    }
+
+    out = tmp_path / "scan_index.json"
+    assert write_scan_index(source_folios, str(out), [str(tmp_path / "scans")]) == index
+    with open(out) as f:
+        assert json.load(f) == index
@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+import importlib.util
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import scan_tiles
+from scan_tiles import max_level, level_size, tile_boxes, dzi_descriptor, build_tiles
+
+def test_levels():
+    assert max_level(1, 1) == 0
+    assert max_level(2, 1) == 1
+    assert max_level(1015, 1566) == 11
+    assert max_level(1024, 512) == 10
+    assert level_size(1015, 1566, 11, 11) == (1015, 1566)
+    assert level_size(1015, 1566, 10, 11) == (508, 783)
+    assert level_size(1015, 1566, 0, 11) == (1, 1)
+
+def test_tile_boxes():
+    boxes = list(tile_boxes(600, 300, tile_size=254, overlap=1))
+    assert [(c, r) for c, r, _ in boxes] == [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1)]
+    assert boxes[0][2] == (0, 0, 255, 255)
+    assert boxes[1][2] == (253, 0, 509, 255)
+    assert boxes[5][2] == (507, 253, 600, 300)
+    assert list(tile_boxes(1, 1)) == [(0, 0, (0, 0, 1, 1))]
+
+def test_dzi_descriptor():
+    xml = dzi_descriptor(1015, 1566)
+    assert 'TileSize="254" Overlap="1" Format="jpg"' in xml
+    assert '<Size Width="1015" Height="1566"/>' in xml
+
+def test_without_pillow(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "scans" / "A")
+    open(tmp_path / "scans" / "A" / "1r.jpg", "wb").close()
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    assert build_tiles([str(tmp_path / "scans")], str(tmp_path / "tiles")) == {}
+    assert not os.path.exists(tmp_path / "tiles")
+
+def test_build_tiles(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    scans = tmp_path / "scans"
+    os.makedirs(scans / "Pa 1235")
+    Image.new("RGB", (600, 300), (200, 180, 150)).save(scans / "Pa 1235" / "9.jpg")
+    Image.new("RGB", (20, 30), (0, 0, 0)).save(scans / "Pa 1235" / "10.jpg")
+    out = tmp_path / "tiles"
+
+    manifest = build_tiles([str(scans)], str(out))
+    assert list(manifest) == ["scans/Pa 1235/10.jpg", "scans/Pa 1235/9.jpg"]
+    info = manifest["scans/Pa 1235/9.jpg"]
+    assert info["url"] == "tiles/Pa 1235/9_files" and info["maxLevel"] == 10
+    assert (info["width"], info["height"], info["format"]) == (600, 300, "jpg")
+    with open(out / "tiles.json") as f:
+        assert json.load(f) == manifest
+
+    files = out / "Pa 1235" / "9_files"
+    assert sorted(os.listdir(files / "10")) == ["0_0.jpg", "0_1.jpg", "1_0.jpg", "1_1.jpg", "2_0.jpg", "2_1.jpg"]
+    assert Image.open(files / "10" / "2_1.jpg").size == (93, 47)
+    assert os.listdir(files / "0") == ["0_0.jpg"]
+    assert os.path.exists(out / "Pa 1235" / "9.dzi")
+
+    # Unchanged scans are not tiled again, deleted ones are removed
+    calls = []
+    monkeypatch.setattr(scan_tiles, "_tile_task", lambda *args: calls.append(args))
+    os.remove(scans / "Pa 1235" / "10.jpg")
+    manifest = build_tiles([str(scans)], str(out))
+    assert calls == [] and list(manifest) == ["scans/Pa 1235/9.jpg"]
+    assert not os.path.exists(out / "Pa 1235" / "10_files")
@@ -0,0 +1,158 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from encoding import TYPE_CODES, midi_pitch
+from segmentation import segment_unit
+from synthetic_corpus import generate
+from analyze_transcriptions import find_source_dirs, iter_documents
+from walker import WalkContext, walk
+
+def reference_notes(element):
+    # The two-pass extraction segment_unit replaces
+    extracted = []
+    if isinstance(element, dict) and "grouped" in element:
+        for sub in element["grouped"]:
+            extracted.extend(reference_notes(sub))
+        return extracted
+    sub_notes = []
+    if isinstance(element, dict):
+        sub_notes = element.get("neume_components", element.get("children", element.get("notes", [])))
+        if not sub_notes and ("base" in element or "octave" in element):
+            return [element]
+    else:
+        if hasattr(element, "neume_components"): sub_notes = element.neume_components
+        elif hasattr(element, "notes"): sub_notes = element.notes
+        elif hasattr(element, "elements"): sub_notes = element.elements
+        else:
+            if hasattr(element, "base") or hasattr(element, "octave"):
+                return [element]
+    if sub_notes:
+        for n in sub_notes:
+            extracted.extend(reference_notes(n))
+    return extracted
+
+def reference_segment(unit):
+    if not isinstance(unit, list) and hasattr(unit, "children"):
+        unit = unit.children
+    elif isinstance(unit, dict):
+        unit = unit.get("children", [])
+    if not unit: return None
+
+    real_notes = []
+    for item in unit:
+        for n in reference_notes(item):
+            b, o = None, None
+            nt, liq = "Normal", False
+            if hasattr(n, "base"): b = n.base
+            elif isinstance(n, dict): b = n.get("base")
+            if hasattr(n, "octave"): o = n.octave
+            elif hasattr(n, "oct"): o = n.oct
+            elif isinstance(n, dict): o = n.get("octave", n.get("oct"))
+            if hasattr(n, "noteType"): nt = n.noteType
+            elif isinstance(n, dict): nt = n.get("noteType", "Normal")
+            if hasattr(n, "liquescent"): liq = n.liquescent
+            elif isinstance(n, dict): liq = n.get("liquescent", False)
+            if b and o:
+                real_notes.append({"pitch": midi_pitch(b, int(o)), "base": b, "octave": int(o), "type": nt, "liquescent": liq})
+    if not real_notes: return None
+
+    group_segments = []
+    idx = 0
+    for item in unit:
+        raw = reference_notes(item)
+        if not raw: continue
+        segment = []
+        for _ in raw:
+            if idx < len(real_notes):
+                segment.append(real_notes[idx])
+                idx += 1
+        if segment:
+            group_segments.append(segment)
+    if not group_segments: return None
+    return real_notes, group_segments
+
+def assert_same(unit):
+    expected = reference_segment(unit)
+    got = segment_unit(unit)
+    if expected is None:
+        assert got is None
+        return
+    real_notes, group_segments = expected
+    notes, sizes = got
+    assert sizes == [len(grp) for grp in group_segments]
+    assert [n[0] for n in notes] == [n["pitch"] for n in real_notes]
+    assert [n[1] for n in notes] == [f"{n['base']}{n['octave']}" for n in real_notes]
+    assert [n[2] for n in notes] == [TYPE_CODES.get(n["type"], 0) for n in real_notes]
+    assert [n[3] for n in notes] == [n["liquescent"] for n in real_notes]
+
+class Note:
+    def __init__(self, base, octave, noteType="Normal", liquescent=False):
+        self.base = base
+        self.octave = octave
+        self.noteType = noteType
+        self.liquescent = liquescent
+
+class SlotNote:
+    __slots__ = ("base", "oct")
+    def __init__(self, base, oct):
+        self.base = base
+        self.oct = oct
+
+class Neume:
+    def __init__(self, *notes):
+        self.neume_components = list(notes)
+
+class Node:
+    def __init__(self, children):
+        self.children = children
+
+class AttrDict(dict):
+    liquescent = True
+
+def note(base, octave, **kw):
+    return dict(base=base, octave=octave, **kw)
+
+def test_dict_units():
+    assert_same([])
+    assert_same({"children": []})
+    assert_same([{"kind": "Neume", "children": []}])
+    assert_same({"children": [{"kind": "Neume", "children": [note("C", 4), note("D", 4, noteType="Oriscus")]}]})
+    assert_same([
+        {"neume_components": [note("G", 3), note("A", 3, liquescent=True)]},
+        {"grouped": [{"notes": [note("B", 3)]}, note("c", 4)]},
+        note("E", 4, noteType="Quilisma"),
+    ])
+
+def test_skipped_notes_shift_groups():
+    # Missing base, octave 0 and a leaf with only an oct are counted in their group but not kept
+    assert_same([
+        {"neume_components": [note("C", 4), note(None, 4), note("D", 4)]},
+        {"neume_components": [note("E", 0), note("F", 4)]},
+        {"neume_components": [{"base": "G", "oct": 4}, note("A", 4)]},
+        {"neume_components": None, "children": [note("B", 4)]},
+        {"neume_components": [], "base": "C", "octave": 5},
+        {"children": [note("D", 4), note("E", 4)], "base": "x"},
+    ])
+    assert_same([{"neume_components": [note("", 4)]}])
+
+def test_object_units():
+    assert_same(Node([
+        Neume(Note("C", 4), Note("D", 4, "Strophicus", True)),
+        Neume(SlotNote("E", "4"), SlotNote(None, 4)),
+        Neume(Note("F", 0)),
+        Note("G", 4),
+        AttrDict(base="A", octave=4),
+        {"grouped": [Neume(Note("B", 4)), note("c", 5)]},
+    ]))
+    assert_same(Node([object(), Neume()]))
+
+def test_corpus_units(tmp_path):
+    generate(str(tmp_path), sources=2, documents=3, notes=60, seed=3)
+    units = 0
+    for src_dir in find_source_dirs(str(tmp_path)):
+        for doc in iter_documents(src_dir):
+            for unit in walk(doc.data, WalkContext("", "0", 0)):
+                assert_same(unit)
+                units += 1
+    assert units > 0
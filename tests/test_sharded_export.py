@@ -0,0 +1,49 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from sharded_export import write_sharded_export, remove_shards, SHARD_DIR
+
+DATA = {
+    "Pa 1235": {"*u": [["DOC1", "9", "1", "Al", "C4-D4"]]},
+    "Pa 1107": {"*d": [["DOC2", "145v", "3", "le", "D4-C4"]], "*": [["DOC2", "146", "1", "lu", "C4"]]}
+}
+
+def test_index_and_shards(tmp_path):
+    out = str(tmp_path)
+    index_file, sources = write_sharded_export({"overallMax": 1}, DATA, out)
+
+    with open(index_file) as f:
+        index = json.load(f)
+    assert index["format"] == "sharded"
+    assert index["overallMax"] == 1
+    assert "data" not in index
+    assert [s["name"] for s in index["sources"]] == ["Pa 1107", "Pa 1235"]
+    assert index["sources"][0]["occurrences"] == 2
+
+    for s in index["sources"]:
+        with open(os.path.join(out, s["shard"])) as f:
+            shard = json.load(f)
+        assert shard["data"] == DATA[s["name"]]
+
+def test_shard_names_follow_content(tmp_path):
+    out = str(tmp_path)
+    _, first = write_sharded_export({}, DATA, out)
+    _, again = write_sharded_export({}, DATA, out)
+    assert [s["shard"] for s in first] == [s["shard"] for s in again]
+
+    changed = dict(DATA, **{"Pa 1235": {"*u": []}})
+    _, second = write_sharded_export({}, changed, out)
+    assert first[0]["shard"] == second[0]["shard"]
+    assert first[1]["shard"] != second[1]["shard"]
+
+    # The stale shard of the changed source is removed
+    assert len(os.listdir(os.path.join(out, SHARD_DIR))) == 2
+
+def test_remove_shards(tmp_path):
+    out = str(tmp_path)
+    assert not remove_shards(out)
+    write_sharded_export({}, DATA, out)
+    assert remove_shards(out)
+    assert os.listdir(out) == ["data.json"]
@@ -0,0 +1,71 @@
+import sys
+import os
+import json
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from snippet_crops import parse_points, snippet_box, iter_annotations, snippet_name, crop_snippets
+
+BACKUP = {
+    "version": 1,
+    "content": {
+        "annotations": {
+            "Pa 1235_9_*[ud]": [{"points": "10,10 20,10 20,15 10,15", "id": 1700000000001}],
+            "Nowhere_1r_*u": [{"points": "1,1 2,2", "id": 5}]
+        },
+        "regions": {"Pa 1107_146": [{"id": "r_1", "name": "Line 1", "points": "0,0 100,0 100,10 0,10"}]},
+        "regionItems": {"r_1": [{"id": 1700000000003, "pattern": "*d", "points": "30,2 35,2 35,8 30,8"}]}
+    }
+}
+
+def test_parse_points():
+    assert parse_points("10,10 20.5,10  20,x 3") == [(10.0, 10.0), (20.5, 10.0)]
+    assert parse_points("") == []
+    assert parse_points(None) == []
+
+def test_snippet_box():
+    # cropSnippet: 30% context on each side, clamped to the scan
+    assert snippet_box([(10, 10), (20, 10), (20, 15), (10, 15)]) == pytest.approx((7, 8.5, 16, 8))
+    assert snippet_box([(0, 90), (10, 100)]) == pytest.approx((0, 87, 16, 13))
+
+def test_iter_annotations():
+    annotations = list(iter_annotations(BACKUP))
+    assert annotations == [
+        {"id": "1700000000001", "source": "Pa 1235", "folio": "9", "pattern": "*[ud]", "points": "10,10 20,10 20,15 10,15"},
+        {"id": "5", "source": "Nowhere", "folio": "1r", "pattern": "*u", "points": "1,1 2,2"},
+        {"id": "1700000000003", "source": "Pa 1107", "folio": "146", "pattern": "*d", "points": "30,2 35,2 35,8 30,8"},
+    ]
+    assert list(iter_annotations(BACKUP["content"])) == annotations
+    assert snippet_name("r_1/x") == "r_1_x.jpg"
+
+def test_crop_snippets(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    scans = tmp_path / "scans"
+    for source, folio in [("Pa 1235", "9"), ("Pa 1107", "146")]:
+        os.makedirs(scans / source)
+        Image.new("RGB", (1000, 1500), (255, 255, 255)).save(scans / source / f"{folio}.jpg")
+    out = tmp_path / "snippets"
+
+    manifest = crop_snippets(BACKUP, str(out), [str(scans)], jobs=1)
+    assert sorted(manifest) == ["1700000000001", "1700000000003"]
+    entry = manifest["1700000000001"]
+    assert entry["path"] == "snippets/1700000000001.jpg" and entry["scan"] == "scans/Pa 1235/9.jpg"
+    assert entry["points"] == "10,10 20,10 20,15 10,15"
+    with open(out / "snippets.json") as f:
+        assert json.load(f) == manifest
+
+    snippet = Image.open(out / "1700000000001.jpg").convert("RGB")
+    # 16% x 8% of the scan, 400 pixels wide; like cropSnippet the height follows the % box
+    assert snippet.size == (400, 200)
+    # The polygon is outlined in red, its top-left corner is 3% and 1.5% into the box
+    r, g, b = snippet.getpixel((75, 38))
+    assert r > 150 and g < 80 and b < 80
+
+    # Removed annotations lose their snippet, changed ones are cropped again
+    backup = json.loads(json.dumps(BACKUP))
+    backup["content"]["regionItems"] = {}
+    backup["content"]["annotations"]["Pa 1235_9_*[ud]"][0]["points"] = "10,10 20,10 20,20 10,20"
+    manifest = crop_snippets(backup, str(out), [str(scans)])
+    assert list(manifest) == ["1700000000001"]
+    assert Image.open(out / "1700000000001.jpg").size == (400, 400)
+    assert not os.path.exists(out / "1700000000003.jpg")
@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import source_cache
+from source_cache import source_fingerprint, entry_path, load_entry, save_entry, prune
+
+def make_source(root, name="src0"):
+    src = os.path.join(root, name)
+    os.makedirs(os.path.join(src, "DOC1"))
+    with open(os.path.join(src, "meta.json"), "w") as f:
+        f.write('{"quellensigle": "Pa 1235"}')
+    with open(os.path.join(src, "DOC1", "data.json"), "w") as f:
+        f.write('{"kind": "RootContainer", "children": []}')
+    return src
+
+def test_fingerprint_tracks_content(tmp_path):
+    src = make_source(str(tmp_path))
+    key = source_fingerprint(src)
+    assert source_fingerprint(src) == key
+
+    with open(os.path.join(src, "DOC1", "data.json"), "a") as f:
+        f.write(" ")
+    assert source_fingerprint(src) != key
+
+def test_fingerprint_tracks_pipeline_version(tmp_path, monkeypatch):
+    src = make_source(str(tmp_path))
+    key = source_fingerprint(src)
+    monkeypatch.setattr(source_cache, "PIPELINE_VERSION", "test")
+    assert source_fingerprint(src) != key
+
+def test_entry_round_trip(tmp_path):
+    src = make_source(str(tmp_path))
+    cache_dir = str(tmp_path / "cache")
+    key = source_fingerprint(src)
+    results = {"Pa 1235": {"*u": [["DOC1", "9", "1", "Al", "C4-D4"]]}}
+
+    assert load_entry(cache_dir, src, key) is None
+    save_entry(cache_dir, src, key, results)
+    assert load_entry(cache_dir, src, key) == results
+    assert load_entry(cache_dir, src, "0" * 64) is None
+
+def test_prune_drops_stale_entries(tmp_path):
+    root = str(tmp_path)
+    cache_dir = os.path.join(root, "cache")
+    kept = make_source(root, "kept")
+    gone = make_source(root, "gone")
+    save_entry(cache_dir, kept, source_fingerprint(kept), {})
+    save_entry(cache_dir, gone, source_fingerprint(gone), {})
+
+    removed = prune(cache_dir, [entry_path(cache_dir, kept, source_fingerprint(kept))])
+    assert removed == 1
+    assert os.listdir(cache_dir) == [os.path.basename(entry_path(cache_dir, kept, source_fingerprint(kept)))]
+
+def test_prune_keeps_other_files(tmp_path):
+    root = str(tmp_path)
+    src = make_source(root, "src")
+    save_entry(root, src, "a" * 64, {})
+    stray_tmp = entry_path(root, src, "b" * 64) + ".123.tmp"
+    open(stray_tmp, "w").close()
+    for name in ["notes.txt", "data.json", "other.v1.json"]:
+        open(os.path.join(root, name), "w").close()
+
+    assert prune(root, []) == 2
+    assert sorted(n for n in os.listdir(root) if os.path.isfile(os.path.join(root, n))) == [
+        "data.json", "notes.txt", "other.v1.json"
+    ]
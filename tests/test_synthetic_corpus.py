@@ -0,0 +1,40 @@
+import sys
+import os
+import glob
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from synthetic_corpus import generate
+from analyze_transcriptions import analyze_corpus
+
+def read_tree(path):
+    out = {}
+    for p in sorted(glob.glob(os.path.join(path, "**", "*.json"), recursive=True)):
+        with open(p) as f:
+            out[os.path.relpath(p, path)] = f.read()
+    return out
+
+def test_layout_and_counts(tmp_path):
+    summary = generate(str(tmp_path), sources=2, documents=3, notes=40, seed=1)
+    assert summary["sources"] == 2 and summary["documents"] == 6 and summary["notes"] == 240
+    assert len(glob.glob(str(tmp_path / "*" / "meta.json"))) == 2
+    assert len(glob.glob(str(tmp_path / "*" / "*" / "data.json"))) == 6
+    assert len(glob.glob(str(tmp_path / "*" / "*" / "meta.json"))) == 6
+
+def test_same_seed_same_corpus(tmp_path):
+    generate(str(tmp_path / "a"), sources=2, documents=2, notes=30, seed=5)
+    generate(str(tmp_path / "b"), sources=2, documents=2, notes=30, seed=5)
+    generate(str(tmp_path / "c"), sources=2, documents=2, notes=30, seed=6)
+    assert read_tree(str(tmp_path / "a")) == read_tree(str(tmp_path / "b"))
+    assert read_tree(str(tmp_path / "a")) != read_tree(str(tmp_path / "c"))
+
+def test_analyzable(tmp_path):
+    summary = generate(str(tmp_path), sources=2, documents=4, notes=50, seed=2, filtered_ratio=0.5)
+    results = analyze_corpus(str(tmp_path), cache_dir=None)
+    assert sorted(results) == ["Syn 1", "Syn 2"]
+
+    doc_ids = {occ[0] for patterns in results.values() for occs in patterns.values() for occ in occs}
+    assert len(doc_ids) == summary["documents"] - summary["filtered_documents"]
+    assert not any(d.endswith("TR") or d.endswith("GS") for d in doc_ids)
+    # Every generated note ends up in exactly one occurrence
+    notes = sum(len(occ[4].split("-")) for patterns in results.values() for occs in patterns.values() for occ in occs)
+    assert notes == 50 * len(doc_ids)
@@ -0,0 +1,117 @@
+import sys
+import os
+import random
+from types import SimpleNamespace
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from walker import WalkContext, walk
+
+def reference_walk(root, folio, line, line_counter):
+    # The recursive traverse closure the walker replaces, recording (folio, line, syllable, unit)
+    ctx = {"folio": folio, "line": line, "syllable": "", "line_counter": line_counter}
+    out = []
+
+    def traverse(node):
+        node_type = getattr(node, "kind", None)
+        if isinstance(node, dict): node_type = node.get("kind")
+        if hasattr(node, "label") or (isinstance(node, dict) and "label" in node):
+            val = getattr(node, "label", node.get("label")) if isinstance(node, dict) else getattr(node, "label", "")
+            if val: ctx["folio"] = str(val)
+        if node_type == "ZeileContainer":
+            ctx["line_counter"] += 1
+            ctx["line"] = str(ctx["line_counter"])
+        if node_type == "Syllable":
+            ctx["syllable"] = getattr(node, "text", "") if not isinstance(node, dict) else node.get("text", "")
+            notes_data = getattr(node, "notes", None) if not isinstance(node, dict) else node.get("notes")
+            if not notes_data or not isinstance(notes_data, dict) or "spaced" not in notes_data:
+                return
+            for spaced_item in notes_data["spaced"]:
+                if "nonSpaced" not in spaced_item:
+                    continue
+                out.append((str(ctx["folio"]), ctx["line"], ctx["syllable"], spaced_item["nonSpaced"]))
+            return
+        elif node_type == "FolioChange":
+            if hasattr(node, "folio"):
+                ctx["folio"] = node.folio
+            elif hasattr(node, "text"):
+                ctx["folio"] = node.text
+        elif node_type == "LineChange":
+            if hasattr(node, "n") and node.n:
+                ctx["line"] = str(node.n)
+            elif hasattr(node, "line") and node.line:
+                ctx["line"] = str(node.line)
+            else:
+                try:
+                    ctx["line"] = str(int(ctx["line"]) + 1)
+                except:
+                    pass
+        elif node_type == "nonSpaced":
+            out.append((str(ctx["folio"]), ctx["line"], ctx["syllable"], node))
+            return
+        children = getattr(node, "children", []) if not isinstance(node, dict) else node.get("children", node.get("elements", []))
+        for child in children:
+            traverse(child)
+
+    traverse(root)
+    return out
+
+def collect(root, folio="1r", line="0", line_counter=0):
+    ctx = WalkContext(folio, line, line_counter)
+    return [(str(ctx.folio), ctx.line, ctx.syllable, unit) for unit in walk(root, ctx)]
+
+def random_node(rnd, depth):
+    as_object = rnd.random() < 0.3
+    kind = rnd.choice(["ZeileContainer", "Syllable", "FolioChange", "LineChange", "nonSpaced", "Container"])
+    fields = {"kind": kind}
+    if kind == "Syllable":
+        fields["text"] = f"syl{rnd.randint(0, 99)}"
+        fields["notes"] = rnd.choice([
+            {"spaced": [{"nonSpaced": [{"grouped": [{"base": "C", "octave": 4}]}]}, {"other": 1}]},
+            {"spaced": []},
+            None
+        ])
+    elif kind == "FolioChange":
+        fields[rnd.choice(["folio", "text"])] = f"{rnd.randint(1, 200)}v"
+    elif kind == "LineChange":
+        fields[rnd.choice(["n", "line", "none"])] = rnd.choice([0, 3, "7r"])
+    if rnd.random() < 0.1:
+        fields["label"] = rnd.choice(["", "145v"])
+    if depth > 0 and kind not in ("Syllable",):
+        key = "elements" if not as_object and rnd.random() < 0.2 else "children"
+        fields[key] = [random_node(rnd, depth - 1) for _ in range(rnd.randint(0, 4))]
+    return SimpleNamespace(**fields) if as_object else fields
+
+def test_matches_recursive_traverse():
+    rnd = random.Random(3)
+    for _ in range(200):
+        root = random_node(rnd, 5)
+        assert collect(root) == reference_walk(root, "1r", "0", 0)
+
+def test_context_updates():
+    root = {"kind": "RootContainer", "children": [
+        {"kind": "ZeileContainer", "children": [
+            {"kind": "Syllable", "text": "Al", "notes": {"spaced": [{"nonSpaced": ["unit1"]}]}},
+            SimpleNamespace(kind="FolioChange", folio="146"),
+            {"kind": "LineChange"},
+            {"kind": "Syllable", "text": "le", "notes": {"spaced": [{"nonSpaced": ["unit2"]}, {"nonSpaced": ["unit3"]}]}},
+        ]},
+        {"kind": "ZeileContainer", "label": "147", "children": [
+            {"kind": "nonSpaced", "children": []}
+        ]}
+    ]}
+    units = collect(root, folio="145v", line="5", line_counter=5)
+    assert [u[:3] for u in units] == [
+        ("145v", "6", "Al"),
+        ("146", "7", "le"),
+        ("146", "7", "le"),
+        ("147", "7", "le"),
+    ]
+    assert units[0][3] == ["unit1"]
+
+def test_deep_documents_do_not_recurse():
+    root = leaf = {"kind": "Container", "children": []}
+    for _ in range(sys.getrecursionlimit() * 2):
+        leaf["children"].append({"kind": "Container", "children": []})
+        leaf = leaf["children"][0]
+    leaf["children"].append({"kind": "Syllable", "text": "a", "notes": {"spaced": [{"nonSpaced": ["deep"]}]}})
+    assert [u[3] for u in collect(root)] == [["deep"]]
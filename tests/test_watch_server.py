@@ -0,0 +1,111 @@
+import sys
+import os
+import json
+import shutil
+import threading
+import urllib.parse
+import urllib.request
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+from synthetic_corpus import generate
+from analyze_transcriptions import analyze_corpus
+from watch_server import CorpusState, QueryServer, query_occurrences, watch
+
+def plain(results):
+    return json.loads(json.dumps(results))
+
+def test_scan_matches_full_run_and_patches_documents(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=2, documents=5, notes=30, seed=7, filtered_ratio=0.2)
+    state = CorpusState(corpus)
+    assert state.scan() > 0
+    assert state.results() == plain(analyze_corpus(corpus, cache_dir=None))
+    assert state.scan() == 0
+
+    # Replace one document's data with another's and drop a document
+    src = sorted(os.listdir(corpus))[0]
+    docs = sorted(d for d in os.listdir(os.path.join(corpus, src)) if not d.endswith(".json"))
+    shutil.copy(os.path.join(corpus, src, docs[1], "data.json"), os.path.join(corpus, src, docs[0], "data.json"))
+    shutil.rmtree(os.path.join(corpus, src, docs[2]))
+    version = state.version
+    assert state.scan() == 2
+    assert state.version == version + 1
+    assert state.results() == plain(analyze_corpus(corpus, cache_dir=None))
+
+def test_queries_over_http(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=1, documents=3, notes=30, seed=2, filtered_ratio=0)
+    state = CorpusState(corpus)
+    state.scan()
+    source = next(iter(state.results()))
+    pattern, occurrences = next(iter(state.results()[source].items()))
+
+    server = QueryServer(("127.0.0.1", 0), state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/api"
+    try:
+        query = urllib.parse.urlencode({"source": source, "pattern": pattern})
+        with urllib.request.urlopen(f"{base}/occurrences?{query}") as res:
+            rows = json.load(res)
+        assert [[r["doc"], r["folio"], r["line"], r["syllable"], r["notes"]] for r in rows] == occurrences
+        assert rows == query_occurrences(state, {"source": source, "pattern": pattern})
+
+        with urllib.request.urlopen(f"{base}/patterns?q={urllib.parse.quote(pattern)}") as res:
+            assert json.load(res)[0]["pattern"] == pattern
+        with urllib.request.urlopen(f"{base}/folios?source={urllib.parse.quote(source)}") as res:
+            assert json.load(res) == list(dict.fromkeys(o[1] for p in state.results()[source].values() for o in p))
+        with urllib.request.urlopen(f"{base}/status") as res:
+            assert json.load(res)["documents"] == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_watch_exports_after_changes_settle(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=1, documents=2, notes=10, seed=1, filtered_ratio=0)
+    state = CorpusState(corpus)
+    stop = threading.Event()
+    exported = []
+
+    def export(results):
+        exported.append(results)
+        stop.set()
+
+    watch(state, export, interval=0.01, debounce=0.05, stop=stop)
+    assert len(exported) == 1 and state.exported_version == state.version == 1
+
+def test_errors_do_not_stop_the_watch(tmp_path):
+    corpus = str(tmp_path / "export")
+    generate(corpus, sources=2, documents=2, notes=10, seed=3, filtered_ratio=0)
+    state = CorpusState(corpus)
+    state.scan()
+    results = state.results()
+
+    # A half-saved meta.json keeps the source's previous state
+    src_dir = sorted(state.sources)[0]
+    with open(os.path.join(src_dir, "meta.json")) as f:
+        meta = f.read()
+    with open(os.path.join(src_dir, "meta.json"), "w") as f:
+        f.write("{")
+    state.scan()
+    assert state.results() == results
+    assert state.errors[-1]["source"] == src_dir
+
+    stop = threading.Event()
+    calls = []
+    doc_dir = sorted(state.sources[src_dir]["documents"])[0]
+
+    def export(results):
+        calls.append(results)
+        if len(calls) == 1:
+            # The failed export is retried after the next change
+            os.utime(os.path.join(doc_dir, "data.json"), ns=(1, 1))
+            raise OSError("disk full")
+        stop.set()
+
+    with open(os.path.join(src_dir, "meta.json"), "w") as f:
+        f.write(meta)
+    watch(state, export, interval=0.01, debounce=0.01, stop=stop)
+    assert len(calls) == 2 and state.exports == 1
+    assert any(e.get("export") for e in state.errors)
+    assert len(state.status()["errors"]) <= 20
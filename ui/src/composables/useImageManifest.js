@@ -1,8 +1,20 @@
-import { ref } from 'vue';
+import { ref, shallowRef } from 'vue';
 
 const manifest = ref(new Set());
 const loaded = ref(false);
 
+// scan_index.json from the export: { scans: { source: { folio: path } }, unresolved: {...} }
+const scanIndex = shallowRef(null);
+let scanIndexPromise = null;
+
+// tiles/tiles.json from scripts/scan_tiles.py: { scanPath: { url, width, height, ... } }
+const tileManifest = shallowRef(null);
+let tileManifestPromise = null;
+
+// Results of the fuzzy search, for pairs the scan index does not cover
+let searchCache = new Map();
+let searchCacheFor = null;
+
 async function loadManifest() {
     if (loaded.value) return;
 
@@ -29,10 +41,85 @@ async function loadManifest() {
     }
 }
 
+/**
+ * Loads scan_index.json once. Without it every lookup falls back to the
+ * fuzzy search over the manifest.
+ */
+function loadScanIndex() {
+    if (!scanIndexPromise) {
+        scanIndexPromise = fetch('scan_index.json')
+            .then(res => (res.ok ? res.json() : null))
+            .then(json => {
+                if (json) scanIndex.value = json;
+            })
+            .catch(e => {
+                console.warn('Scan index not available', e);
+            });
+    }
+    return scanIndexPromise;
+}
+
+/**
+ * Loads tiles/tiles.json once. Without it the scans are shown as full images.
+ */
+function loadTileManifest() {
+    if (!tileManifestPromise) {
+        tileManifestPromise = fetch('tiles/tiles.json')
+            .then(res => (res.ok ? res.json() : null))
+            .then(json => {
+                if (json) tileManifest.value = json;
+            })
+            .catch(e => {
+                console.warn('Scan tiles not available', e);
+            });
+    }
+    return tileManifestPromise;
+}
+
+/**
+ * Fuzzy search for a folio's scan; the same rules as scripts/scan_index.py.
+ */
+function searchManifest(entries, s, f) {
+    if (searchCacheFor !== entries) {
+        searchCache = new Map();
+        searchCacheFor = entries;
+    }
+    const key = `${s}\u0000${f}`;
+    if (searchCache.has(key)) return searchCache.get(key);
+
+    let found = null;
+
+    // Try with "scans/" prefix (if manifest has it)
+    const scansPrefixed = `scans/${s}/${f}.jpg`;
+    if (entries.has(scansPrefixed)) found = scansPrefixed;
+
+    // Try cleaning source (e.g. "Pa 1235-9-1" -> "Pa 1235"):
+    // look for an entry that ENDS with `/${f}.jpg` and whose directory is contained in `s`.
+    if (!found) {
+        for (const entry of entries) {
+            if (entry.endsWith(`/${f}.jpg`) || entry.endsWith(`/${f}.jpeg`)) {
+                const parts = entry.split('/');
+                if (parts.length >= 2) {
+                    const dir = parts[parts.length - 2]; // "Pa 1235"
+                    if (s.includes(dir)) {
+                        found = entry;
+                        break;
+                    }
+                }
+            }
+        }
+    }
+
+    searchCache.set(key, found);
+    return found;
+}
+
 export function useImageManifest() {
     if (!loaded.value) {
         loadManifest();
     }
+    loadScanIndex();
+    loadTileManifest();
 
     // Helper to find the actual path in the manifest
     function findManifestPath(source, folio) {
@@ -45,37 +132,25 @@ export function useImageManifest() {
         const exact = `${s}/${f}.jpg`;
         if (manifest.value.has(exact)) return exact;
 
-        // 2. Try with "scans/" prefix (if manifest has it)
-        const scansPrefixed = `scans/${s}/${f}.jpg`;
-        if (manifest.value.has(scansPrefixed)) return scansPrefixed;
-
-        // 3. Try cleaning source (e.g. "Pa 1235-9-1" -> "Pa 1235")
-        // Rule: try split by '-' and take first part? Or take first 2 parts?
-        // Let's try matching the start.
+        // 2. Resolved at export time (scan_index.json); checked against the
+        // manifest so a scan that is not served is not returned
+        const entries = manifest.value;
+        const indexed = scanIndex.value?.scans?.[s]?.[f];
+        if (indexed && entries.has(indexed)) return indexed;
 
-        // Iterative search (slower but robust for mismatch)
-        // We look for an entry that ENDS with `/${f}.jpg` and STARTS with something similar to `s`.
-
-        for (const entry of manifest.value) {
-            // Check folio match
-            if (entry.endsWith(`/${f}.jpg`) || entry.endsWith(`/${f}.jpeg`)) {
-                // Check source match
-                // If entry is "Pa 1235/9.jpg", and s is "Pa 1235-9-1"
-                // Check if s starts with the directory part of entry? 
-                // Or if entry directory is contained in s?
+        // 3. Fuzzy search, once per pair
+        return searchManifest(entries, s, f);
+    }
 
-                const parts = entry.split('/');
-                if (parts.length >= 2) {
-                    const dir = parts[parts.length - 2]; // "Pa 1235"
-                    // If "Pa 1235" is in "Pa 1235-9-1" -> Match
-                    if (s.includes(dir)) {
-                        return entry;
-                    }
-                }
-            }
-        }
+    /**
+     * Tile pyramid of a scan URL (as returned by getImageUrl), or null.
+     */
+    function getTilesForUrl(url) {
+        return (url && tileManifest.value?.[url]) || null;
+    }
 
-        return null;
+    function getTiles(source, folio) {
+        return getTilesForUrl(getImageUrl(source, folio));
     }
 
     function hasImage(source, folio) {
@@ -162,6 +237,8 @@ export function useImageManifest() {
         getImageUrl,
         getStandardSource,
         getManifestStructure,
+        getTiles,
+        getTilesForUrl,
         loaded
     };
 }
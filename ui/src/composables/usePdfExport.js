@@ -5,10 +5,48 @@ import { renderSvg } from '../utils/svgRenderer.js';
 import { useAnnotationsStore } from '../stores/annotations';
 import { useImageManifest } from './useImageManifest';
 
+// snippets/snippets.json from scripts/snippet_crops.py: { annotationId: { path, points, ... } }
+let snippetIndexPromise = null;
+
+function loadSnippetIndex() {
+    if (!snippetIndexPromise) {
+        snippetIndexPromise = fetch('snippets/snippets.json', { cache: 'no-store' })
+            .then(res => (res.ok ? res.json() : null))
+            .catch(() => null);
+    }
+    return snippetIndexPromise;
+}
+
+function blobToDataUrl(blob) {
+    return new Promise((resolve) => {
+        const reader = new FileReader();
+        reader.onload = () => resolve(reader.result);
+        reader.onerror = () => resolve(null);
+        reader.readAsDataURL(blob);
+    });
+}
+
 export function usePdfExport() {
     const annotStore = useAnnotationsStore();
     const { getImageUrl, getStandardSource } = useImageManifest();
 
+    /**
+     * The pre-cropped snippet of an annotation, if one was rendered for its
+     * current points. Avoids decoding the whole scan in the browser.
+     */
+    async function prebuiltSnippet(annotation) {
+        const index = await loadSnippetIndex();
+        const entry = index && index[String(annotation.id)];
+        if (!entry || entry.points !== annotation.points) return null;
+        try {
+            const res = await fetch(entry.path);
+            if (!res.ok) return null;
+            return await blobToDataUrl(await res.blob());
+        } catch (e) {
+            return null;
+        }
+    }
+
     /**
      * Helper to crop a snippet from a source image using canvas
      */
@@ -132,12 +170,17 @@ export function usePdfExport() {
                     for (const a of anns) {
                         if (addedAnnots.has(a.id)) continue;
 
-                        const url = getImageUrl(d, f);
-                        const dataUrl = await cropSnippet(url, a.points);
+                        let dataUrl = await prebuiltSnippet(a);
+                        let format = 'JPEG';
+                        if (!dataUrl) {
+                            dataUrl = await cropSnippet(getImageUrl(d, f), a.points);
+                            format = 'PNG';
+                        }
                         if (dataUrl) {
                             addedAnnots.add(a.id);
                             snippetFiles.push({
                                 dataUrl,
+                                format,
                                 folio: f,
                                 customId: row.customId,
                                 pattern: row.pattern,
@@ -233,7 +276,7 @@ export function usePdfExport() {
                 }
 
                 // Draw Snippet
-                doc.addImage(snip.dataUrl, 'PNG', curX, curY, snippetW, snippetH);
+                doc.addImage(snip.dataUrl, snip.format, curX, curY, snippetW, snippetH);
 
                 // Labels
                 doc.setFont("helvetica", "bold");
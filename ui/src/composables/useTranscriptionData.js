@@ -1,50 +1,136 @@
 import { ref, shallowRef } from 'vue';
+import { decodeData } from '../utils/dataFormat';
+import { loadPatternIndex } from '../utils/patternSearch';
 
 const rawData = shallowRef({});
+const sources = shallowRef([]); // all source names, known before their occurrences are loaded
 const patStats = shallowRef({});
 const glyphs = shallowRef({});
 const manifests = shallowRef({});
 const sourceFolios = shallowRef({}); // { source: Set<folio> }
 const pagePatternsIndex = shallowRef({}); // { source: { folio: [patterns] } }
+const pageCounts = shallowRef({}); // { source: { folio: [counts, parallel to pagePatternsIndex] } }
+const patternCounts = shallowRef({}); // { source: { pattern: count } }
+const groupCounts = shallowRef({}); // { source: { basicType: count } }
+const groupTotals = shallowRef({}); // { basicType: count }
+const sourceOrder = shallowRef([]); // sources in clustering order, similar sources adjacent
+const sourceSimilarity = shallowRef(null); // { metric, sources, values: [[...]] }
+const patternIndex = shallowRef(null); // search index over the pattern vocabulary, loaded on first search
 const overallMax = ref(0);
 const loading = ref(true);
 const error = ref(null);
 
 let initPromise = null;
 
-async function fetchAll() {
-    try {
-        const res = await fetch('data.json');
-        if (!res.ok) throw new Error("Failed to load data");
-        const json = await res.json();
+// Sharded export: data.json is only an index, occurrences live in per-source shard files
+const shardUrls = {}; // { source: url }
+const shardPromises = {}; // { source: Promise }
 
-        // Build efficient indices
-        const sFolios = {};
-        const pPats = {};
+function applySources(loaded) {
+    rawData.value = { ...rawData.value, ...loaded };
+}
 
-        for (const [src, patterns] of Object.entries(json.data)) {
-            sFolios[src] = new Set();
-            pPats[src] = {};
+async function loadShard(src, options) {
+    const res = await fetch(shardUrls[src], options);
+    if (!res.ok) throw new Error(`Failed to load data for ${src}`);
+    const shard = await res.json();
+    return decodeData({ [src]: shard.data }, shard.version)[src];
+}
 
-            for (const [pat, occs] of Object.entries(patterns)) {
-                for (const occ of occs) {
-                    const fol = occ[1];
-                    sFolios[src].add(fol);
+async function fetchShard(src) {
+    applySources({ [src]: await loadShard(src) });
+}
 
-                    if (!pPats[src][fol]) pPats[src][fol] = [];
-                    pPats[src][fol].push(pat);
-                }
-            }
+/**
+ * Makes sure the occurrences of one source are loaded.
+ * Resolves immediately for the monolithic data.json, where everything is loaded up front.
+ */
+async function ensureSource(src) {
+    await initPromise;
+    if (!src || rawData.value[src] || !shardUrls[src]) return;
+    if (!shardPromises[src]) {
+        shardPromises[src] = fetchShard(src).catch(e => {
+            delete shardPromises[src];
+            console.error(e);
+            error.value = e;
+        });
+    }
+    return shardPromises[src];
+}
 
-            // Deduplicate patterns per page (some patterns might appear multiple times on same page)
-            for (const fol of Object.keys(pPats[src])) {
-                pPats[src][fol] = Array.from(new Set(pPats[src][fol])).sort();
+let patternIndexPromise = null;
+
+/**
+ * Loads pattern_index.json once. Resolves to null if the export has none,
+ * in which case callers fall back to scanning the patterns.
+ */
+function ensurePatternIndex() {
+    if (!patternIndexPromise) {
+        patternIndexPromise = fetch('pattern_index.json')
+            .then(res => (res.ok ? res.json() : null))
+            .then(json => {
+                if (json) patternIndex.value = loadPatternIndex(json);
+                return patternIndex.value;
+            })
+            .catch(e => {
+                console.warn('Pattern index not available', e);
+                return null;
+            });
+    }
+    return patternIndexPromise;
+}
+
+async function fetchAll({ reload = false } = {}) {
+    try {
+        const res = await fetch('data.json', reload ? { cache: 'no-store' } : undefined);
+        if (!res.ok) throw new Error("Failed to load data");
+        const json = await res.json();
+
+        const loadedBefore = Object.keys(rawData.value);
+        if (reload) {
+            for (const src of Object.keys(shardPromises)) delete shardPromises[src];
+            for (const src of Object.keys(shardUrls)) delete shardUrls[src];
+            patternIndexPromise = null;
+            patternIndex.value = null;
+        }
+
+        if (json.format === 'sharded') {
+            for (const s of json.sources) shardUrls[s.name] = s.shard;
+            sources.value = json.sources.map(s => s.name).sort();
+            if (reload) {
+                // Views ask for a source only once, so load the shards they had
+                // again before the data is swapped
+                const reloaded = {};
+                await Promise.all(loadedBefore.filter(src => shardUrls[src]).map(async src => {
+                    reloaded[src] = await loadShard(src, { cache: 'no-store' });
+                }));
+                // Keep shards a view loaded from the new export in the meantime
+                const fresh = Object.fromEntries(Object.entries(rawData.value).filter(([src]) => !loadedBefore.includes(src)));
+                rawData.value = { ...fresh, ...reloaded };
             }
+        } else {
+            const data = decodeData(json.data, json.version);
+            sources.value = Object.keys(data).sort();
+            if (reload) rawData.value = {};
+            applySources(data);
         }
 
-        rawData.value = json.data;
+        // Folio and page-pattern indexes are prebuilt by the exporter
+        const sFolios = {};
+        for (const [src, folios] of Object.entries(json.sourceFolios || {})) {
+            sFolios[src] = new Set(folios);
+        }
         sourceFolios.value = sFolios;
-        pagePatternsIndex.value = pPats;
+        pagePatternsIndex.value = json.pagePatterns || {};
+        pageCounts.value = json.pageCounts || {};
+        patternCounts.value = json.patternCounts || {};
+
+        // Source analytics are prebuilt by the exporter as well
+        groupCounts.value = json.groupCounts || {};
+        groupTotals.value = json.groupTotals || {};
+        sourceOrder.value = json.sourceOrder || [];
+        sourceSimilarity.value = json.sourceSimilarity || null;
+
         patStats.value = json.stats;
         glyphs.value = json.glyphs;
         manifests.value = json.manifests || {};
@@ -57,21 +143,56 @@ async function fetchAll() {
     }
 }
 
+/**
+ * Dev server only: polls the watch mode (scripts/watch_server.py, proxied under /api)
+ * and reloads data.json whenever it has been exported again. Stops if no watch server runs.
+ */
+function followWatchServer(interval = 3000) {
+    let lastExports = null;
+    const poll = async () => {
+        try {
+            const res = await fetch('/api/status', { cache: 'no-store' });
+            if (!res.ok) return;
+            const status = await res.json();
+            if (lastExports !== null && status.exports !== lastExports) {
+                await fetchAll({ reload: true });
+            }
+            lastExports = status.exports;
+        } catch (e) {
+            return;
+        }
+        setTimeout(poll, interval);
+    };
+    initPromise.then(poll);
+}
+
 export function useTranscriptionData() {
     // Singleton pattern for data loading
     if (!initPromise) {
         initPromise = fetchAll();
+        if (import.meta.env.DEV) followWatchServer();
     }
 
     return {
         rawData,
+        sources,
         sourceFolios,
         pagePatternsIndex,
+        pageCounts,
+        patternCounts,
+        groupCounts,
+        groupTotals,
+        sourceOrder,
+        sourceSimilarity,
+        patternIndex,
         patStats,
         glyphs,
         manifests,
         overallMax,
         loading,
-        error
+        error,
+        ready: initPromise,
+        ensureSource,
+        ensurePatternIndex
     };
 }
@@ -0,0 +1,48 @@
+/**
+ * Decoder for the dictionary-encoded, columnar data.json v2 format
+ * written by scripts/data_format.py.
+ * Each source holds one string table per field and five parallel integer columns;
+ * the occurrences of a pattern are a contiguous run of `counts[i]` rows.
+ */
+export const FORMAT_VERSION = 2;
+
+/**
+ * Decodes one source back to { pattern: [[doc, folio, line, syllable, notes], ...] }.
+ */
+export function decodeSource(encoded) {
+    const { patterns, counts, strings, columns } = encoded;
+    const [docs, folios, lines, syllables, notes] = strings;
+    const [docCol, folioCol, lineCol, sylCol, notesCol] = columns;
+
+    const out = {};
+    let row = 0;
+    for (let p = 0; p < patterns.length; p++) {
+        const n = counts[p];
+        const occs = new Array(n);
+        for (let k = 0; k < n; k++, row++) {
+            occs[k] = [
+                docs[docCol[row]],
+                folios[folioCol[row]],
+                lines[lineCol[row]],
+                syllables[sylCol[row]],
+                notes[notesCol[row]]
+            ];
+        }
+        out[patterns[p]] = occs;
+    }
+    return out;
+}
+
+/**
+ * Returns v1-shaped occurrence data for a `data` object written in the given version.
+ */
+export function decodeData(data, version = 1) {
+    if (!version || version === 1) return data;
+    if (version !== FORMAT_VERSION) throw new Error(`Unsupported data.json version: ${version}`);
+
+    const out = {};
+    for (const [src, encoded] of Object.entries(data)) {
+        out[src] = decodeSource(encoded);
+    }
+    return out;
+}
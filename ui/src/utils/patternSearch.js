@@ -0,0 +1,133 @@
+/**
+ * Browser side of the pattern search index written by scripts/pattern_index.py.
+ * Query syntax: `?` matches any single character, `%` any run of characters,
+ * everything else is literal (so `*` and `[` match themselves). Matching is by substring.
+ */
+
+const ANY_CHAR = '?';
+const ANY_RUN = '%';
+const LOWER = new Set(['u', 'd', 'e']);
+const UPPER = new Set(['O', 'Q', 'L', 'S']);
+
+/** True if the query uses `?` or `%`; without them a plain case-insensitive substring search is enough. */
+export function hasWildcards(query) {
+    return query.includes(ANY_CHAR) || query.includes(ANY_RUN);
+}
+
+/** Direction letters are lowercase, note suffixes uppercase, so "[udo]" finds "[udO]". */
+export function normalizeQuery(query) {
+    let out = '';
+    for (const c of query) {
+        if (LOWER.has(c.toLowerCase())) out += c.toLowerCase();
+        else if (UPPER.has(c.toUpperCase())) out += c.toUpperCase();
+        else out += c;
+    }
+    return out;
+}
+
+function compileQuery(query) {
+    let src = '';
+    for (const c of query) {
+        if (c === ANY_CHAR) src += '.';
+        else if (c === ANY_RUN) src += '.*';
+        else src += c.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+    }
+    return new RegExp(src, 's');
+}
+
+function ngrams(text, n) {
+    const out = new Set();
+    for (let i = 0; i + n <= text.length; i++) out.add(text.slice(i, i + n));
+    return out;
+}
+
+/**
+ * Builds a searchable index from the parsed pattern_index.json.
+ * search(query, { source, limit }) returns [{ pattern, counts: { source: count }, total }],
+ * most frequent first.
+ */
+export function loadPatternIndex(json) {
+    const { n, patterns, sources } = json;
+
+    // Posting lists are delta-encoded
+    const postings = new Map();
+    for (const [gram, deltas] of Object.entries(json.grams)) {
+        const ids = new Int32Array(deltas.length);
+        let prev = 0;
+        for (let i = 0; i < deltas.length; i++) {
+            prev += deltas[i];
+            ids[i] = prev;
+        }
+        postings.set(gram, ids);
+    }
+    const counts = json.counts; // per pattern: [sourceIdx, count, sourceIdx, count, ...]
+    const short = [];
+    patterns.forEach((p, id) => { if (p.length < n) short.push(id); });
+
+    function candidates(query) {
+        const segments = query.split(/[?%]/).filter(s => s);
+        const grams = new Set();
+        const shortSegments = [];
+        for (const seg of segments) {
+            if (seg.length >= n) ngrams(seg, n).forEach(g => grams.add(g));
+            else shortSegments.push(seg);
+        }
+
+        let result;
+        if (grams.size) {
+            const lists = [...grams].map(g => postings.get(g) || []).sort((a, b) => a.length - b.length);
+            result = new Set(lists[0]);
+            for (const ids of lists.slice(1)) {
+                if (!result.size) break;
+                const keep = new Set();
+                for (const id of ids) if (result.has(id)) keep.add(id);
+                result = keep;
+            }
+        } else if (shortSegments.length) {
+            const seg = shortSegments.reduce((a, b) => (b.length > a.length ? b : a));
+            result = new Set();
+            for (const [gram, ids] of postings) {
+                if (gram.includes(seg)) for (const id of ids) result.add(id);
+            }
+        } else {
+            return patterns.map((_, id) => id);
+        }
+        for (const id of short) result.add(id);
+        return [...result];
+    }
+
+    function search(query, { source = null, limit = 0 } = {}) {
+        query = normalizeQuery(query);
+        const regex = compileQuery(query);
+        let srcIdx = -1;
+        if (source !== null) {
+            srcIdx = sources.indexOf(source);
+            if (srcIdx === -1) return [];
+        }
+
+        const matches = [];
+        for (const id of candidates(query)) {
+            const flat = counts[id];
+            if (srcIdx !== -1) {
+                let found = false;
+                for (let i = 0; i < flat.length; i += 2) if (flat[i] === srcIdx) { found = true; break; }
+                if (!found) continue;
+            }
+            const pattern = patterns[id];
+            if (!regex.test(pattern)) continue;
+
+            const perSource = {};
+            let total = 0;
+            for (let i = 0; i < flat.length; i += 2) {
+                perSource[sources[flat[i]]] = flat[i + 1];
+                total += flat[i + 1];
+            }
+            matches.push({ pattern, counts: perSource, total });
+        }
+
+        matches.sort((a, b) => b.total - a.total || (a.pattern < b.pattern ? -1 : a.pattern > b.pattern ? 1 : 0));
+        return limit ? matches.slice(0, limit) : matches;
+    }
+
+    return { patterns, sources, search };
+}
@@ -0,0 +1,64 @@
+/**
+ * Tile selection for the scan pyramids of scripts/scan_tiles.py.
+ *
+ * `info` is an entry of tiles/tiles.json:
+ *   { url, width, height, tileSize, overlap, format, maxLevel }
+ * Positions are in % of the scan (0-100), like the annotation points, so the
+ * tiles can be drawn into the same viewBox="0 0 100 100" as the overlays.
+ */
+
+export function levelSize(info, level) {
+    const scale = 2 ** (info.maxLevel - level);
+    return {
+        width: Math.ceil(info.width / scale),
+        height: Math.ceil(info.height / scale)
+    };
+}
+
+/**
+ * Lowest level at least `pixelWidth` wide, so the scan is not shown blurred.
+ */
+export function levelFor(info, pixelWidth) {
+    for (let level = 0; level < info.maxLevel; level++) {
+        if (levelSize(info, level).width >= pixelWidth) return level;
+    }
+    return info.maxLevel;
+}
+
+/**
+ * The tiles covering `rect` ({ x, y, w, h } in %) when the whole scan is
+ * shown `pixelWidth` device pixels wide:
+ * [{ url, x, y, width, height }] with positions in %.
+ */
+export function tilesInView(info, pixelWidth, rect = { x: 0, y: 0, w: 100, h: 100 }) {
+    const level = levelFor(info, pixelWidth);
+    const { width, height } = levelSize(info, level);
+    const size = info.tileSize;
+    const overlap = info.overlap;
+    const cols = Math.ceil(width / size);
+    const rows = Math.ceil(height / size);
+
+    const clamp = (v, max) => Math.min(max - 1, Math.max(0, v));
+    const c0 = clamp(Math.floor((rect.x / 100) * width / size), cols);
+    const c1 = clamp(Math.floor(((rect.x + rect.w) / 100) * width / size), cols);
+    const r0 = clamp(Math.floor((rect.y / 100) * height / size), rows);
+    const r1 = clamp(Math.floor(((rect.y + rect.h) / 100) * height / size), rows);
+
+    const tiles = [];
+    for (let row = r0; row <= r1; row++) {
+        const top = Math.max(0, row * size - overlap);
+        const bottom = Math.min(height, (row + 1) * size + overlap);
+        for (let col = c0; col <= c1; col++) {
+            const left = Math.max(0, col * size - overlap);
+            const right = Math.min(width, (col + 1) * size + overlap);
+            tiles.push({
+                url: `${info.url}/${level}/${col}_${row}.${info.format}`,
+                x: (left / width) * 100,
+                y: (top / height) * 100,
+                width: ((right - left) / width) * 100,
+                height: ((bottom - top) / height) * 100
+            });
+        }
+    }
+    return tiles;
+}
@@ -8,5 +8,11 @@ export default defineConfig({
   build: {
     outDir: '../docs',
     emptyOutDir: true
+  },
+  server: {
+    // Query endpoints of `analyze_transcriptions.py watch` (scripts/watch_server.py)
+    proxy: {
+      '/api': process.env.WATCH_SERVER || 'http://127.0.0.1:8765'
+    }
   }
 })